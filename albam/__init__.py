@@ -5,9 +5,11 @@ import sys
 import bpy
 
 from albam.blender_ui.data import AlbamDataFactory
+from albam.blender_ui.import_panel import update_cache_sizes_on_load
 from albam.blender_ui.asset import AlbamAsset
 from albam.blender_ui.custom_properties import AlbamCustomPropertiesFactory
 from albam.registry import blender_registry
+from albam.vfs import update_blob_store_on_load, update_blob_store_on_save
 from albam.__version__ import __version__ as version
 
 __version__ = version
@@ -64,8 +66,21 @@ def register():
     bpy.types.Mesh.albam_custom_properties = bpy.props.PointerProperty(type=AlbamCustomPropertiesMesh)
     bpy.types.Image.albam_custom_properties = bpy.props.PointerProperty(type=AlbamCustomPropertiesImage)
 
+    bpy.app.handlers.load_post.append(update_blob_store_on_load)
+    bpy.app.handlers.load_post.append(update_cache_sizes_on_load)
+    bpy.app.handlers.save_post.append(update_blob_store_on_save)
+    # bpy.data and bpy.context are restricted while add-ons are enabled,
+    # the current file is read as soon as the add-on is
+    bpy.app.timers.register(update_blob_store_on_load, first_interval=0)
+
 
 def unregister():
+    if bpy.app.timers.is_registered(update_blob_store_on_load):
+        bpy.app.timers.unregister(update_blob_store_on_load)
+    bpy.app.handlers.load_post.remove(update_blob_store_on_load)
+    bpy.app.handlers.load_post.remove(update_cache_sizes_on_load)
+    bpy.app.handlers.save_post.remove(update_blob_store_on_save)
+
     for _, cls in reversed(blender_registry.props):
         bpy.utils.unregister_class(cls)
 
@@ -2,16 +2,28 @@ import bpy
 
 from albam.registry import blender_registry
 from albam.apps import APPS
+from albam.vfs import BLOB_STORE, get_legacy_bytes, set_blob
 
 
 @blender_registry.register_blender_prop
 class AlbamAsset(bpy.types.PropertyGroup):
     app_id: bpy.props.EnumProperty(name="", description="", items=APPS)
-    original_bytes: bpy.props.StringProperty(subtype="BYTE_STRING")  # noqa: F821
+    # sha1 of the imported file in BLOB_STORE, used as base when exporting
+    original_hash: bpy.props.StringProperty()
     relative_path : bpy.props.StringProperty()
     extension: bpy.props.StringProperty()
     render_target: bpy.props.BoolProperty(default=False)
 
+    @property
+    def original_bytes(self):
+        if self.original_hash:
+            return BLOB_STORE.get(self.original_hash)
+        return get_legacy_bytes(self, "original_bytes")
+
+    @original_bytes.setter
+    def original_bytes(self, data):
+        set_blob(self, "original_hash", "original_bytes", data)
+
 
 @blender_registry.register_blender_type
 class ALBAM_PT_AssetObject(bpy.types.Panel):
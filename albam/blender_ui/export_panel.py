@@ -4,6 +4,7 @@ import bpy
 
 from albam.registry import blender_registry
 from albam.vfs import (
+    ALBAM_OT_VirtualFileSystemCacheStats,
     ALBAM_OT_VirtualFileSystemSaveFileBase,
     ALBAM_OT_VirtualFileSystemCollapseToggleBase,
     ALBAM_OT_VirtualFileSystemRemoveRootVFileBase,
@@ -13,6 +14,12 @@ from albam.vfs import (
 from .import_panel import ALBAM_UL_VirtualFileSystemUIBase
 
 
+def update_blob_cache_size(self, context):
+    # necessary for kaitaistruct unavailable when registering blender types
+    from albam.engines.mtfw.archive import COMPRESSED_BLOB_CACHE
+    COMPRESSED_BLOB_CACHE.resize(self.blob_cache_size * 1024 * 1024)
+
+
 @blender_registry.register_blender_prop_albam(name="export_settings")
 class AlbamExportSettings(bpy.types.PropertyGroup):
     # remove suffix added by blender when there are duplicate material names.
@@ -27,6 +34,8 @@ class AlbamExportSettings(bpy.types.PropertyGroup):
     force_max_num_weights: bpy.props.BoolProperty(default=False)
     far_file_name: bpy.props.StringProperty(name="New Name")  # noqa: F722
     far_add_new: bpy.props.BoolProperty(default=False)
+    # in MB, disk space used to keep compressed files for the next exports
+    blob_cache_size: bpy.props.IntProperty(default=512, min=0, update=update_blob_cache_size)
 
 
 @blender_registry.register_blender_prop
@@ -154,11 +163,31 @@ class ALBAM_WM_OT_ExportOptions(bpy.types.Operator):
         layout.label(text="Dragon's Dogma export hacks")
         layout.prop(export_settings, "no_vf_grouping", text="Don't group meshes by vertex format")
         layout.prop(export_settings, "force_max_num_weights", text="Set max weigth always more that 4")
+        row = layout.row()
+        row.prop(export_settings, "blob_cache_size", text="Compressed files cache (MB)")
+        row.operator("albam.blob_cache_stats", icon="INFO", text="")
 
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
 
 
+@blender_registry.register_blender_type
+class ALBAM_OT_BlobCacheStats(bpy.types.Operator):
+    """Show usage of the on-disk cache of compressed files used when exporting"""
+    bl_idname = "albam.blob_cache_stats"
+    bl_label = "Compressed files cache usage"
+
+    clear: bpy.props.BoolProperty(default=False, options={"SKIP_SAVE"})  # NOQA
+
+    def execute(self, context):
+        from albam.engines.mtfw.archive import COMPRESSED_BLOB_CACHE
+        if self.clear:
+            COMPRESSED_BLOB_CACHE.clear()
+        stats = COMPRESSED_BLOB_CACHE.stats()
+        self.report({"INFO"}, ALBAM_OT_VirtualFileSystemCacheStats.format_stats(stats))
+        return {"FINISHED"}
+
+
 @blender_registry.register_blender_type
 class ALBAM_PT_FileExplorer2(bpy.types.Panel):
     bl_category = "Albam [Beta]"
@@ -180,6 +209,7 @@ class ALBAM_PT_FileExplorer2(bpy.types.Panel):
         col.operator("albam.find_and_replace", icon="ZOOM_ALL", text="")
         col.operator("albam.remove_exported", icon="X", text="")
         col = split.column()
+        ALBAM_UL_VirtualFileSystemUIBase.draw_search(col, context.scene.albam.exported)
         col.template_list(
             "ALBAM_UL_ExportedFileList",
             "",
@@ -209,7 +239,6 @@ class ALBAM_OT_VirtualFileSystemExportedCollapseToggle(
     bl_idname = "albam.file_item_exported_collapse_toggle"
     bl_label = "ALBAM_OT_VirtualFileSystemExportedCollapseToggle"
     VFS_ID = "exported"
-    NODES_CACHE = {}
 
 
 @blender_registry.register_blender_type
@@ -290,7 +319,7 @@ class ALBAM_OT_Pack(bpy.types.Operator):
         if item .is_archive:
             parent_node = item.display_name
         else:
-            parent_node = (item.tree_node_ancestors[0].node_id).split("::")[1]
+            parent_node = item.tree_node.root_id.split("::")[1]
         self.filepath = parent_node
         context.window_manager.fileselect_add(self)
         return {'RUNNING_MODAL'}
@@ -313,7 +342,7 @@ class ALBAM_OT_Pack(bpy.types.Operator):
         if item_i.is_archive:
             path_i = item_i.absolute_path
         else:
-            arc_name = (item_i.tree_node_ancestors[0].node_id).split("::")[1]
+            arc_name = item_i.tree_node.root_id.split("::")[1]
             arc_node = [item for item in vfs_i.file_list
                         if item.is_archive is True and item.display_name == arc_name]
             path_i = arc_node[0].absolute_path
@@ -324,15 +353,9 @@ class ALBAM_OT_Pack(bpy.types.Operator):
         exported = [item for item in vfs_e.file_list
                     if item.is_expandable is False]
         for e in exported:
-            try:
-                parent = e.tree_node_ancestors[0].node_id
-            except IndexError:
-                continue
-            if parent == item_e.name:
+            if e.tree_node.root_id == item_e.name:
                 files_e.append(e)
-        arc = update_arc(path_i, files_e)
-        with open(self.filepath, "wb") as f:
-            f.write(arc)
+        update_arc(path_i, files_e, self.filepath)
 
     @classmethod
     def poll(cls, context):
@@ -386,22 +409,16 @@ class ALBAM_OT_Patch(bpy.types.Operator):
         # FIXME don't import function here, use method in archive type
         # necessary for kaitaistruct unavailable when registering
         # blender types
-        from albam.engines.mtfw.archive import update_arc
+        from albam.engines.mtfw.archive import patch_arc
         files_e = []
         vfs_e = context.scene.albam.exported
         index_e = vfs_e.file_list_selected_index
         item_e = vfs_e.file_list[index_e]
         exported = [item for item in vfs_e.file_list if item.is_expandable is False]
         for e in exported:
-            try:
-                parent = e.tree_node_ancestors[0].node_id
-            except IndexError:
-                continue
-            if parent == item_e.name:
+            if e.tree_node.root_id == item_e.name:
                 files_e.append(e)
-        arc = update_arc(self.filepath, files_e)
-        with open(self.filepath, "wb") as f:
-            f.write(arc)
+        patch_arc(self.filepath, files_e)
         return {'FINISHED'}
 
     @classmethod
@@ -462,10 +479,7 @@ class ALBAM_OT_FindReplaceFileSel(ALBAM_OT_VirtualFileSystemSaveFileBase, bpy.ty
         vfs = self.get_vfs(self, context)
         vfile = vfs.selected_vfile
         from albam.engines.mtfw.archive import find_and_replace_in_arc
-        arc = find_and_replace_in_arc(self.filepath, vfile, file_name, add_new)
-        if arc:
-            with open(self.filepath, "wb") as f:
-                f.write(arc)
+        find_and_replace_in_arc(self.filepath, vfile, file_name, add_new)
         return {'FINISHED'}
 
     def invoke(self, context, event):
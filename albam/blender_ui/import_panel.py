@@ -4,7 +4,7 @@ import bpy
 
 from albam.apps import APPS
 from albam.registry import blender_registry
-from albam.vfs import ALBAM_OT_VirtualFileSystemCollapseToggle
+from albam.vfs import ALBAM_OT_VirtualFileSystemCollapseToggle, VFILE_CACHE, update_blob_store_location
 
 # FIXME: store in app data
 APP_DIRS_CACHE = {}
@@ -47,10 +47,47 @@ class AlbamApps(bpy.types.PropertyGroup):
     def get_app_config_filepath(self, app_id):
         return APP_CONFIG_FILE_CACHE.get(app_id)
 
+    def get_app_dir(self, app_id):
+        return APP_DIRS_CACHE.get(app_id)
+
+
+def update_vfs_cache_size(self, context):
+    VFILE_CACHE.resize(self.vfs_cache_size * 1024 * 1024)
+
+
+@bpy.app.handlers.persistent
+def update_cache_sizes_on_load(*args):
+    """
+    Caches are shared by the session, their size is saved in the scene
+    and only applied when changed, so it needs to be applied after loading
+    """
+    # export_panel imports this module
+    from albam.blender_ui.export_panel import update_blob_cache_size
+
+    scene = bpy.context.scene
+    if scene is None:
+        return
+    update_vfs_cache_size(scene.albam.import_settings, bpy.context)
+    update_blob_cache_size(scene.albam.export_settings, bpy.context)
+
+
+BLOB_STORE_LOCATIONS = [
+    ("SIDECAR", "Next to .blend", "Directory next to the .blend file, move it along with it", 0),
+    ("CACHE", "User cache", "Directory in the user cache", 1),
+]
+
 
 @blender_registry.register_blender_prop_albam(name="import_settings")
 class AlbamImportSettings(bpy.types.PropertyGroup):
     import_only_main_lods: bpy.props.BoolProperty(default=True)
+    # in MB, memory used to keep files extracted from archives
+    vfs_cache_size: bpy.props.IntProperty(default=256, min=0, update=update_vfs_cache_size)
+    # add the items of archive directories to the file list when expanded
+    lazy_archive_expansion: bpy.props.BoolProperty(default=True)
+    # where the original bytes of imported files are stored
+    blob_store_location: bpy.props.EnumProperty(
+        items=BLOB_STORE_LOCATIONS, default=BLOB_STORE_LOCATIONS[0][0], update=update_blob_store_location,
+    )
 
 
 @blender_registry.register_blender_type
@@ -117,7 +154,8 @@ class ALBAM_UL_VirtualFileSystemUIBase:
     collapse_toggle_operator_cls = None
 
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
-        for _ in range(item.tree_node.depth):
+        is_searching = data.is_searching
+        for _ in range(0 if is_searching else item.tree_node.depth):
             layout.split(factor=0.01)
 
         if item.is_expandable:
@@ -137,43 +175,21 @@ class ALBAM_UL_VirtualFileSystemUIBase:
         op = col.operator(self.collapse_toggle_operator_cls.bl_idname, text="", icon=icon)
         op.button_index = index
 
-        layout.column().label(text=item.display_name)
+        # matches are shown as a flat list, with their path
+        text = item.relative_path if is_searching and item.relative_path else item.display_name
+        layout.column().label(text=text)
 
     def filter_items(self, context, data, propname):
-        filtered_items = []
-        # After pressing expand toggle "node_name: is_expanded" item is added to the cache
-        cache = self.collapse_toggle_operator_cls.NODES_CACHE
-        item_list = getattr(data, propname)
-
-        root_nodes = [item for item in item_list if item.is_root]
-        # Invalidate cache, it stores during the session even if blend file was changed
-        if cache:
-            if len(root_nodes) == 0:
-                cache.clear()
-            else:
-                for root_node in root_nodes:
-                    if root_node.name not in cache.keys() or len(root_nodes) != len(cache.keys()):
-                        cache.clear()
-        # The addon doesn't save a cache of toggle buttons states so it needs to rebuild
-        if not cache and len(item_list) > 0:
-            for root_node in root_nodes:
-                child_nodes = [item for item in item_list if item.tree_node.root_id == root_node.name]
-                child_nodes.append(root_node)
-                cache[root_node.name] = {
-                    item.name: item.is_expanded for item in child_nodes if item.is_expandable}
-
-        for item in item_list:
-            if item.is_archive or item.is_root:
-                filtered_items.append(self.bitflag_filter_item)
-
-            elif all(cache[item.tree_node.root_id].get(anc.node_id, False)
-                     for anc in item.tree_node_ancestors):
-                filtered_items.append(self.bitflag_filter_item)
-
-            else:
-                filtered_items.append(0)
-
-        return filtered_items, []
+        # kept up to date by the collapse toggle operators
+        return data.get_visibility_flags(self.bitflag_filter_item), []
+
+    @staticmethod
+    def draw_search(layout, vfs):
+        row = layout.row(align=True)
+        row.prop(vfs, "search_query", text="", icon="VIEWZOOM")
+        row.prop(vfs, "search_extension", text="Ext")
+        if vfs.is_searching:
+            layout.label(text=vfs.get_search_summary())
 
 
 @blender_registry.register_blender_type
@@ -213,9 +229,12 @@ class ALBAM_PT_FileExplorer(bpy.types.Panel):
         split = self.layout.split(factor=0.1)
         col = split.column()
         col.operator("albam.add_files", icon="FILE_NEW", text="")
+        col.operator("albam.add_directory", icon="FILE_FOLDER", text="")
         col.operator("albam.save_file", icon="SORT_ASC", text="")
+        col.operator("albam.extract", icon="PACKAGE", text="")
         col.operator("albam.remove_imported", icon="X", text="")
         col = split.column()
+        ALBAM_UL_VirtualFileSystemUIBase.draw_search(col, context.scene.albam.vfs)
         col.template_list(
             "ALBAM_UL_VirtualFileSystemUI",
             "",
@@ -380,6 +399,13 @@ class ALBAM_WM_OT_ImportOptions(bpy.types.Operator):
         import_settings = context.scene.albam.import_settings
         layout = self.layout
         layout.prop(import_settings, "import_only_main_lods", text="Import main LODs only")
+        row = layout.row()
+        row.prop(import_settings, "vfs_cache_size", text="File cache (MB)")
+        row.operator("albam.vfs_cache_stats", icon="INFO", text="")
+        layout.prop(import_settings, "lazy_archive_expansion", text="List archive folders when expanded")
+        row = layout.row()
+        row.prop(import_settings, "blob_store_location", text="Imported files")
+        row.operator("albam.blob_store_collect_garbage", icon="TRASH", text="")
 
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
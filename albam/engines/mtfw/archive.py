@@ -1,10 +1,21 @@
-import io
+import functools
+import hashlib
+import mmap
 import ntpath
+import os
+import shutil
+import struct
+import tempfile
 import zlib
 
-from kaitaistruct import KaitaiStream
+import numpy as np
 
+from albam.exceptions import FileNotFoundInArchive
+from albam.lib.archive import extract_files, is_selected
+from albam.lib.cache import DiskCache, FileHandlePool
+from albam.lib.misc import parallel_imap
 from albam.registry import blender_registry
+from albam.vfs import invalidate_path_resolvers_of_archive
 from . import EXTENSION_TO_FILE_ID, FILE_ID_TO_EXTENSION
 from .structs.arc import Arc
 from albam.blender_ui.tools import show_message_box
@@ -18,9 +29,9 @@ from albam.blender_ui.tools import show_message_box
 @blender_registry.register_archive_loader(app_id="rev2", extension="arc")
 @blender_registry.register_archive_loader(app_id="dd", extension="arc")
 def arc_loader(vfile, context=None):  # XXX context DEPRECATED
-    arc = ArcWrapper(file_path=vfile.absolute_path)
-    for file_entry in arc.get_file_entries():
-        yield file_entry.file_path_with_ext
+    with ARC_POOL.lease(vfile.absolute_path) as arc:
+        paths = arc.get_paths()
+    yield from paths
 
 
 @blender_registry.register_archive_accessor(app_id="re0", extension="arc")
@@ -31,36 +42,146 @@ def arc_loader(vfile, context=None):  # XXX context DEPRECATED
 @blender_registry.register_archive_accessor(app_id="rev2", extension="arc")
 @blender_registry.register_archive_accessor(app_id="dd", extension="arc")
 def arc_accessor(vfile, context):
-    arc = ArcWrapper(vfile.root_vfile.absolute_path)
-
     path = vfile.relative_path_windows
     path_no_ext = str(vfile.relative_path_windows_no_ext)
     ext = path.suffix.replace(".", "")
 
-    # TODO: error handling, e.g. when file_path doesn't exist
     try:
         file_type = EXTENSION_TO_FILE_ID[ext]
     except KeyError:
         file_type = int(ext)
-    file_bytes = arc.get_file(path_no_ext, file_type)
+    with ARC_POOL.lease(vfile.root_vfile.absolute_path) as arc:
+        file_bytes = arc.get_file(path_no_ext, file_type)
 
     return file_bytes
 
 
+@blender_registry.register_archive_extractor(app_id="re0", extension="arc")
+@blender_registry.register_archive_extractor(app_id="re1", extension="arc")
+@blender_registry.register_archive_extractor(app_id="re5", extension="arc")
+@blender_registry.register_archive_extractor(app_id="re6", extension="arc")
+@blender_registry.register_archive_extractor(app_id="rev1", extension="arc")
+@blender_registry.register_archive_extractor(app_id="rev2", extension="arc")
+@blender_registry.register_archive_extractor(app_id="dd", extension="arc")
+def arc_extractor(vfile, context, dst_dir, filters=None, path_prefix=None):
+    return extract_arc(vfile.absolute_path, dst_dir, filters, path_prefix)
+
+
+def extract_arc(file_path, dst_dir, filters=None, path_prefix=None, max_workers=None):
+    """
+    Extract the contents of an arc to `dst_dir`, decompressing in parallel.
+    See `albam.lib.archive.is_selected` for `filters` and `path_prefix`
+    """
+    def _items(arc):
+        for fe in arc.get_file_entries():
+            relative_path = fe.file_path_with_ext.replace(ArcWrapper.PATH_SEPARATOR, "/")
+            if is_selected(relative_path, filters, path_prefix):
+                yield relative_path, functools.partial(arc.decompress, fe)
+
+    with ARC_POOL.lease(file_path) as arc:
+        return extract_files(_items(arc), dst_dir, max_workers=max_workers)
+
+
 class ArcWrapper:
     PATH_SEPARATOR = "\\"
 
+    HEADER_SIZE = 8
+    NUM_FILES_OFFSET = 6
+    FILE_ENTRY_SIZE = 80
+    TOC_ALIGNMENT = 32768
+
     def __init__(self, file_path):
+        """
+        The archive is memory-mapped instead of read. Only the table of contents
+        is parsed, into the columnar `entries` table (see `read_arc_toc`).
+        Entry objects are created when requested, each with a `raw_data`
+        memoryview into the mapping, so opening a big arc costs almost nothing
+        until an entry is decompressed
+        """
         self.file_path = file_path
-        self.parsed = Arc.from_file(file_path)
-        self.parsed._read()
+        self._mmap = None
+        self._view = None
+        self._file_entries = {}
+        # kept open so unchanged blobs can be copied between file descriptors
+        self._file = open(file_path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+            self.entries = read_arc_toc(self._view)
+        except BaseException:
+            # e.g. empty, truncated or not an arc
+            self.close()
+            raise
+        self._build_index()
+
+    @classmethod
+    def get_data_offset(cls, num_files):
+        """
+        Size of the header and the table of contents, including its padding.
+        File data starts here
+        """
+        entries_size = num_files * cls.FILE_ENTRY_SIZE
+        padding_size = (cls.TOC_ALIGNMENT - cls.HEADER_SIZE) - entries_size % cls.TOC_ALIGNMENT
+        return cls.HEADER_SIZE + entries_size + padding_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _build_index(self):
+        # like kaitai's strz, anything after the first null is ignored
+        self._paths = [
+            path.partition(b"\00")[0].decode("ascii") for path in self.entries["file_path"].tolist()
+        ]
+        self._paths_with_ext = []
+        self._entries_by_path = {}
+        self._entries_by_type = {}
+        for i, (path, file_type) in enumerate(zip(self._paths, self.entries["file_type"].tolist())):
+            ext = FILE_ID_TO_EXTENSION.get(file_type, file_type)
+            self._paths_with_ext.append(f"{path}.{ext}")
+            self._entries_by_path.setdefault((path, file_type), i)
+            self._entries_by_type.setdefault(file_type, []).append(i)
+
+    def _get_file_entry(self, i):
+        fe = self._file_entries.get(i)
+        if fe is not None:
+            return fe
+        _, file_type, zsize, size, flags, offset = self.entries[i].item()
+        fe = Arc.FileEntry(None, _parent=None, _root=None)
+        fe.file_path = self._paths[i]
+        fe.file_path_with_ext = self._paths_with_ext[i]
+        fe.file_type = file_type
+        fe.zsize = zsize
+        fe.size = size
+        fe.flags = flags
+        fe.offset = offset
+        fe.raw_data = self._view[offset:offset + zsize]
+        return self._file_entries.setdefault(i, fe)
+
+    def close(self):
+        # memoryviews handed out to entries need to be released before
+        # the mapping can be closed. Safe to call more than once
+        for fe in self._file_entries.values():
+            if isinstance(fe.raw_data, memoryview):
+                fe.raw_data.release()
+        try:
+            if self._view is not None:
+                self._view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            # a slice is still referenced outside; the mapping will be
+            # closed when garbage collected
+            pass
+        self._file.close()
+
+    def fileno(self):
+        return self._file.fileno()
 
     def get_file_entries_by_type(self, file_type):
-        filtered = []
-        for fe in self.parsed.file_entries:
-            if fe.file_type == file_type:
-                filtered.append(fe)
-        return filtered
+        return [self._get_file_entry(i) for i in self._entries_by_type.get(file_type, ())]
 
     def get_file_entries_by_extension(self, extension):
         try:
@@ -70,38 +191,83 @@ class ArcWrapper:
         return self.get_file_entries_by_type(file_type)
 
     def get_files_by_extension(self, extension):
-        try:
-            file_type = EXTENSION_TO_FILE_ID[extension]
-        except KeyError:
-            raise RuntimeError(f"Extension {extension} unknown")
         files = []
-        for file_entry in self.get_file_entries_by_type(file_type):
-            t = (file_entry.file_path, self.get_file(
-                file_entry.file_path, file_type))
-            files.append(t)
+        for file_entry in self.get_file_entries_by_extension(extension):
+            files.append((file_entry.file_path, self.decompress(file_entry)))
         return files
 
     def get_file_entries(self):
-        file_entries = []
-        for fe in self.parsed.file_entries:
-            ext = FILE_ID_TO_EXTENSION.get(fe.file_type, fe.file_type)
-            fe.file_path_with_ext = f"{fe.file_path}.{ext}"
-            file_entries.append(fe)
-        return file_entries
+        return [self._get_file_entry(i) for i in range(len(self.entries))]
+
+    def get_paths(self):
+        """
+        Paths with extension of every entry, without creating entry objects
+        """
+        return list(self._paths_with_ext)
+
+    def get_file_entry(self, file_path, file_type):
+        try:
+            i = self._entries_by_path[(file_path, file_type)]
+        except KeyError:
+            ext = FILE_ID_TO_EXTENSION.get(file_type, file_type)
+            raise FileNotFoundInArchive(self.file_path, f"{file_path}.{ext}")
+        return self._get_file_entry(i)
+
+    def has_file(self, file_path, file_type):
+        return (file_path, file_type) in self._entries_by_path
 
     def get_file(self, file_path, file_type):
-        file_ = None
+        return self.decompress(self.get_file_entry(file_path, file_type))
 
-        for fe in self.parsed.file_entries:
-            if fe.file_path == file_path and fe.file_type == file_type:
-                try:
-                    file_ = zlib.decompress(fe.raw_data)
-                    break
-                except EOFError:
-                    print(
-                        f"Requested to read out of bounds. Offset: {fe.offset}")
-                    raise
-        return file_
+    @staticmethod
+    def decompress(file_entry):
+        try:
+            return zlib.decompress(file_entry.raw_data)
+        except EOFError:
+            print(f"Requested to read out of bounds. Offset: {file_entry.offset}")
+            raise
+
+
+# Layout of `Arc.FileEntry`, size and flags are bitfields of 29 and 3 bits
+ARC_ENTRY_DTYPE = np.dtype([
+    ("file_path", "S64"),
+    ("file_type", "<i4"),
+    ("zsize", "<u4"),
+    ("size_and_flags", "<u4"),
+    ("offset", "<u4"),
+])
+# Decoded table of contents, one column per field of `Arc.FileEntry`
+ARC_TOC_DTYPE = np.dtype([
+    ("file_path", "S64"),
+    ("file_type", "<i4"),
+    ("zsize", "<u4"),
+    ("size", "<u4"),
+    ("flags", "u1"),
+    ("offset", "<u4"),
+])
+
+
+def read_arc_toc(buffer):
+    """
+    Table of contents of an arc as an ARC_TOC_DTYPE array, read with a single
+    `np.frombuffer` instead of one kaitai object per entry.
+    `buffer` needs to include at least the header and the entries
+    """
+    ident, _, num_files = ARC_HEADER.unpack_from(buffer)
+    if ident != b"ARC\00":
+        raise ValueError("Not an arc")
+    raw = np.frombuffer(buffer, dtype=ARC_ENTRY_DTYPE, count=num_files, offset=ArcWrapper.HEADER_SIZE)
+    entries = np.empty(num_files, dtype=ARC_TOC_DTYPE)
+    for name in ("file_path", "file_type", "zsize", "offset"):
+        entries[name] = raw[name]
+    entries["size"] = raw["size_and_flags"] & 0x1FFFFFFF
+    entries["flags"] = raw["size_and_flags"] >> 29
+    return entries
+
+
+# Parsed archives shared by all accessors, so importing a model and its
+# textures parses the table of contents of each arc only once
+ARC_POOL = FileHandlePool(ArcWrapper, max_items=16)
 
 
 def _sort_arc_entries(entries, vfile=True):
@@ -130,57 +296,167 @@ def _sort_arc_entries(entries, vfile=True):
     return sorted
 
 
-def _get_file_entry(vfile):
-    vf_data = vfile.data_bytes
-    chunk = zlib.compress(vf_data)
-    path = ntpath.normpath(vfile.relative_path)
-    file_path = ntpath.splitext(path)[0]
-    try:
-        file_type = EXTENSION_TO_FILE_ID[vfile.extension]
-    except KeyError:
-        file_type = int(vfile.extension)
+def _new_file_entry(file_path, file_type, data):
+    """
+    Entry to be compressed by `write_arc`
+    """
     item = Arc.FileEntry(None, _parent=None, _root=None)
     item.file_path = file_path
     item.file_type = file_type
-    item.zsize = len(chunk)
-    item.size = len(vf_data)
+    item.zsize = 0
+    item.size = len(data)
     item.flags = 2
     item.offset = 0
-    item.raw_data = chunk
+    item.raw_data = None
+    item.data = data
     return item
 
 
-def _serialize_arc(exported):
-    arc = Arc()
-    header = Arc.ArcHeader(None, arc, arc._root)
-    header.ident = b"ARC\00"
-    header.version = 7
-    header.num_files = len(exported)
-    header._check()
-    arc.header = header
-    file_offset = header.num_files * 80 + -(header.num_files * 80) % 32768
-
-    arc.file_entries = []
-    for _, fe in enumerate(exported.values()):
-        file_entry = Arc.FileEntry(None, _parent=arc, _root=arc._root)
-        file_entry.file_path = fe.file_path
-        file_entry.file_type = fe.file_type
-        file_entry.zsize = fe.zsize
-        file_entry.size = fe.size
-        file_entry.flags = 2
-        file_entry.offset = file_offset
-        file_entry.raw_data = fe.raw_data
-        file_entry._check()
-        arc.file_entries.append(file_entry)
-        file_offset += file_entry.zsize
-
-    arc.padding = bytearray(32760 - (header.num_files * 80) % 32768)
-    arc._check()
-
-    stream = KaitaiStream(io.BytesIO(bytearray(file_offset)))
-    arc._write(stream)
-    file_ = stream.to_byte_array()
-    return file_
+def _get_entry_key(vfile):
+    """
+    (file_path, file_type) of the arc entry of a vfile
+    """
+    path = ntpath.normpath(vfile.relative_path)
+    file_path = ntpath.splitext(path)[0]
+    try:
+        file_type = EXTENSION_TO_FILE_ID[vfile.extension]
+    except KeyError:
+        file_type = int(vfile.extension)
+    return file_path, file_type
+
+
+def _get_file_entry(vfile):
+    file_path, file_type = _get_entry_key(vfile)
+    return _new_file_entry(file_path, file_type, vfile.data_bytes)
+
+
+ZLIB_LEVEL = zlib.Z_DEFAULT_COMPRESSION
+# Exporting the same assets over and over is the usual workflow, so compressed
+# blobs are kept on disk by content. Small files are faster to compress again
+COMPRESSED_BLOB_CACHE = DiskCache("arc_blobs", max_bytes=512 * 1024 * 1024)
+COMPRESSED_BLOB_MIN_SIZE = 16 * 1024
+
+
+def compress(data):
+    if len(data) < COMPRESSED_BLOB_MIN_SIZE:
+        return zlib.compress(data, ZLIB_LEVEL)
+    key = f"{hashlib.sha1(data).hexdigest()}-zlib{ZLIB_LEVEL}"
+    raw_data = COMPRESSED_BLOB_CACHE.get(key)
+    if raw_data is None:
+        raw_data = zlib.compress(data, ZLIB_LEVEL)
+        try:
+            COMPRESSED_BLOB_CACHE.put(key, raw_data)
+        except OSError as err:
+            print(f"Failed to cache compressed data: {err}")
+    return raw_data
+
+
+def _get_raw_data(file_entry):
+    data = getattr(file_entry, "data", None)
+    if data is not None:
+        return compress(data)
+    return file_entry.raw_data
+
+
+ARC_HEADER = struct.Struct("<4shh")
+ARC_FILE_ENTRY = struct.Struct("<64siIII")
+
+
+def _serialize_arc_toc(file_entries):
+    """
+    Header and table of contents, including its padding. Packed directly,
+    serializing thousands of entries with kaitai is too slow to patch archives
+    """
+    toc = bytearray(ArcWrapper.get_data_offset(len(file_entries)))
+    ARC_HEADER.pack_into(toc, 0, b"ARC\00", 7, len(file_entries))
+    offset = ArcWrapper.HEADER_SIZE
+    for fe in file_entries:
+        file_path = fe.file_path.encode("ascii")
+        if len(file_path) > 64 or b"\00" in file_path:
+            raise ValueError(f"Invalid path for an arc entry: {fe.file_path}")
+        if fe.size >= 1 << 29:
+            raise ValueError(f"Arc entry too big: {fe.file_path}")
+        size_and_flags = fe.size | (2 << 29)
+        ARC_FILE_ENTRY.pack_into(toc, offset, file_path, fe.file_type, fe.zsize, size_and_flags, fe.offset)
+        offset += ArcWrapper.FILE_ENTRY_SIZE
+    return toc
+
+
+def _copy_file_range(src_fd, dst_fd, src_offset, dst_offset, count):
+    while count > 0:
+        copied = os.copy_file_range(src_fd, dst_fd, count, src_offset, dst_offset)
+        if not copied:
+            raise OSError("Unexpected end of file while copying arc entry")
+        count -= copied
+        src_offset += copied
+        dst_offset += copied
+
+
+def write_arc(f, file_entries, max_workers=None, src_fd=None):
+    """
+    Stream an arc to the binary file object `f`.
+    Space for the header and table of contents is reserved first. Entries are
+    compressed in a thread pool and written in order as they're ready, then
+    the table of contents is written with the final offsets, so only a few
+    entries are in memory at any time.
+    `file_entries` are Arc.FileEntry objects, with either uncompressed `data`
+    or already compressed `raw_data` that's copied as is. If `src_fd` (the arc
+    the `raw_data` entries belong to) is given, those are copied in the kernel
+    with `os.copy_file_range` where available, never touching Python memory
+    """
+    start = f.tell()
+    offset = ArcWrapper.get_data_offset(len(file_entries))
+    f.write(bytes(offset))
+    copy_range = src_fd is not None and hasattr(os, "copy_file_range")
+
+    chunks = parallel_imap(_get_raw_data, file_entries, max_workers=max_workers)
+    for fe, chunk in zip(file_entries, chunks):
+        if copy_range and getattr(fe, "data", None) is None:
+            try:
+                f.flush()
+                _copy_file_range(src_fd, f.fileno(), fe.offset, start + offset, len(chunk))
+                f.seek(start + offset + len(chunk))
+            except OSError:
+                # e.g. unsupported by the filesystem, fall back to copying the mapped slice
+                copy_range = False
+                f.seek(start + offset)
+                f.write(chunk)
+        else:
+            f.write(chunk)
+        fe.zsize = len(chunk)
+        fe.offset = offset
+        fe.data = None
+        offset += fe.zsize
+
+    f.seek(start)
+    f.write(_serialize_arc_toc(file_entries))
+    f.seek(start + offset)
+
+
+def _write_arc_file(filepath, file_entries, src_arc=None):
+    """
+    Write to a temporary file next to `filepath` and replace it when done,
+    so the source arc can be the destination and a failure doesn't leave
+    a truncated archive. Unchanged entries from `src_arc` are copied
+    byte-for-byte and it's closed before replacing
+    """
+    fd, tmp_filepath = tempfile.mkstemp(suffix=".arc", dir=os.path.dirname(os.path.abspath(filepath)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_arc(f, file_entries, src_fd=src_arc.fileno() if src_arc else None)
+    except BaseException:
+        os.remove(tmp_filepath)
+        raise
+    finally:
+        if src_arc:
+            src_arc.close()
+    if os.path.exists(filepath):
+        shutil.copymode(filepath, tmp_filepath)
+    else:
+        os.chmod(tmp_filepath, 0o644)
+    ARC_POOL.evict(filepath)
+    os.replace(tmp_filepath, filepath)
+    invalidate_path_resolvers_of_archive(filepath)
 
 
 def _to_dict(file_entries):
@@ -196,84 +472,198 @@ def _to_dict(file_entries):
     return imported
 
 
-def update_arc(filepath, vfiles):
-    imported = {}
+def update_arc(filepath, vfiles, dst_filepath=None):
+    """
+    Add or replace `vfiles` in the arc, writing the result to
+    `dst_filepath` or in place
+    """
     exported = {}
     vf_sorted = _sort_arc_entries(vfiles)
 
-    with open(filepath, 'rb') as f:
-        parsed = Arc.from_bytes(f.read())
-        parsed._read()
-
-    imported = _to_dict(parsed.file_entries)
-
-    # patch dictionary with imported files
-    for vf in vf_sorted:
-        vf_data = vf.data_bytes
-        chunk = zlib.compress(vf_data)
-        path = ntpath.normpath(vf.relative_path)
-        file_path = ntpath.splitext(path)[0]
-        try:
-            file_type = EXTENSION_TO_FILE_ID[vf.extension]
-        except KeyError:
-            file_type = int(vf.extension)
-
-        if imported.get(path):
-            item = imported.get(path)
-            item.zsize = len(chunk)
-            item.size = len(vf_data)
-            item.raw_data = chunk
-            imported[path] = item
-        else:
-            item = Arc.FileEntry(None, _parent=None, _root=None)
-            item.file_path = file_path
-            item.file_type = file_type
-            item.zsize = len(chunk)
-            item.size = len(vf_data)
-            item.flags = 2
-            item.offset = 0
-            item.raw_data = chunk
-            exported[path] = item
-
-    exported.update(imported)
-    return _serialize_arc(exported)
+    with ArcWrapper(filepath) as arc:
+        imported = _to_dict(arc.get_file_entries())
+
+        # patch dictionary with imported files
+        for vf in vf_sorted:
+            path = ntpath.normpath(vf.relative_path)
+            if imported.get(path):
+                item = imported.get(path)
+                item.data = vf.data_bytes
+                item.size = len(item.data)
+            else:
+                exported[path] = _get_file_entry(vf)
+
+        exported.update(imported)
+        _write_arc_file(dst_filepath or filepath, list(exported.values()), src_arc=arc)
+
+
+def patch_arc(filepath, vfiles, max_workers=None):
+    """
+    Add or replace `vfiles` in the arc in place, only writing the changed
+    blobs and the table of contents; the rest of the file isn't read or written.
+    The table of contents is patched as an `ARC_TOC_DTYPE` array, so the time
+    depends on the size of the changes, not on the number of entries.
+    A blob that fits in its old slot is moved there, otherwise it stays
+    appended at the end of the file, leaving the old slot unused.
+    If the new entries don't fit between the table of contents and the first
+    blob, the whole archive is rewritten with `update_arc` instead.
+    The archive is valid at every step if interrupted: changed blobs are
+    appended and the table of contents pointing to them is written before
+    anything is overwritten, see `_write_patched_arc`.
+    Returns True if the arc was patched in place
+    """
+    with open(filepath, "rb") as f:
+        _, version, num_files = ARC_HEADER.unpack(f.read(ARC_HEADER.size))
+        f.seek(0)
+        entries = read_arc_toc(f.read(ArcWrapper.HEADER_SIZE + num_files * ArcWrapper.FILE_ENTRY_SIZE))
+        file_size = f.seek(0, os.SEEK_END)
+
+    data_by_index = {}
+    new_keys = {}
+    for vf in _sort_arc_entries(vfiles):
+        key = _get_entry_key(vf)
+        i = _find_arc_entry(entries, *key)
+        if i is None:
+            i = new_keys.setdefault(key, len(entries) + len(new_keys))
+        data_by_index[i] = vf.data_bytes
+
+    # the padding after the table of contents depends on the tool that wrote the
+    # arc, new entries must fit before the first blob actually starts
+    data_start = min(int(entries["offset"].min()), file_size) if len(entries) else file_size
+    toc_end = ArcWrapper.HEADER_SIZE + (num_files + len(new_keys)) * ArcWrapper.FILE_ENTRY_SIZE
+    if new_keys and toc_end > data_start:
+        update_arc(filepath, vfiles)
+        return False
+    if not data_by_index:
+        return True
+
+    new_entries = np.zeros(len(new_keys), dtype=ARC_TOC_DTYPE)
+    for j, (file_path, file_type) in enumerate(new_keys):
+        encoded_path = file_path.encode("ascii")
+        if len(encoded_path) > 64 or b"\00" in encoded_path:
+            raise ValueError(f"Invalid path for an arc entry: {file_path}")
+        new_entries[j] = (encoded_path, file_type, 0, 0, 2, 0)
+    entries = np.concatenate((entries, new_entries))
+
+    ARC_POOL.evict(filepath)
+    with open(filepath, "r+b") as f:
+        _write_patched_arc(f, entries, version, data_by_index, max_workers)
+    invalidate_path_resolvers_of_archive(filepath)
+    return True
+
+
+def _find_arc_entry(entries, file_path, file_type):
+    """
+    Row of an entry in an `ARC_TOC_DTYPE` array, None if not found.
+    Compared in numpy, so it doesn't need an index of every entry like `ArcWrapper`
+    """
+    matches = np.flatnonzero(
+        (entries["file_type"] == file_type) & (entries["file_path"] == file_path.encode("ascii")))
+    return int(matches[0]) if len(matches) else None
+
+
+def _write_patched_arc(f, entries, version, data_by_index, max_workers=None):
+    """
+    Compress the changed entries of `entries` ({row: uncompressed data}) into the
+    arc opened as `f`, in steps that leave a valid archive if interrupted:
+    1. Every changed blob is appended, the ones that fit in their old slot last.
+    2. The table of contents is written pointing to them.
+    3. Blobs that fit are copied to their old slot, no longer referenced,
+       and the table of contents written again.
+    4. Their appended copies are truncated
+    """
+    end = f.seek(0, os.SEEK_END)
+    indices = sorted(data_by_index)
+    chunks = parallel_imap(compress, [data_by_index[i] for i in indices], max_workers=max_workers)
+    in_place = []
+    for i, chunk in zip(indices, chunks):
+        size = len(data_by_index[i])
+        if size >= 1 << 29:
+            raise ValueError(f"Arc entry too big: {entries['file_path'][i].decode('ascii')}")
+        entries["size"][i] = size
+        entries["flags"][i] = 2
+        if len(chunk) <= entries["zsize"][i]:
+            in_place.append((i, int(entries["offset"][i]), chunk))
+            continue
+        f.write(chunk)
+        entries["offset"][i] = end
+        entries["zsize"][i] = len(chunk)
+        end += len(chunk)
+
+    appended_end = end
+    for i, _, chunk in in_place:
+        f.write(chunk)
+        entries["offset"][i] = end
+        entries["zsize"][i] = len(chunk)
+        end += len(chunk)
+    _write_arc_toc(f, entries, version)
+    if not in_place:
+        return
+
+    for i, offset, chunk in in_place:
+        f.seek(offset)
+        f.write(chunk)
+        entries["offset"][i] = offset
+    _write_arc_toc(f, entries, version)
+    f.truncate(appended_end)
+
+
+def pack_arc_toc(entries, version=7):
+    """
+    Header and table of contents of an `ARC_TOC_DTYPE` array, the inverse of
+    `read_arc_toc`. The padding up to the data isn't included
+    """
+    raw = np.zeros(len(entries), dtype=ARC_ENTRY_DTYPE)
+    for name in ("file_path", "file_type", "zsize", "offset"):
+        raw[name] = entries[name]
+    raw["size_and_flags"] = entries["size"] | (entries["flags"].astype("<u4") << 29)
+    return ARC_HEADER.pack(b"ARC\00", version, len(entries)) + raw.tobytes()
+
+
+def _write_arc_toc(f, entries, version):
+    """
+    Write the table of contents and wait for it and everything written
+    before to be on disk
+    """
+    f.flush()
+    os.fsync(f.fileno())
+    f.seek(0)
+    f.write(pack_arc_toc(entries, version))
+    f.flush()
+    os.fsync(f.fileno())
+    f.seek(0, os.SEEK_END)
 
 
 def find_and_replace_in_arc(filepath, vfile, file_name, add_new):
     file_entries = {}
-    imported_entries = []
     found = False
 
-    with open(filepath, 'rb') as f:
-        parsed = Arc.from_bytes(f.read())
-        parsed._read()
-
-    imported_entries = [fe for fe in parsed.file_entries]
-    if add_new:
-        file_entry = _get_file_entry(vfile)
-        imported_entries.append(file_entry)
-        imported_entries = _sort_arc_entries(imported_entries, False)
-        file_entries = _to_dict(imported_entries)
-    else:
-        for fe in imported_entries:
-            path = fe.file_path
-            name = ntpath.basename(path)
-            try:
-                extension = FILE_ID_TO_EXTENSION[fe.file_type]
-            except KeyError:
-                extension = str(fe.file_type)
-            if name == file_name and vfile.extension == extension:
-                show_message_box("File: {} found int the archive".format(file_name))
-                found = True
-                vf_data = vfile.data_bytes
-                chunk = zlib.compress(vf_data)
-                fe.zsize = len(chunk)
-                fe.size = len(vf_data)
-                fe.raw_data = chunk
-            file_entries[(fe.file_path + "." + extension)] = fe
-        assert len(file_entries) == len(parsed.file_entries), "File entries size mismatch"
-        if not found:
-            show_message_box("File: {} not found in the archive".format(file_name))
-            return None
-    assert len(parsed.file_entries) <= len(file_entries) <= len(parsed.file_entries) + 1
-    return _serialize_arc(file_entries)
+    with ArcWrapper(filepath) as arc:
+        imported_entries = arc.get_file_entries()
+        num_entries = len(imported_entries)
+        if add_new:
+            file_entry = _get_file_entry(vfile)
+            imported_entries.append(file_entry)
+            imported_entries = _sort_arc_entries(imported_entries, False)
+            file_entries = _to_dict(imported_entries)
+        else:
+            for fe in imported_entries:
+                path = fe.file_path
+                name = ntpath.basename(path)
+                try:
+                    extension = FILE_ID_TO_EXTENSION[fe.file_type]
+                except KeyError:
+                    extension = str(fe.file_type)
+                if name == file_name and vfile.extension == extension:
+                    show_message_box("File: {} found int the archive".format(file_name))
+                    found = True
+                    fe.data = vfile.data_bytes
+                    fe.size = len(fe.data)
+                file_entries[(fe.file_path + "." + extension)] = fe
+            assert len(file_entries) == num_entries, "File entries size mismatch"
+            if not found:
+                show_message_box("File: {} not found in the archive".format(file_name))
+                return False
+        assert num_entries <= len(file_entries) <= num_entries + 1
+        _write_arc_file(filepath, list(file_entries.values()), src_arc=arc)
+        return True
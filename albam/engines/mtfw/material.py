@@ -1121,7 +1121,7 @@ def _infer_mrl(context, mod_vfile, app_id):
 
     for suffix in suffixes:
         try:
-            mrl_vfile = vfs.get_vfile(app_id, base + suffix)
+            mrl_vfile = vfs.resolve_vfile(app_id, base + suffix)
             mrl_bytes = mrl_vfile.get_bytes()
             mrl = Mrl(app_id, KaitaiStream(io.BytesIO(mrl_bytes)))
             mrl._read()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# before importing albam, so compressed blobs don't fill the user cache and
+# every run starts cold
+CACHE_DIR = tempfile.TemporaryDirectory(prefix="albam-cache-")
+os.environ["ALBAM_CACHE_DIR"] = CACHE_DIR.name
+
+sys.path.append(str(Path(__file__).parent.parent.parent.parent.parent))
+from albam import VENDOR_DIR  # noqa: E402
+
+# vendored dependencies, e.g. kaitaistruct, are added to the path by the add-on on register
+sys.path.insert(0, VENDOR_DIR)
+
+NUM_ENTRIES = (1000, 5000, 20000)
+ENTRY_SIZE = 16 * 1024
+CHANGED_SIZES = (64 * 1024, 1024 * 1024)
+
+
+def make_arc(filepath, num_entries):
+    from albam.engines.mtfw import EXTENSION_TO_FILE_ID
+    from albam.engines.mtfw.archive import _new_file_entry, write_arc
+
+    block = os.urandom(ENTRY_SIZE // 4)
+    file_entries = []
+    for i in range(num_entries):
+        data = i.to_bytes(4, "little") + block * 4
+        file_entries.append(_new_file_entry(f"bench\\{i:06}", EXTENSION_TO_FILE_ID["tex"], data))
+    with open(filepath, "wb") as w:
+        write_arc(w, file_entries)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_arc_patch(num_entries_list=NUM_ENTRIES):
+    from albam.engines.mtfw.archive import patch_arc, update_arc
+
+    print(f"{'entries':>8} {'arc MB':>8} {'changed KB':>11} {'rewrite s':>10} {'patch s':>8}")
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for num_entries in num_entries_list:
+            src_filepath = os.path.join(tmp_dir, f"bench_{num_entries}.arc")
+            make_arc(src_filepath, num_entries)
+            arc_size = os.path.getsize(src_filepath)
+            for changed_size in CHANGED_SIZES:
+                vfile = SimpleNamespace(
+                    relative_path="bench\\000000.tex", extension="tex", data_bytes=os.urandom(changed_size),
+                )
+                dst_filepath = os.path.join(tmp_dir, "bench_dst.arc")
+                shutil.copyfile(src_filepath, dst_filepath)
+                rewrite_time = timed(update_arc, dst_filepath, [vfile])
+                shutil.copyfile(src_filepath, dst_filepath)
+                patch_time = timed(patch_arc, dst_filepath, [vfile])
+                print(f"{num_entries:>8} {arc_size / (1024 * 1024):>8.1f} {changed_size // 1024:>11} "
+                      f"{rewrite_time:>10.3f} {patch_time:>8.3f}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare rewriting and patching an arc in place")
+    parser.add_argument("num_entries", nargs="*", type=int, default=NUM_ENTRIES)
+    args = parser.parse_args()
+    bench_arc_patch(args.num_entries)
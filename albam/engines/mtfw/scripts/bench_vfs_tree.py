@@ -0,0 +1,50 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent.parent.parent))
+from albam import VENDOR_DIR  # noqa: E402
+
+# vendored dependencies, e.g. kaitaistruct, are added to the path by the add-on on register
+sys.path.insert(0, VENDOR_DIR)
+
+NUM_PATHS = (10000, 50000, 200000)
+FILES_PER_DIR = 4
+EXTENSIONS = ("tex", "mrl", "mod", "lmt")
+
+
+def generate_paths(num_paths):
+    # many sibling directories, the worst case for looking up path components
+    return [
+        f"stage\\s{i // FILES_PER_DIR:06}\\s{i:06}.{EXTENSIONS[i % len(EXTENSIONS)]}"
+        for i in range(num_paths)
+    ]
+
+
+def bench_vfs_tree(num_paths_list=NUM_PATHS):
+    from albam.vfs import Tree
+
+    print(f"{'paths':>8} {'build s':>8} {'flatten s':>10} {'us/path':>8}")
+    for num_paths in num_paths_list:
+        paths = generate_paths(num_paths)
+        tree = Tree(root_id="re1::bench.arc", app_id="re1")
+
+        start = time.perf_counter()
+        for path in paths:
+            tree.add_node_from_path(path)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tree.flatten()
+        flatten_time = time.perf_counter() - start
+
+        us_per_path = (build_time + flatten_time) / num_paths * 1e6
+        print(f"{num_paths:>8} {build_time:>8.3f} {flatten_time:>10.3f} {us_per_path:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time building and flattening a vfs tree")
+    parser.add_argument("num_paths", nargs="*", type=int, default=NUM_PATHS)
+    args = parser.parse_args()
+    bench_vfs_tree(args.num_paths)
@@ -223,13 +223,13 @@ def build_blender_textures(app_id, context, parsed_mod, mrl=None):
             is_rtex = True
             ext = ".rtex"
         try:
-            texture_vfile = context.scene.albam.vfs.get_vfile(app_id, texture_path + ext)
+            texture_vfile = context.scene.albam.vfs.resolve_vfile(app_id, texture_path + ext)
             tex_bytes = texture_vfile.get_bytes()
         except KeyError:
             tex_bytes = None
         if RtexCls == Rtex112 and not tex_bytes:
             try:
-                texture_vfile = context.scene.albam.vfs.get_vfile(app_id, texture_path + ".rtex")
+                texture_vfile = context.scene.albam.vfs.resolve_vfile(app_id, texture_path + ".rtex")
                 tex_bytes = texture_vfile.get_bytes()
                 is_rtex = True
             except KeyError:
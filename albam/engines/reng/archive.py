@@ -1,14 +1,25 @@
-import io
+from array import array
+import functools
+import hashlib
+import json
+import os
+import shutil
 import struct
+import sys
+import tempfile
+import threading
 
-import bpy
-from kaitaistruct import KaitaiStream
-import pymmh3 as mmh3
+import numpy as np
 import zlib
-import zstd
 
+from albam.exceptions import FileNotFoundInArchive
+from albam.lib.archive import extract_files, is_selected
+from albam.lib.cache import DiskCache, FileHandlePool
+from albam.lib.misc import parallel_imap
 from albam.registry import blender_registry
-from .structs.pak import Pak
+from albam.vfs import find_archives, get_archive_override_key
+from . import compression
+from .hashing import hash_path, hash_paths, hash_paths_case_insensitive
 
 
 @blender_registry.register_archive_loader(app_id="re2", extension='pak')
@@ -17,15 +28,16 @@ from .structs.pak import Pak
 @blender_registry.register_archive_loader(app_id="re2_non_rt", extension='pak')
 @blender_registry.register_archive_loader(app_id="re3_non_rt", extension='pak')
 def pak_loader(file_item):
-    app_config_filepath = bpy.context.scene.albam.apps.app_config_filepath
+    # passed explicitly, it's called from worker threads, see `albam.vfs.list_archive`
+    app_config_filepath = file_item.app_config_filepath
     app_id = file_item.app_id  # blender bug, needs reference or might mutate
     if not app_config_filepath:
         # TODO: custom exception that will result in informative popup
         print("WARNING: no app_config_filepath")
         return
-    pak = PakWrapper(app_id, file_item.absolute_path, app_config_filepath)
-    for path in pak.paths:
-        yield path.strip()
+    with PAK_POOL.lease(file_item.absolute_path, app_id, app_config_filepath) as pak:
+        paths = pak.paths
+    yield from paths
 
 
 @blender_registry.register_archive_accessor(app_id="re2", extension="pak")
@@ -38,8 +50,139 @@ def pak_accessor(vfile, context):
     if not app_config_filepath:
         # TODO: custom exception that will result in informative popup, with solution
         raise RuntimeError(f'App "{vfile.app_id}" doesn\'t have its file config loaded')
-    pak = PakWrapper(vfile.app_id, vfile.root_vfile.absolute_path, app_config_filepath)
-    return pak.get_file(vfile.relative_path)
+    root_path = vfile.root_vfile.absolute_path
+    # a patch pak of the game directory might have a newer version of the file
+    overlay = get_pak_overlay(vfile.app_id, context.scene.albam.apps.get_app_dir(vfile.app_id))
+    if overlay is not None and overlay.has_pak(root_path):
+        try:
+            return overlay.get_file(vfile.relative_path, app_config_filepath)
+        except FileNotFoundInArchive:
+            pass
+    with PAK_POOL.lease(root_path, vfile.app_id, app_config_filepath) as pak:
+        return pak.get_file(vfile.relative_path)
+
+
+@blender_registry.register_archive_stamp(app_id="re2", extension="pak")
+@blender_registry.register_archive_stamp(app_id="re2_non_rt", extension="pak")
+@blender_registry.register_archive_stamp(app_id="re3", extension="pak")
+@blender_registry.register_archive_stamp(app_id="re3_non_rt", extension="pak")
+@blender_registry.register_archive_stamp(app_id="re8", extension="pak")
+def pak_stamp(app_id, root_path, context):
+    # items can come from a patch pak, see `pak_accessor`
+    mtime = os.stat(root_path).st_mtime_ns
+    overlay = get_pak_overlay(app_id, context.scene.albam.apps.get_app_dir(app_id))
+    if overlay is None or not overlay.has_pak(root_path):
+        return mtime
+    return (mtime, overlay.stamp)
+
+
+@blender_registry.register_archive_extractor(app_id="re2", extension="pak")
+@blender_registry.register_archive_extractor(app_id="re2_non_rt", extension="pak")
+@blender_registry.register_archive_extractor(app_id="re3", extension="pak")
+@blender_registry.register_archive_extractor(app_id="re3_non_rt", extension="pak")
+@blender_registry.register_archive_extractor(app_id="re8", extension="pak")
+def pak_extractor(vfile, context, dst_dir, filters=None, path_prefix=None):
+    app_config_filepath = context.scene.albam.apps.get_app_config_filepath(vfile.app_id)
+    if not app_config_filepath:
+        raise RuntimeError(f'App "{vfile.app_id}" doesn\'t have its file config loaded')
+    return extract_pak(vfile.app_id, vfile.absolute_path, app_config_filepath, dst_dir, filters, path_prefix)
+
+
+def extract_pak(app_id, file_path, file_list_path, dst_dir, filters=None, path_prefix=None, max_workers=None):
+    """
+    Extract the contents of a pak to `dst_dir`, decompressing in parallel.
+    Only paths of the file list present in the pak are extracted.
+    See `albam.lib.archive.is_selected` for `filters` and `path_prefix`
+    """
+    def _items(pak):
+        for path in pak.paths:
+            if not is_selected(path, filters, path_prefix):
+                continue
+            file_entry = pak.get_file_entry(path)
+            if file_entry.size >= STREAM_MIN_SIZE:
+                yield path, functools.partial(pak.iter_entry, file_entry)
+            else:
+                yield path, functools.partial(pak.read_entry, file_entry)
+
+    with PAK_POOL.lease(file_path, app_id, file_list_path) as pak:
+        return extract_files(_items(pak), dst_dir, max_workers=max_workers)
+
+
+class FileListIndex:
+    """
+    Paths of a game file list with their case-insensitive hash, which is all
+    a pak stores to identify its entries. Hashing hundreds of thousands of
+    paths is slow, so the table is persisted in `FILE_LIST_CACHE`, keyed by
+    the path, size and mtime of the file list
+    """
+    VERSION = 1
+    HEADER = struct.Struct("<4sII")
+    MAGIC = b"AFLI"
+
+    def __init__(self, hashes, paths):
+        self.hashes = hashes
+        self.paths = paths
+        self._paths_by_hash = dict(zip(hashes, paths))
+
+    @classmethod
+    def load(cls, file_list_path):
+        stat = os.stat(file_list_path)
+        stamp = f"{os.path.abspath(file_list_path)}:{stat.st_size}:{stat.st_mtime_ns}:{cls.VERSION}"
+        key = hashlib.sha1(stamp.encode("utf-8")).hexdigest()
+        serialized = FILE_LIST_CACHE.get(key)
+        if serialized is not None:
+            try:
+                return cls.from_bytes(serialized)
+            except (ValueError, struct.error, zlib.error):
+                pass
+        file_list_index = cls.build(file_list_path)
+        try:
+            FILE_LIST_CACHE.put(key, file_list_index.to_bytes())
+        except OSError as err:
+            print(f"Failed to cache file list: {err}")
+        return file_list_index
+
+    @classmethod
+    def build(cls, file_list_path):
+        paths = []
+        with open(file_list_path, encoding="utf-8") as f:
+            for path in f:
+                path = path.strip()
+                if path:
+                    paths.append(path)
+        hashes = array("I")
+        hashes.frombytes(hash_paths_case_insensitive(paths).tobytes())
+        return cls(hashes, paths)
+
+    def to_bytes(self):
+        hashes = array("I", self.hashes)
+        if sys.byteorder == "big":
+            hashes.byteswap()
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, len(self.paths))
+        paths = "\n".join(self.paths).encode("utf-8")
+        return zlib.compress(header + hashes.tobytes() + paths, 1)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = zlib.decompress(data)
+        magic, version, num_paths = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not a file list index or unsupported version")
+        hashes_end = cls.HEADER.size + num_paths * 4
+        hashes = array("I")
+        hashes.frombytes(data[cls.HEADER.size:hashes_end])
+        if sys.byteorder == "big":
+            hashes.byteswap()
+        paths = data[hashes_end:].decode("utf-8").split("\n") if num_paths else []
+        if len(paths) != num_paths:
+            raise ValueError("Corrupted file list index")
+        return cls(hashes, paths)
+
+    def get_path(self, path_hash):
+        return self._paths_by_hash.get(path_hash)
+
+    def __len__(self):
+        return len(self.paths)
 
 
 class PakWrapper:
@@ -50,41 +193,364 @@ class PakWrapper:
     SEED = 0xFFFFFFFF
 
     def __init__(self, app_id, file_path, file_list_path):
+        """
+        Only the table of contents is parsed, into the columnar `entries`
+        table (see `read_pak_toc`). The pak is kept open so reading an
+        entry is a dict lookup and a seek, see `PAK_POOL`
+        """
         self.app_id = app_id
         self.file_path = file_path
         self.file_list_path = file_list_path
-        self._tree = None
-        self.paths = set()
-        with open(file_path, "rb") as f:
-            f.seek(8)
-            num_file_entries = struct.unpack("I", f.read(4))[0]
-            f.seek(0)
-            read_size = self.HEADER_SIZE + self.FILE_ENTRY_SIZE * num_file_entries
-            self.parsed = Pak(KaitaiStream(io.BytesIO(f.read(read_size))))
-
-        with open(self.file_list_path) as f:
-            for path in f:
-                self.paths.add(path)
+        self._file = open(file_path, "rb")
+        self._lock = threading.Lock()
+        try:
+            self.entries = read_pak_toc(self._file)
+        except BaseException:
+            self._file.close()
+            raise
+        hashes = self.entries["file_path_hash_case_insensitive"].tolist()
+        self._entries_by_hash = dict(zip(hashes, range(len(hashes))))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def paths(self):
+        """
+        Paths of the file list present in this pak
+        """
+        paths = []
+        with FILE_LIST_POOL.lease(self.file_list_path) as file_list:
+            for path_hash in self._entries_by_hash:
+                path = file_list.get_path(path_hash)
+                if path is not None:
+                    paths.append(path)
+        return paths
+
+    @staticmethod
+    def hash_path(file_path):
+        """
+        Case-insensitive hash of a path, as stored in the file entries
+        """
+        return hash_path(file_path)
+
+    def get_file_entry(self, file_path):
+        try:
+            i = self._entries_by_hash[self.hash_path(file_path)]
+        except KeyError:
+            raise FileNotFoundInArchive(self.file_path, file_path)
+        return PakEntry(self.entries[i])
 
     def get_file(self, file_path):
-        file_entry = None
-        file_bytes = None
-        file_path_hash = mmh3.hash(file_path.encode('utf-16')[2:], self.SEED) & self.SEED
-
-        for fe in self.parsed.file_entries:
-            if fe.file_path_hash_case_insensitive == file_path_hash:
-                file_entry = fe
-                break
-        else:
-            print("[PakWrapper] WARNING:file path not found:", file_path, file_path_hash)
-
-        # FIXME: proper exception when the path is not found or avoid it (warning in UI)
-        with open(self.file_path, "rb") as f:
-            f.seek(file_entry.offset)
-            if file_entry.flags & 1:
-                file_bytes = zlib.decompress(f.read(file_entry.zsize), -15)
-            elif file_entry.flags & 2:
-                file_bytes = zstd.decompress(f.read(file_entry.zsize))
-            else:
-                file_bytes = f.read(file_entry.zsize)
-        return file_bytes
+        return self.read_entry(self.get_file_entry(file_path))
+
+    def read_entry(self, file_entry):
+        """
+        Decompressed data of an entry of this pak, from its table of
+        contents or from a `PakOverlay` built with it
+        """
+        raw_data = self._read(file_entry.offset, file_entry.zsize)
+        return compression.decompress(raw_data, file_entry.flags, file_entry.size)
+
+    def read_entry_into(self, file_entry, out):
+        """
+        Decompress an entry into `out`, a writable buffer of at least `file_entry.size`
+        """
+        raw_data = self._read(file_entry.offset, file_entry.zsize)
+        return compression.decompress_into(raw_data, file_entry.flags, out)
+
+    def iter_entry(self, file_entry, chunk_size=compression.CHUNK_SIZE):
+        """
+        Decompressed data of an entry in chunks, so big entries
+        don't need to be read and decompressed at once
+        """
+        def _raw_chunks():
+            for offset in range(0, file_entry.zsize, chunk_size):
+                size = min(chunk_size, file_entry.zsize - offset)
+                yield self._read(file_entry.offset + offset, size)
+
+        return compression.iter_decompress(_raw_chunks(), file_entry.flags, chunk_size)
+
+    def _read(self, offset, size):
+        with self._lock:
+            self._file.seek(offset)
+            raw_data = self._file.read(size)
+        if len(raw_data) != size:
+            raise EOFError(f"{self.file_path}: entry at {offset} out of bounds")
+        return raw_data
+
+
+# Entries extracted in chunks instead of decompressed at once
+STREAM_MIN_SIZE = 32 * 1024 * 1024
+# Layout of `Pak.FileEntry`
+PAK_ENTRY_DTYPE = np.dtype([
+    ("file_path_hash_case_insensitive", "<u4"),
+    ("file_path_hash_case_sensitive", "<u4"),
+    ("offset", "<u8"),
+    ("zsize", "<u8"),
+    ("size", "<u8"),
+    ("flags", "<u8"),
+    ("unk_01", "<u8"),
+])
+
+
+class PakOverlay:
+    """
+    Merged table of contents of every pak of a game directory. Base paks are
+    followed by numbered patch paks overriding their files, only the newest
+    entry of each path hash is kept, see `albam.vfs.get_archive_override_key`.
+    Persisted in `PAK_OVERLAY_CACHE` keyed by the size and mtime of every pak,
+    so opening a game again doesn't read the header of each pak
+    """
+    VERSION = 1
+    ENTRY_DTYPE = np.dtype(PAK_ENTRY_DTYPE.descr + [("pak_index", "<u4")])
+    HEADER = struct.Struct("<4sII")
+    MAGIC = b"APKO"
+
+    def __init__(self, app_id, pak_paths, entries):
+        self.app_id = app_id
+        self.pak_paths = pak_paths
+        # sorted by hash, one per hash
+        self.entries = entries
+        self._hashes = entries["file_path_hash_case_insensitive"]
+        self._pak_indices = {os.path.normcase(path): i for i, path in enumerate(pak_paths)}
+        # set by `get_pak_overlay`, changes when any pak does
+        self.stamp = None
+
+    @staticmethod
+    def get_stamp(pak_paths):
+        stamp = []
+        for pak_path in pak_paths:
+            stat = os.stat(pak_path)
+            stamp.append([pak_path, stat.st_size, stat.st_mtime_ns])
+        return stamp
+
+    @classmethod
+    def load(cls, app_id, game_dir):
+        pak_paths = sorted(find_archives(app_id, game_dir), key=get_archive_override_key)
+        stamp = json.dumps([cls.VERSION] + cls.get_stamp(pak_paths))
+        key = hashlib.sha1(stamp.encode("utf-8")).hexdigest()
+        serialized = PAK_OVERLAY_CACHE.get(key)
+        if serialized is not None:
+            try:
+                return cls.from_bytes(app_id, serialized)
+            except (ValueError, struct.error, zlib.error):
+                pass
+        overlay = cls.build(app_id, pak_paths)
+        try:
+            PAK_OVERLAY_CACHE.put(key, overlay.to_bytes())
+        except OSError as err:
+            print(f"Failed to cache pak overlay: {err}")
+        return overlay
+
+    @classmethod
+    def build(cls, app_id, pak_paths):
+        tables = []
+        for pak_index, pak_path in enumerate(pak_paths):
+            with open(pak_path, "rb") as f:
+                pak_entries = read_pak_toc(f)
+            table = np.empty(len(pak_entries), dtype=cls.ENTRY_DTYPE)
+            for name in PAK_ENTRY_DTYPE.names:
+                table[name] = pak_entries[name]
+            table["pak_index"] = pak_index
+            tables.append(table)
+        entries = np.concatenate(tables) if tables else np.empty(0, dtype=cls.ENTRY_DTYPE)
+        # stable, entries of the same hash keep the override order and the last one wins
+        entries = entries[np.argsort(entries["file_path_hash_case_insensitive"], kind="stable")]
+        hashes = entries["file_path_hash_case_insensitive"]
+        newest = np.ones(len(entries), dtype=bool)
+        newest[:-1] = hashes[1:] != hashes[:-1]
+        return cls(app_id, pak_paths, entries[newest])
+
+    def to_bytes(self):
+        pak_paths = json.dumps(self.pak_paths).encode("utf-8")
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, len(pak_paths))
+        return zlib.compress(header + pak_paths + self.entries.astype(self.ENTRY_DTYPE).tobytes(), 1)
+
+    @classmethod
+    def from_bytes(cls, app_id, data):
+        data = zlib.decompress(data)
+        magic, version, pak_paths_size = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not a pak overlay or unsupported version")
+        entries_start = cls.HEADER.size + pak_paths_size
+        pak_paths = json.loads(data[cls.HEADER.size:entries_start])
+        entries = np.frombuffer(data, dtype=cls.ENTRY_DTYPE, offset=entries_start)
+        return cls(app_id, pak_paths, entries)
+
+    def has_pak(self, pak_path):
+        return os.path.normcase(os.path.abspath(pak_path)) in self._pak_indices
+
+    def get_entry(self, file_path):
+        """
+        (pak path, entry) of the newest version of `file_path`, None if no pak has it
+        """
+        path_hash = hash_path(file_path)
+        i = np.searchsorted(self._hashes, path_hash)
+        if i == len(self._hashes) or self._hashes[i] != path_hash:
+            return None
+        entry = self.entries[i]
+        return self.pak_paths[entry["pak_index"]], entry
+
+    def get_file(self, file_path, file_list_path):
+        found = self.get_entry(file_path)
+        if found is None:
+            raise FileNotFoundInArchive(self.pak_paths[-1] if self.pak_paths else "", file_path)
+        pak_path, entry = found
+        with PAK_POOL.lease(pak_path, self.app_id, file_list_path) as pak:
+            return pak.read_entry(PakEntry(entry))
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PakEntry:
+    """
+    Attribute access to a row of a `PAK_ENTRY_DTYPE` table,
+    like `Pak.FileEntry`
+    """
+    __slots__ = PAK_ENTRY_DTYPE.names
+
+    def __init__(self, row):
+        for name in self.__slots__:
+            setattr(self, name, int(row[name]))
+
+
+def read_pak_toc(f):
+    """
+    Table of contents of the pak opened as the binary file `f`, as a
+    PAK_ENTRY_DTYPE array read with a single `np.frombuffer` instead of
+    one kaitai object per entry
+    """
+    f.seek(0)
+    ident, _, num_file_entries, _ = PAK_HEADER.unpack(f.read(PAK_HEADER.size))
+    if ident != b"KPKA":
+        raise ValueError(f"{f.name} is not a pak")
+    data = f.read(PAK_ENTRY_DTYPE.itemsize * num_file_entries)
+    if len(data) != PAK_ENTRY_DTYPE.itemsize * num_file_entries:
+        raise ValueError(f"{f.name}: truncated table of contents")
+    return np.frombuffer(data, dtype=PAK_ENTRY_DTYPE)
+
+
+def get_pak_overlay(app_id, game_dir):
+    """
+    PakOverlay of the paks in `game_dir`, None if not set. Rebuilt when
+    the directory or any of its paks change
+    """
+    if not game_dir or not os.path.isdir(game_dir):
+        return None
+    game_dir = os.path.abspath(game_dir)
+
+    def _get_stamp(pak_paths):
+        # new paks change the mtime of the directory they're in
+        return [os.stat(game_dir).st_mtime_ns] + PakOverlay.get_stamp(pak_paths)
+
+    with PAK_OVERLAYS_LOCK:
+        cached = PAK_OVERLAYS.get((app_id, game_dir))
+        if cached is not None:
+            try:
+                if cached[0] == _get_stamp(cached[1].pak_paths):
+                    return cached[1]
+            except OSError:
+                pass
+        overlay = PakOverlay.load(app_id, game_dir)
+        stamp = _get_stamp(overlay.pak_paths)
+        overlay.stamp = json.dumps(stamp)
+        PAK_OVERLAYS[(app_id, game_dir)] = (stamp, overlay)
+        return overlay
+
+
+PAK_HEADER = struct.Struct("<4sIII")
+PAK_VERSION = 4
+# Deflate does about as well on small entries
+ZSTD_MIN_SIZE = 64 * 1024
+
+
+def _compress_pak_entry(vfile):
+    """
+    (raw data, flags, size) of an entry, stored as is if it doesn't compress
+    """
+    data = vfile.data_bytes
+    flags = compression.FLAG_ZSTD if len(data) >= ZSTD_MIN_SIZE else compression.FLAG_DEFLATE
+    raw_data = compression.compress(data, flags)
+    if len(raw_data) >= len(data):
+        return data, 0, len(data)
+    return raw_data, flags, len(data)
+
+
+def write_pak(f, vfiles, max_workers=None):
+    """
+    Stream a pak with `vfiles` (VirtualFileData-like, with `relative_path`
+    and `data_bytes`) to the binary file object `f`.
+    Like `albam.engines.mtfw.archive.write_arc`, space for the table of contents
+    is reserved first, entries are compressed in a thread pool and written in
+    order as they're ready, then the table is written with the final offsets.
+    Entries are sorted by hash, the last of several vfiles with the same path wins
+    """
+    start = f.tell()
+    vfiles = list(vfiles)
+    paths = [vf.relative_path.replace("\\", "/") for vf in vfiles]
+    hashes_ci, hashes_cs = hash_paths(paths)
+    indices = list({path_hash: i for i, path_hash in enumerate(hashes_ci.tolist())}.values())
+    vfiles = [vfiles[i] for i in indices]
+
+    entries = np.zeros(len(vfiles), dtype=PAK_ENTRY_DTYPE)
+    entries["file_path_hash_case_insensitive"] = hashes_ci[indices]
+    entries["file_path_hash_case_sensitive"] = hashes_cs[indices]
+    offset = PakWrapper.HEADER_SIZE + PAK_ENTRY_DTYPE.itemsize * len(vfiles)
+    f.write(bytes(offset))
+
+    chunks = parallel_imap(_compress_pak_entry, vfiles, max_workers=max_workers)
+    for i, (raw_data, flags, size) in enumerate(chunks):
+        f.write(raw_data)
+        entries[i] = (entries[i]["file_path_hash_case_insensitive"],
+                      entries[i]["file_path_hash_case_sensitive"], offset, len(raw_data), size, flags, 0)
+        offset += len(raw_data)
+
+    entries = entries[np.argsort(entries["file_path_hash_case_insensitive"], kind="stable")]
+    f.seek(start)
+    f.write(PAK_HEADER.pack(b"KPKA", PAK_VERSION, len(entries), 0))
+    f.write(entries.tobytes())
+    f.seek(start + offset)
+    return entries
+
+
+def write_pak_file(filepath, vfiles, max_workers=None):
+    """
+    Write a pak to a temporary file next to `filepath` and replace it
+    when done, so a failure doesn't leave a truncated pak
+    """
+    fd, tmp_filepath = tempfile.mkstemp(suffix=".pak", dir=os.path.dirname(os.path.abspath(filepath)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_pak(f, vfiles, max_workers=max_workers)
+    except BaseException:
+        os.remove(tmp_filepath)
+        raise
+    if os.path.exists(filepath):
+        shutil.copymode(filepath, tmp_filepath)
+    else:
+        os.chmod(tmp_filepath, 0o644)
+    PAK_POOL.evict(filepath)
+    os.replace(tmp_filepath, filepath)
+
+
+def _open_pak(file_path, app_id, file_list_path):
+    return PakWrapper(app_id, file_path, file_list_path)
+
+
+# Parsed paks shared by the loader, accessors and extractor, so importing
+# a mesh and its textures parses the table of contents of each pak only once
+PAK_POOL = FileHandlePool(_open_pak, max_items=16)
+# Game file lists are big and change rarely, one per app is usually enough
+FILE_LIST_POOL = FileHandlePool(FileListIndex.load, max_items=4)
+FILE_LIST_CACHE = DiskCache("pak_file_lists", max_bytes=256 * 1024 * 1024)
+PAK_OVERLAYS = {}
+PAK_OVERLAYS_LOCK = threading.Lock()
+PAK_OVERLAY_CACHE = DiskCache("pak_overlays", max_bytes=128 * 1024 * 1024)
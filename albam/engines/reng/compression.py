@@ -0,0 +1,120 @@
+"""
+Compression of pak entries, stored raw, as raw deflate or as zstd frames.
+Output buffers are allocated once with the decompressed size of the entry,
+and zstd contexts are kept per thread and reused
+"""
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    # the standalone zstd bindings, without contexts nor streaming
+    zstandard = None
+    import zstd
+
+
+FLAG_DEFLATE = 1
+FLAG_ZSTD = 2
+CHUNK_SIZE = 1024 * 1024
+ZLIB_LEVEL = zlib.Z_DEFAULT_COMPRESSION
+ZSTD_LEVEL = 3
+
+_local = threading.local()
+
+
+def get_zstd_decompressor():
+    """
+    zstandard.ZstdDecompressor of the calling thread, they can't be shared between threads
+    """
+    decompressor = getattr(_local, "zstd_decompressor", None)
+    if decompressor is None:
+        decompressor = _local.zstd_decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def get_zstd_compressor():
+    compressor = getattr(_local, "zstd_compressor", None)
+    if compressor is None:
+        compressor = _local.zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return compressor
+
+
+def compress(data, flags):
+    if flags & FLAG_DEFLATE:
+        compressobj = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15)
+        return compressobj.compress(data) + compressobj.flush()
+    if flags & FLAG_ZSTD:
+        if zstandard is None:
+            return zstd.compress(data, ZSTD_LEVEL)
+        return get_zstd_compressor().compress(data)
+    return data
+
+
+def decompress(raw_data, flags, size):
+    """
+    Decompressed data of an entry, `size` is its decompressed size
+    """
+    if flags & FLAG_DEFLATE:
+        return zlib.decompress(raw_data, -15, max(size, 1))
+    if flags & FLAG_ZSTD:
+        if zstandard is None:
+            return zstd.decompress(raw_data)
+        return get_zstd_decompressor().decompress(raw_data, max_output_size=size)
+    return raw_data
+
+
+def decompress_into(raw_data, flags, out):
+    """
+    Decompress an entry into `out`, a writable buffer of at least its decompressed
+    size (e.g. a bytearray or a numpy array). Returns the number of bytes written
+    """
+    out = memoryview(out).cast("B")
+    if not flags & (FLAG_DEFLATE | FLAG_ZSTD) or (flags & FLAG_ZSTD and zstandard is None):
+        data = decompress(raw_data, flags, len(out))
+        out[:len(data)] = data
+        return len(data)
+
+    written = 0
+    if flags & FLAG_DEFLATE:
+        for chunk in iter_decompress((raw_data,), flags):
+            out[written:written + len(chunk)] = chunk
+            written += len(chunk)
+        return written
+
+    with get_zstd_decompressor().stream_reader(raw_data) as reader:
+        while written < len(out):
+            num_bytes = reader.readinto(out[written:])
+            if not num_bytes:
+                break
+            written += num_bytes
+    return written
+
+
+def iter_decompress(raw_chunks, flags, chunk_size=CHUNK_SIZE):
+    """
+    Decompress an entry incrementally. `raw_chunks` is an iterable of consecutive
+    pieces of its compressed data, yields decompressed chunks as they're available.
+    Deflate chunks are at most `chunk_size`
+    """
+    if flags & FLAG_DEFLATE:
+        decompressobj = zlib.decompressobj(-15)
+        for raw_chunk in raw_chunks:
+            while raw_chunk:
+                chunk = decompressobj.decompress(raw_chunk, chunk_size)
+                raw_chunk = decompressobj.unconsumed_tail
+                if chunk:
+                    yield chunk
+        chunk = decompressobj.flush()
+        if chunk:
+            yield chunk
+    elif flags & FLAG_ZSTD and zstandard is not None:
+        decompressobj = get_zstd_decompressor().decompressobj(write_size=chunk_size)
+        for raw_chunk in raw_chunks:
+            chunk = decompressobj.decompress(raw_chunk)
+            if chunk:
+                yield chunk
+    elif flags & FLAG_ZSTD:
+        yield zstd.decompress(b"".join(raw_chunks))
+    else:
+        yield from raw_chunks
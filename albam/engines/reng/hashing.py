@@ -0,0 +1,131 @@
+"""
+MurmurHash3 (x86, 32 bits) as used by RE Engine to identify paths, e.g. in
+the file entries of paks. Paths are hashed as UTF-16 (little endian, no BOM),
+lowercased for the case-insensitive hash and uppercased for the case-sensitive one.
+
+`murmur3_32` matches the vendored `pymmh3.hash` (as unsigned), `hash_paths` hashes
+whole file lists at once with numpy, one uint32 lane per path
+"""
+import struct
+
+import numpy as np
+
+
+SEED = 0xFFFFFFFF
+C1 = 0xCC9E2D51
+C2 = 0x1B873593
+# Rows hashed at once by `hash_paths`, bounds the size of the padded block matrix
+BATCH_SIZE = 65536
+
+
+def murmur3_32(data, seed=0):
+    length = len(data)
+    nblocks = length // 4
+    h1 = seed
+
+    for (k1,) in struct.iter_unpack("<I", data[:nblocks * 4]):
+        k1 = (k1 * C1) & 0xFFFFFFFF
+        k1 = ((k1 << 15) | (k1 >> 17)) & 0xFFFFFFFF
+        k1 = (k1 * C2) & 0xFFFFFFFF
+        h1 ^= k1
+        h1 = ((h1 << 13) | (h1 >> 19)) & 0xFFFFFFFF
+        h1 = (h1 * 5 + 0xE6546B64) & 0xFFFFFFFF
+
+    tail = data[nblocks * 4:]
+    if tail:
+        k1 = int.from_bytes(tail, "little")
+        k1 = (k1 * C1) & 0xFFFFFFFF
+        k1 = ((k1 << 15) | (k1 >> 17)) & 0xFFFFFFFF
+        k1 = (k1 * C2) & 0xFFFFFFFF
+        h1 ^= k1
+
+    h1 ^= length
+    h1 ^= h1 >> 16
+    h1 = (h1 * 0x85EBCA6B) & 0xFFFFFFFF
+    h1 ^= h1 >> 13
+    h1 = (h1 * 0xC2B2AE35) & 0xFFFFFFFF
+    h1 ^= h1 >> 16
+    return h1
+
+
+def hash_path(path):
+    """
+    Case-insensitive hash of a path, the one stored by paks
+    """
+    return murmur3_32(path.lower().encode("utf-16-le"), SEED)
+
+
+def hash_path_case_sensitive(path):
+    return murmur3_32(path.upper().encode("utf-16-le"), SEED)
+
+
+def hash_paths(paths):
+    """
+    Case-insensitive and case-sensitive hashes of `paths`,
+    as two uint32 arrays in the same order
+    """
+    paths = list(paths)
+    hashes_cs = murmur3_32_many([p.upper().encode("utf-16-le") for p in paths], SEED)
+    return hash_paths_case_insensitive(paths), hashes_cs
+
+
+def hash_paths_case_insensitive(paths):
+    return murmur3_32_many([p.lower().encode("utf-16-le") for p in paths], SEED)
+
+
+def murmur3_32_many(keys, seed=0):
+    """
+    `murmur3_32` of every bytes object in `keys`, as a uint32 array
+    """
+    hashes = np.empty(len(keys), dtype=np.uint32)
+    for start in range(0, len(keys), BATCH_SIZE):
+        batch = keys[start:start + BATCH_SIZE]
+        hashes[start:start + len(batch)] = _murmur3_32_batch(batch, seed)
+    return hashes
+
+
+def _murmur3_32_batch(keys, seed):
+    if not keys:
+        return np.empty(0, dtype=np.uint32)
+    lengths = np.fromiter(map(len, keys), dtype=np.int64, count=len(keys))
+    # longest first, so the rows that still have a block left are always a prefix
+    order = np.argsort(-lengths, kind="stable")
+    lengths = lengths[order]
+    nblocks = lengths // 4
+
+    # zero-padded matrix of blocks, one row per key. The padding of the
+    # last block doubles as the zeroed tail bytes murmur3 expects
+    width = (int(nblocks[0]) + 1) * 4
+    padded = np.array([keys[i] for i in order], dtype=f"S{width}")
+    blocks = padded.view("<u4").reshape(len(keys), width // 4).astype(np.uint32)
+
+    c1 = np.uint32(C1)
+    c2 = np.uint32(C2)
+    h1 = np.full(len(keys), seed, dtype=np.uint32)
+    # number of rows with more than `column` full blocks
+    num_active = np.searchsorted(-nblocks, -np.arange(blocks.shape[1]), side="left")
+    for column in range(int(nblocks[0])):
+        n = num_active[column]
+        k1 = blocks[:n, column] * c1
+        k1 = (k1 << np.uint32(15)) | (k1 >> np.uint32(17))
+        k1 *= c2
+        h = h1[:n] ^ k1
+        h = (h << np.uint32(13)) | (h >> np.uint32(19))
+        h1[:n] = h * np.uint32(5) + np.uint32(0xE6546B64)
+
+    has_tail = (lengths & 3) != 0
+    k1 = blocks[np.arange(len(keys)), nblocks] * c1
+    k1 = (k1 << np.uint32(15)) | (k1 >> np.uint32(17))
+    k1 *= c2
+    h1 ^= np.where(has_tail, k1, np.uint32(0))
+
+    h1 ^= lengths.astype(np.uint32)
+    h1 ^= h1 >> np.uint32(16)
+    h1 *= np.uint32(0x85EBCA6B)
+    h1 ^= h1 >> np.uint32(13)
+    h1 *= np.uint32(0xC2B2AE35)
+    h1 ^= h1 >> np.uint32(16)
+
+    hashes = np.empty(len(keys), dtype=np.uint32)
+    hashes[order] = h1
+    return hashes
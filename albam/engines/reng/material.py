@@ -13,15 +13,11 @@ def build_blender_materials(mesh_vfile, context):
     app_id = mesh_vfile.app_id
 
     possible_mdf_virtual_paths = _get_heuristic_mdf_names(app_id, mesh_vfile.name)
-    mdf_found = False
     for mdf_virtual_path in possible_mdf_virtual_paths:
-        try:
-            mdf_virtual_file = context.scene.albam.vfs.file_list[mdf_virtual_path]
-            mdf_found = True
+        mdf_virtual_file = context.scene.albam.vfs.get(mdf_virtual_path)
+        if mdf_virtual_file is not None:
             break
-        except KeyError:
-            pass
-    if not mdf_found:
+    else:
         print(f"MDF file not found. Attempted: {possible_mdf_virtual_paths}")
         return blender_materials
 
@@ -60,7 +60,7 @@ def build_blender_images(app_id, texture_headers, context):
             continue
         tex_path = f"{prefix}/{tex_header.texture_path.lower()}.{tex_version}"
         try:
-            tex_virtual_file = context.scene.albam.vfs.get_vfile(app_id, tex_path)
+            tex_virtual_file = context.scene.albam.vfs.resolve_vfile(app_id, tex_path)
         except KeyError:
             print("Texture not found in virtual file system, ignoring", tex_path)
             continue
@@ -7,3 +7,19 @@ class AlbamCheckFailure(Exception):
         self.message = message
         self.details = details
         self.solution = solution
+
+
+class FileNotFoundInArchive(KeyError):
+    """
+    Raised when a path is requested from an archive that doesn't contain it.
+    Subclasses KeyError so callers looking up optional dependencies
+    (e.g. textures referenced by a model) can treat it as any missing vfile
+    """
+
+    def __init__(self, archive_path, file_path):
+        super().__init__(file_path)
+        self.archive_path = archive_path
+        self.file_path = file_path
+
+    def __str__(self):
+        return f"'{self.file_path}' not found in archive '{self.archive_path}'"
@@ -0,0 +1,101 @@
+from fnmatch import fnmatch
+import os
+import time
+
+from albam.lib.misc import parallel_imap
+
+
+class ExtractionStats:
+
+    def __init__(self, num_files=0, num_bytes=0, seconds=0.0):
+        self.num_files = num_files
+        self.num_bytes = num_bytes
+        self.seconds = seconds
+
+    @property
+    def mb_per_second(self):
+        if not self.seconds:
+            return 0.0
+        return self.num_bytes / (1024 * 1024) / self.seconds
+
+    def update(self, other):
+        self.num_files += other.num_files
+        self.num_bytes += other.num_bytes
+        self.seconds += other.seconds
+
+    def __str__(self):
+        return (f"{self.num_files} files, {self.num_bytes / (1024 * 1024):.1f} MB "
+                f"in {self.seconds:.2f}s ({self.mb_per_second:.1f} MB/s)")
+
+
+def parse_filters(filters_str):
+    """
+    "*.tex; pl/*.mrl" -> ["*.tex", "pl/*.mrl"]
+    """
+    return [f.strip() for f in filters_str.replace(",", ";").split(";") if f.strip()]
+
+
+def match_filters(relative_path, filters):
+    """
+    Case-insensitive glob match of a posix relative path against any of the filters.
+    Patterns without a path separator match the file name, so "*.tex" matches
+    any texture regardless of its folder
+    """
+    if not filters:
+        return True
+    relative_path = relative_path.lower()
+    name = relative_path.rpartition("/")[2]
+    for pattern in filters:
+        pattern = pattern.lower().replace("\\", "/")
+        if fnmatch(relative_path, pattern) or ("/" not in pattern and fnmatch(name, pattern)):
+            return True
+    return False
+
+
+def is_selected(relative_path, filters=None, path_prefix=None):
+    """
+    Check if an archive item should be extracted: it needs to be `path_prefix`
+    or be inside it (if given), and match the filters
+    """
+    if path_prefix:
+        path_lower = relative_path.lower()
+        prefix_lower = path_prefix.lower().rstrip("/")
+        if path_lower != prefix_lower and not path_lower.startswith(prefix_lower + "/"):
+            return False
+    return match_filters(relative_path, filters)
+
+
+def extract_files(items, dst_dir, max_workers=None):
+    """
+    Write archive items to `dst_dir`, recreating their relative directory layout.
+    `items` is an iterable of (relative_posix_path, read_func) where read_func
+    returns the decompressed bytes, or an iterable of chunks of them for big files;
+    it's consumed lazily and read_func is called from worker threads, so
+    decompression and writing happen in parallel
+    """
+    start = time.perf_counter()
+    dst_dir = os.path.abspath(dst_dir)
+    stats = ExtractionStats()
+
+    def _extract(item):
+        relative_path, read_func = item
+        dst_path = os.path.abspath(os.path.join(dst_dir, *relative_path.split("/")))
+        if os.path.commonpath((dst_dir, dst_path)) != dst_dir:
+            raise ValueError(f"Refusing to extract outside the destination directory: {relative_path}")
+        data = read_func()
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = (data,)
+        num_bytes = 0
+        with open(dst_path, "wb") as w:
+            for chunk in data:
+                w.write(chunk)
+                num_bytes += len(chunk)
+        return num_bytes
+
+    for num_bytes in parallel_imap(_extract, items, max_workers=max_workers):
+        stats.num_files += 1
+        stats.num_bytes += num_bytes
+
+    stats.seconds = time.perf_counter() - start
+    return stats
@@ -0,0 +1,566 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+class FileHandlePool:
+    """
+    Bounded LRU pool of objects built from a file on disk, e.g. parsed archives.
+    Entries are keyed by absolute path (plus any extra args passed to the factory)
+    and stamped with the file mtime and size, so a modified file is re-opened
+    transparently on the next request.
+    Items are leased with `lease()` (or `acquire()` and `release()`): an item
+    evicted while leased is only closed when its last lease is released
+    """
+
+    def __init__(self, factory, max_items=8):
+        self.factory = factory
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        # id(item) -> [item, number of leases, evicted]
+        self._leases = {}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def lease(self, file_path, *args):
+        item = self.acquire(file_path, *args)
+        try:
+            yield item
+        finally:
+            self.release(item)
+
+    def acquire(self, file_path, *args):
+        """
+        Item built from `file_path`, kept open until `release(item)` is called
+        """
+        absolute_path = os.path.abspath(file_path)
+        stat = os.stat(absolute_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        key = (absolute_path,) + args
+
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._lease(cached[1])
+            if cached is not None:
+                self._discard(key)
+            self.misses += 1
+
+        # built without holding the lock, so several files can be parsed in parallel
+        item = self.factory(absolute_path, *args)
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None and cached[0] == stamp:
+                # built by another thread meanwhile
+                self._close(item)
+                return self._lease(cached[1])
+            if cached is not None:
+                self._discard(key)
+            self._items[key] = (stamp, item)
+            self._leases[id(item)] = [item, 0, False]
+            leased = self._lease(item)
+            while len(self._items) > self.max_items:
+                self._discard(next(iter(self._items)))
+            return leased
+
+    def release(self, item):
+        with self._lock:
+            lease = self._leases[id(item)]
+            lease[1] -= 1
+            if lease[1] == 0 and lease[2]:
+                del self._leases[id(item)]
+                self._close(item)
+
+    def evict(self, file_path):
+        """
+        Drop every pooled item built from `file_path`. Must be called
+        before overwriting a file that might be pooled
+        """
+        absolute_path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [k for k in self._items if k[0] == absolute_path]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._items):
+                self._discard(key)
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "leased": sum(1 for lease in self._leases.values() if lease[1]),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _lease(self, item):
+        self._leases[id(item)][1] += 1
+        return item
+
+    def _discard(self, key):
+        """
+        Remove an item from the pool, it's closed once no longer leased
+        """
+        _, item = self._items.pop(key)
+        lease = self._leases[id(item)]
+        if lease[1]:
+            lease[2] = True
+        else:
+            del self._leases[id(item)]
+            self._close(item)
+
+    @staticmethod
+    def _close(item):
+        close = getattr(item, "close", None)
+        if close:
+            close()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class LRUCache:
+    """
+    Least-recently-used mapping bounded by the total size in bytes
+    of its values, which need to support `len()`
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        value_size = len(value)
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            if value_size > self.max_bytes:
+                return
+            self._items[key] = value
+            self.size += value_size
+            self._shrink()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._items.pop(key, None)
+            if value is None:
+                return default
+            self.size -= len(value)
+            return value
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._shrink()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "items": len(self._items),
+                "size": self.size,
+                "max_size": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+            }
+
+    def _shrink(self):
+        while self.size > self.max_bytes:
+            _, value = self._items.popitem(last=False)
+            self.size -= len(value)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+def get_cache_dir():
+    """
+    Directory for caches persisted between sessions: $ALBAM_CACHE_DIR if set,
+    otherwise the platform's per-user cache directory
+    """
+    cache_dir = os.getenv("ALBAM_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    if sys.platform == "win32":
+        base_dir = os.getenv("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base_dir = os.path.expanduser("~/Library/Caches")
+    else:
+        base_dir = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base_dir, "albam")
+
+
+def write_file_atomic(path, data):
+    """
+    Write to a temporary file and rename it, so readers never see a partial file
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as w:
+            w.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def scan_key_files(directory):
+    """
+    Yield (path, size, mtime) of the files stored as `<directory>/<key[:2]>/<key>`,
+    skipping the temporary files of writes in progress
+    """
+    try:
+        subdirs = os.scandir(directory)
+    except (FileNotFoundError, TypeError):
+        return
+    with subdirs:
+        for subdir in subdirs:
+            if not subdir.is_dir() or len(subdir.name) != 2:
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+
+class DiskCache:
+    """
+    Size-capped key -> bytes store in a directory under `get_cache_dir()`,
+    one file per key. Reading an item bumps its mtime, so trimming removes
+    the least recently used items first. Writes are atomic, the same cache
+    can be shared by several Blender instances
+    """
+    TRIM_RATIO = 0.8
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.RLock()
+
+    @property
+    def directory(self):
+        return os.path.join(get_cache_dir(), self.name)
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key, default=None):
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if not self.max_bytes or len(value) > self.max_bytes:
+            return
+        write_file_atomic(self._get_path(key), value)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += len(value)
+            if self._size > self.max_bytes:
+                self._trim(int(self.max_bytes * self.TRIM_RATIO))
+
+    def _scan(self):
+        return scan_key_files(self.directory)
+
+    def _trim(self, max_bytes):
+        items = sorted(self._scan(), key=lambda item: item[2])
+        self._size = sum(size for _, size, _ in items)
+        for path, size, _ in items:
+            if self._size <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._trim(max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._trim(0)
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            sizes = [size for _, size, _ in self._scan()]
+            self._size = sum(sizes)
+            requests = self.hits + self.misses
+            return {
+                "items": len(sizes),
+                "size": self._size,
+                "max_size": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+            }
+
+
+class ArchiveIndex:
+    """
+    Persistent listing of the paths inside archives, so they don't need to be
+    parsed again in the next session. Stored as one gzipped json file per app
+    under `get_cache_dir()`. Each listing is stamped with the size and mtime of
+    the archive and of any other file it depends on, stale listings are ignored.
+    Changes are kept in memory until `save()`
+    """
+    VERSION = 1
+
+    def __init__(self, name):
+        self.name = name
+        self._apps = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+    def _get_path(self, app_id):
+        return os.path.join(get_cache_dir(), self.name, f"{app_id}.json.gz")
+
+    @staticmethod
+    def get_stamp(file_paths):
+        stamp = []
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            stamp.append([os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns])
+        return stamp
+
+    def _load(self, app_id):
+        archives = self._apps.get(app_id)
+        if archives is not None:
+            return archives
+        try:
+            with gzip.open(self._get_path(app_id), "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            archives = data["archives"] if data.get("version") == self.VERSION else {}
+        except (OSError, ValueError, KeyError, AttributeError):
+            archives = {}
+        self._apps[app_id] = archives
+        return archives
+
+    def get(self, app_id, archive_path, dependencies=()):
+        """
+        Paths inside the archive, or None if not indexed or stale
+        """
+        with self._lock:
+            entry = self._load(app_id).get(os.path.abspath(archive_path))
+        if entry is None:
+            return None
+        try:
+            stamp = self.get_stamp((archive_path,) + tuple(dependencies))
+        except OSError:
+            return None
+        if entry["stamp"] != stamp:
+            return None
+        return entry["paths"]
+
+    def put(self, app_id, archive_path, paths, dependencies=()):
+        stamp = self.get_stamp((archive_path,) + tuple(dependencies))
+        with self._lock:
+            self._load(app_id)[os.path.abspath(archive_path)] = {"stamp": stamp, "paths": list(paths)}
+            self._dirty.add(app_id)
+
+    def save(self):
+        with self._lock:
+            for app_id in self._dirty:
+                data = json.dumps({"version": self.VERSION, "archives": self._apps[app_id]})
+                write_file_atomic(self._get_path(app_id), gzip.compress(data.encode("utf-8")))
+            self._dirty.clear()
+
+    def clear(self):
+        with self._lock:
+            directory = os.path.join(get_cache_dir(), self.name)
+            try:
+                file_names = os.listdir(directory)
+            except FileNotFoundError:
+                file_names = []
+            for file_name in file_names:
+                if file_name.endswith(".json.gz"):
+                    os.remove(os.path.join(directory, file_name))
+            self._apps.clear()
+            self._dirty.clear()
+
+
+class BlobStore:
+    """
+    Content-addressed store of file contents, so large bytes (e.g. the original
+    files of imported assets) can be referenced by their sha1 instead of being
+    saved in the .blend. Blobs are written to `directory` and looked up there
+    and in `search_dirs`, e.g. the directories used before a "save as".
+    Recently read blobs are kept in memory
+    """
+
+    def __init__(self, directory=None, memory_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.search_dirs = []
+        self._memory = LRUCache(memory_bytes)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def get_key(data):
+        return hashlib.sha1(data).hexdigest()
+
+    @staticmethod
+    def _get_path(directory, key):
+        return os.path.join(directory, key[:2], key)
+
+    def set_directory(self, directory):
+        """
+        Write new blobs to `directory`, the previous one is still searched
+        """
+        with self._lock:
+            if self.directory and self.directory != directory and self.directory not in self.search_dirs:
+                self.search_dirs.insert(0, self.directory)
+            if directory in self.search_dirs:
+                self.search_dirs.remove(directory)
+            self.directory = directory
+
+    def put(self, data):
+        """
+        Store `data` and return its key. Empty data is not stored, its key is ""
+        """
+        if not data:
+            return ""
+        data = bytes(data)
+        key = self.get_key(data)
+        path = self._get_path(self.directory, key)
+        try:
+            # keep it from being collected as garbage too early
+            os.utime(path)
+        except FileNotFoundError:
+            write_file_atomic(path, data)
+        self._memory.put(key, data)
+        return key
+
+    def get(self, key):
+        if not key:
+            return b""
+        data = self._memory.get(key)
+        if data is not None:
+            return data
+        path = self.find(key)
+        if path is None:
+            raise KeyError(f"Stored file {key} not found in {self.get_dirs()}")
+        with open(path, "rb") as f:
+            data = f.read()
+        self._memory.put(key, data)
+        return data
+
+    def get_dirs(self):
+        with self._lock:
+            return [d for d in [self.directory] + self.search_dirs if d]
+
+    def find(self, key):
+        for directory in self.get_dirs():
+            path = self._get_path(directory, key)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def __contains__(self, key):
+        return key in self._memory or self.find(key) is not None
+
+    def copy_to_directory(self, keys):
+        """
+        Make sure `keys` are in `directory`, copying them from `search_dirs`.
+        Returns the keys that couldn't be found
+        """
+        missing = []
+        for key in keys:
+            if not key or os.path.isfile(self._get_path(self.directory, key)):
+                continue
+            try:
+                data = self.get(key)
+            except KeyError:
+                missing.append(key)
+                continue
+            write_file_atomic(self._get_path(self.directory, key), data)
+        return missing
+
+    def collect_garbage(self, keep_keys, directory=None, min_age=0):
+        """
+        Remove blobs of `directory` not in `keep_keys` and not modified in
+        the last `min_age` seconds. Returns the number and size of removed blobs
+        """
+        directory = directory or self.directory
+        keep_keys = set(keep_keys)
+        now = time.time()
+        num_removed = size_removed = 0
+        for path, size, mtime in scan_key_files(directory):
+            key = os.path.basename(path)
+            if key in keep_keys or now - mtime < min_age:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._memory.pop(key)
+            num_removed += 1
+            size_removed += size
+        return num_removed, size_removed
+
+    def stats(self, directory=None):
+        sizes = [size for _, size, _ in scan_key_files(directory or self.directory)]
+        return {"items": len(sizes), "size": sum(sizes), "directory": directory or self.directory}
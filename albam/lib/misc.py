@@ -1,2 +1,25 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+
 def chunks(list_, n):
     return [list_[i : i + n] for i in range(0, len(list_), n)]
+
+
+def parallel_imap(func, iterable, max_workers=None, max_in_flight=None):
+    """
+    Like `map`, but calls `func` in a thread pool. Results are yielded in input order,
+    and at most `max_in_flight` items are pending at any time so memory stays bounded
+    when consuming big inputs lazily. Useful for zlib/zstd and file I/O, which release the GIL
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -5,6 +5,8 @@ class BlenderRegistry:
         self.export_registry = {}
         self.archive_loader_registry = {}
         self.archive_accessor_registry = {}
+        self.archive_extractor_registry = {}
+        self.archive_stamp_registry = {}
         self.props = []  # order is meaningful for dependencies
         self.types = []  # order is meaningufl for dependencies
         self.import_options_custom_draw_funcs = {}
@@ -77,6 +79,24 @@ class BlenderRegistry:
 
         return decorator
 
+    def register_archive_extractor(self, app_id, extension):
+        def decorator(f):
+            self.archive_extractor_registry[(app_id, extension)] = f
+            return f
+
+        return decorator
+
+    def register_archive_stamp(self, app_id, extension):
+        """
+        Function returning what the contents of an archive depend on, for caches.
+        The mtime of the archive by default
+        """
+        def decorator(f):
+            self.archive_stamp_registry[(app_id, extension)] = f
+            return f
+
+        return decorator
+
     def register_custom_properties_material(self, name, app_ids, is_secondary=False, display_name=""):
         def decorator(cls):
             for app_id in app_ids:
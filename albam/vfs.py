@@ -1,17 +1,145 @@
-import copy
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from bisect import bisect_right
+from contextlib import contextmanager
+import hashlib
 import os
 from pathlib import PureWindowsPath
+import re
+import time
 
 import bpy
 
 from albam.apps import APPS
+from albam.lib.archive import ExtractionStats, parse_filters
+from albam.lib.cache import ArchiveIndex, BlobStore, LRUCache, get_cache_dir
 from albam.registry import blender_registry
 
+# Decompressed archive items, so files requested several times during an import
+# (e.g. textures shared by materials) are only extracted once.
+# Budget is set by AlbamImportSettings.vfs_cache_size
+VFILE_CACHE = LRUCache(max_bytes=256 * 1024 * 1024)
+# Paths inside archives added in previous sessions, so unchanged archives
+# don't need to be parsed again
+ARCHIVE_INDEX = ArchiveIndex("toc_index")
+# root_id -> ArchiveListing of lazily expanded archives
+ARCHIVE_LISTINGS = {}
+# vfs pointer -> names of its lazily expanded archives, as dict keys in file list
+# order, so the first archive added wins when several have the same file
+LAZY_ROOTS = {}
+# vfs pointer -> VirtualFilePathIndex
+PATH_INDICES = {}
+# vfs pointer -> VirtualFileVisibility
+VISIBILITY_INDICES = {}
+# vfs pointer -> VirtualFileSearchIndex
+SEARCH_INDICES = {}
+# vfs pointer -> VirtualFileSearchResults of the current search
+SEARCH_RESULTS = {}
+# (app_id, game directory, app config filepath) -> PathResolver, rebuilt when
+# the mtime of the game directory changes, see `get_path_resolver`, or when
+# archives are written, see `invalidate_path_resolvers_of_archive`
+PATH_RESOLVERS = {}
+# Contents of VirtualFile.data_bytes and AlbamAsset.original_bytes, kept out of
+# the .blend. The directory is set when loading and saving, see `get_blob_store_dir`
+BLOB_STORE = BlobStore()
+# in seconds, unreferenced blobs younger than this are kept, e.g. for undoing
+# the removal of an imported model after saving
+BLOB_STORE_GC_MIN_AGE = 7 * 24 * 60 * 60
+
+
+def get_blob_store_dir(blend_filepath, location="SIDECAR"):
+    """
+    Directory of the blobs referenced by a .blend: next to it (shared with its
+    .blend1 backups), or in the user cache. Unsaved files use a shared directory
+    in the user cache, blobs are copied to their final directory when saving
+    """
+    blobs_dir = os.path.join(get_cache_dir(), "blobs")
+    if not blend_filepath:
+        return os.path.join(blobs_dir, "unsaved")
+    blend_filepath = os.path.abspath(blend_filepath)
+    blend_dir, blend_name = os.path.split(blend_filepath)
+    # e.g. "pl00.v2.blend1" -> "pl00.v2"
+    stem = re.sub(r"\.blend\d*$", "", blend_name)
+    if location == "CACHE":
+        blend_hash = hashlib.sha1(os.path.join(blend_dir, stem).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(blobs_dir, f"{stem}-{blend_hash}")
+    return os.path.join(blend_dir, f"{stem}_albam_blobs")
+
+
+def get_blob_store_location():
+    scene = bpy.context.scene
+    if scene is None:
+        return "SIDECAR"
+    return scene.albam.import_settings.blob_store_location
+
+
+def get_referenced_blob_keys():
+    keys = set()
+    for scene in bpy.data.scenes:
+        for vfs in (scene.albam.vfs, scene.albam.exported):
+            keys.update(vf.data_hash for vf in vfs.file_list)
+    for bl_id in list(bpy.data.objects) + list(bpy.data.images):
+        keys.add(bl_id.albam_asset.original_hash)
+    keys.discard("")
+    return keys
+
+
+def get_legacy_bytes(bl_struct, prop_name):
+    """
+    Bytes of files saved before BLOB_STORE existed, stored in a BYTE_STRING property
+    """
+    value = bl_struct.get(prop_name)
+    if value is None:
+        return b""
+    if isinstance(value, str):
+        return value.encode("utf-8", "surrogateescape")
+    return bytes(value)
+
+
+def set_blob(bl_struct, hash_prop_name, legacy_prop_name, data):
+    setattr(bl_struct, hash_prop_name, BLOB_STORE.put(data))
+    if legacy_prop_name in bl_struct:
+        del bl_struct[legacy_prop_name]
+
+
+@bpy.app.handlers.persistent
+def update_blob_store_on_load(*args):
+    blend_filepath = bpy.data.filepath
+    location = get_blob_store_location()
+    other_location = "CACHE" if location == "SIDECAR" else "SIDECAR"
+    unsaved_dir = get_blob_store_dir(None)
+    BLOB_STORE.directory = get_blob_store_dir(blend_filepath, location)
+    BLOB_STORE.search_dirs = [get_blob_store_dir(blend_filepath, other_location), unsaved_dir]
+    if BLOB_STORE.directory != unsaved_dir:
+        # left by sessions that were never saved
+        BLOB_STORE.collect_garbage(get_referenced_blob_keys(), unsaved_dir, BLOB_STORE_GC_MIN_AGE)
+
+
+@bpy.app.handlers.persistent
+def update_blob_store_on_save(*args):
+    """
+    Copy the blobs referenced by the saved file to its directory, e.g. after
+    "save as", and remove the ones no longer referenced
+    """
+    BLOB_STORE.set_directory(get_blob_store_dir(bpy.data.filepath, get_blob_store_location()))
+    keys = get_referenced_blob_keys()
+    missing = BLOB_STORE.copy_to_directory(keys)
+    if missing:
+        print(f"[albam] {len(missing)} stored files not found: {', '.join(sorted(missing))}")
+    BLOB_STORE.collect_garbage(keys, min_age=BLOB_STORE_GC_MIN_AGE)
+
+
+def update_blob_store_location(self, context):
+    BLOB_STORE.set_directory(get_blob_store_dir(bpy.data.filepath, self.blob_store_location))
+
 
 @blender_registry.register_blender_prop
 class TreeNode(bpy.types.PropertyGroup):
     node_id: bpy.props.StringProperty()
     root_id: bpy.props.StringProperty()
+    # name of the parent item in the file list, empty for roots. Names aren't
+    # unique across archives, `root_id` tells which archive the parent is in
+    parent_id: bpy.props.StringProperty()
     depth: bpy.props.IntProperty(default=0)
 
 
@@ -24,15 +152,32 @@ class VirtualFile(bpy.types.PropertyGroup):
     is_root: bpy.props.BoolProperty(default=False)
     is_expandable: bpy.props.BoolProperty(default=False)
     is_expanded: bpy.props.BoolProperty(default=False)
+    # False for directories of lazily expanded archives whose items
+    # aren't in the file list yet, and for the archive itself
+    children_loaded: bpy.props.BoolProperty(default=True)
     category: bpy.props.StringProperty()
     tree_node: bpy.props.PointerProperty(type=TreeNode)  # consider adding the attributes here directly
-    # FIXME: consider strings, seems pretty inefficient
-    tree_node_ancestors: bpy.props.CollectionProperty(type=TreeNode)
 
     app_id: bpy.props.EnumProperty(name="", description="", items=APPS)
     vfs_id: bpy.props.StringProperty()
 
-    data_bytes: bpy.props.StringProperty(subtype="BYTE_STRING")  # noqa: F821
+    # sha1 of the contents in BLOB_STORE, for items that aren't real
+    # files or inside archives, e.g. exported files
+    data_hash: bpy.props.StringProperty()
+
+    @property
+    def data_bytes(self):
+        if self.data_hash:
+            return BLOB_STORE.get(self.data_hash)
+        return get_legacy_bytes(self, "data_bytes")
+
+    @data_bytes.setter
+    def data_bytes(self, data):
+        set_blob(self, "data_hash", "data_bytes", data)
+
+    @property
+    def has_data_bytes(self):
+        return bool(self.data_hash) or "data_bytes" in self
 
     @property
     def relative_path_windows(self):
@@ -45,10 +190,7 @@ class VirtualFile(bpy.types.PropertyGroup):
     @property
     def root_vfile(self):
         vfs = self.get_vfs()
-        try:
-            return vfs.file_list[self.tree_node.root_id]
-        except KeyError:
-            return None
+        return vfs.get(self.tree_node.root_id)
 
     @property
     def extension(self):
@@ -63,19 +205,42 @@ class VirtualFile(bpy.types.PropertyGroup):
             extension = SEP.join((extension0, extension))
         return extension
 
+    @property
+    def archive_extension(self):
+        return get_archive_extension(self.display_name)
+
+    @property
+    def parent_id(self):
+        parent_id = self.tree_node.parent_id
+        if not parent_id and not self.is_root:
+            # saved before parent_id existed, ancestors were stored per item
+            ancestors = self.get("tree_node_ancestors")
+            if ancestors:
+                parent_id = ancestors[-1].get("node_id", "")
+        return parent_id
+
     def get_bytes(self):
         accessor = self.get_accessor()
-        return accessor(self, bpy.context)
+        if self.absolute_path or self.has_data_bytes:
+            return accessor(self, bpy.context)
+
+        root_path = self.root_vfile.absolute_path
+        cache_key = (root_path, self.relative_path, get_archive_stamp(self.app_id, root_path))
+        file_bytes = VFILE_CACHE.get(cache_key)
+        if file_bytes is None:
+            file_bytes = accessor(self, bpy.context)
+            VFILE_CACHE.put(cache_key, file_bytes)
+        return file_bytes
 
     def get_accessor(self):
         if self.absolute_path:
             return self.real_file_accessor
-        if self.data_bytes:
+        if self.has_data_bytes:
             return lambda vfile, context: self.data_bytes
         vfs = getattr(bpy.context.scene.albam, self.vfs_id)
-        root = vfs.file_list[self.tree_node.root_id]
+        root = vfs.file_list[vfs.get_index_by_id(self.tree_node.root_id)]
         accessor_func = blender_registry.archive_accessor_registry.get(
-            (self.app_id, root.extension)
+            (self.app_id, root.archive_extension)
         )
         if not accessor_func:
             raise RuntimeError("Archive item doesn't have an accessor")
@@ -97,9 +262,18 @@ class VirtualFile(bpy.types.PropertyGroup):
         return p
 
 
+def update_search(self, context):
+    self.refresh_search()
+
+
 class VirtualFileSystemBase:
     file_list : bpy.props.CollectionProperty(type=VirtualFile)
     file_list_selected_index : bpy.props.IntProperty()
+    # substring, or glob if it has wildcards, see `VirtualFileSearchIndex.search`
+    search_query: bpy.props.StringProperty(update=update_search)
+    search_extension: bpy.props.StringProperty(update=update_search)
+    # matches added to the file list and shown
+    SEARCH_MAX_RESULTS = 1000
 
     SEPARATOR = "::"
     VFS_ID = "vfs"
@@ -107,31 +281,219 @@ class VirtualFileSystemBase:
     def get_vfile(self, app_id, relative_path):
         path = PureWindowsPath(relative_path)
         file_id = self.SEPARATOR.join((app_id,) + path.parts)
-        return self.file_list[file_id]
+        return self.file_list[self.get_index_by_id(file_id)]
 
     def select_vfile(self, app_id, relative_path):
         path = PureWindowsPath(relative_path)
         file_id = self.SEPARATOR.join((app_id,) + path.parts)
-        self.file_list_selected_index = self.file_list.find(file_id)
-        return self.file_list[file_id]
+        index = self.get_index_by_id(file_id)
+        self.file_list_selected_index = index
+        return self.file_list[index]
+
+    def resolve_vfile(self, app_id, relative_path):
+        """
+        Like `get_vfile`, but files in archives not added are looked up in the
+        game directory of the app, see `PathResolver`. Those aren't added to
+        the file list, an `ArchiveFileData` is returned instead
+        """
+        try:
+            return self.get_vfile(app_id, relative_path)
+        except KeyError:
+            resolver = get_path_resolver(app_id)
+            if resolver is None:
+                raise
+            return resolver.get_vfile(relative_path)
+
+    def get(self, file_id, default=None):
+        """
+        Item by file id, e.g. "re5::pl::pl00::pl00.mod". Items of lazily
+        expanded archives are added to the file list if needed
+        """
+        try:
+            return self.file_list[self.get_index_by_id(file_id)]
+        except KeyError:
+            return default
+
+    def exists(self, file_id):
+        if self._get_path_index().lookup(self.file_list, file_id) is not None:
+            return True
+        return self._find_lazy_root(file_id) is not None
+
+    def get_index_by_id(self, file_id):
+        path_index = self._get_path_index()
+        index = path_index.lookup(self.file_list, file_id)
+        if index is None and self._load_vfile(file_id):
+            index = path_index.lookup(self.file_list, file_id)
+        if index is None:
+            raise KeyError(file_id)
+        return index
+
+    def _get_path_index(self):
+        key = self.as_pointer()
+        path_index = PATH_INDICES.get(key)
+        if path_index is None:
+            path_index = PATH_INDICES[key] = VirtualFilePathIndex()
+        return path_index
+
+    def get_visibility_flags(self, bitflag):
+        """
+        Flags for `UIList.filter_items`, `bitflag` for items shown
+        """
+        if self.is_searching:
+            return self._get_search_results().get_flags(len(self.file_list), bitflag)
+        return self._get_visibility().get_flags(self.file_list, bitflag)
+
+    @property
+    def is_searching(self):
+        return bool(self.search_query.strip() or self.search_extension.strip())
+
+    def search(self, query="", extension="", limit=None):
+        """
+        (root_id, file_id) of the files matching `query` and `extension`, including
+        files of lazily expanded archives not in the file list yet
+        """
+        return self._get_search_index().search(query, extension, limit)
 
-    def add_real_file(self, app_id, absolute_path):
+    def _get_search_index(self):
+        key = self.as_pointer()
+        search_index = SEARCH_INDICES.get(key)
+        if search_index is None:
+            search_index = SEARCH_INDICES[key] = VirtualFileSearchIndex()
+            self._fill_search_index(search_index)
+        return search_index
+
+    def _fill_search_index(self, search_index):
+        """
+        Add the files of every root, e.g. after loading a blend file
+        """
+        lazy_roots = self._get_lazy_roots()
+        roots = {}
+        files_by_root = {}
+        for vf in self.file_list:
+            if vf.is_root:
+                roots[vf.name] = vf.app_id
+                if not vf.is_archive:
+                    files_by_root.setdefault(vf.name, []).append(vf.display_name)
+            elif not vf.is_expandable and vf.tree_node.root_id not in lazy_roots:
+                files_by_root.setdefault(vf.tree_node.root_id, []).append(vf.relative_path)
+        for root_id, app_id in roots.items():
+            rel_paths = files_by_root.get(root_id, [])
+            if root_id in lazy_roots:
+                root_vf = self.file_list[self._get_path_index().lookup(self.file_list, root_id)]
+                listing = self._get_archive_listing(root_vf)
+                rel_paths = listing.rel_paths if listing else []
+            search_index.set_root(root_id, app_id, rel_paths)
+
+    def _on_root_added(self, root_id, app_id, rel_paths):
+        # otherwise filled when searching for the first time
+        search_index = SEARCH_INDICES.get(self.as_pointer())
+        if search_index is not None:
+            search_index.set_root(root_id, app_id, rel_paths)
+        SEARCH_RESULTS.pop(self.as_pointer(), None)
+
+    def _on_root_removed(self, root_id):
+        search_index = SEARCH_INDICES.get(self.as_pointer())
+        if search_index is not None:
+            search_index.remove_root(root_id)
+        SEARCH_RESULTS.pop(self.as_pointer(), None)
+
+    def refresh_search(self):
+        """
+        Run the search again, adding the first `SEARCH_MAX_RESULTS` matches
+        to the file list. Called when the query changes, since items can't be
+        added while drawing
+        """
+        key = self.as_pointer()
+        SEARCH_RESULTS.pop(key, None)
+        if not self.is_searching:
+            return
+        results = SEARCH_RESULTS[key] = self._run_search(self.search_query, self.search_extension)
+        lazy_roots = self._get_lazy_roots()
+        for root_id, file_id in results.matches:
+            if root_id in lazy_roots:
+                self._load_vfile(file_id, root_id)
+
+    def _get_search_results(self):
+        """
+        Results of the current search, only reading the file list since it's
+        used when drawing. Matches not in the file list yet aren't shown, e.g.
+        of archives added after the search, until `refresh_search`
+        """
+        key = self.as_pointer()
+        query, extension = self.search_query, self.search_extension
+        results = SEARCH_RESULTS.get(key)
+        if results is None or not results.is_valid(query, extension):
+            results = SEARCH_RESULTS[key] = self._run_search(query, extension)
+        if results.size != len(self.file_list):
+            indices = [self._find_in_root(file_id, root_id) for root_id, file_id in results.matches]
+            results.set_indices(len(self.file_list), [i for i in indices if i != -1])
+        return results
+
+    def _run_search(self, query, extension):
+        matches = self.search(query, extension, self.SEARCH_MAX_RESULTS + 1)
+        return VirtualFileSearchResults(query, extension, matches[:self.SEARCH_MAX_RESULTS], len(matches))
+
+    def get_search_summary(self):
+        results = self._get_search_results()
+        num_shown = len(results.indices)
+        if num_shown == results.num_matches:
+            return f"{results.num_matches} matches"
+        if results.num_matches > self.SEARCH_MAX_RESULTS:
+            return f"Showing the first {num_shown} matches"
+        return f"Showing {num_shown} of {results.num_matches} matches"
+
+    def update_visibility(self, index):
+        """
+        Must be called after expanding or collapsing the item at `index`
+        """
+        self._get_visibility().update_subtree(self.file_list, index)
+
+    def _get_visibility(self):
+        key = self.as_pointer()
+        visibility = VISIBILITY_INDICES.get(key)
+        if visibility is None:
+            visibility = VISIBILITY_INDICES[key] = VirtualFileVisibility()
+        return visibility
+
+    def _on_item_appended(self, vf):
+        self._get_path_index().append(self.file_list, vf.name)
+
+    def add_real_file(self, app_id, absolute_path, rel_paths=None):
+        for _ in self.iter_add_real_file(app_id, absolute_path, rel_paths):
+            pass
+
+    def iter_add_real_file(self, app_id, absolute_path, rel_paths=None, chunk_size=1000):
+        """
+        Add a file, and the items inside it if it's an archive, yielding the number
+        of items added every `chunk_size` items so big archives can be added over
+        several timer ticks. `rel_paths` can be listed beforehand with `list_archive`.
+        Items can be added to the file list between chunks, references are
+        invalidated then, so the root is looked up again after each one
+        """
         path = PureWindowsPath(absolute_path)
+        root_id = f"{app_id}::{path.name}"
         vf = self.file_list.add()
         vf.is_root = True
-        vf.name = f"{app_id}::{path.name}"
+        vf.name = root_id
         vf.vfs_id = self.VFS_ID
         vf.app_id = app_id
         vf.display_name = path.name
         vf.absolute_path = absolute_path
+        extension = vf.archive_extension
+        self._on_item_appended(vf)
+        yield 1
 
-        archive_loader_func = blender_registry.archive_loader_registry.get(
-            (vf.app_id, vf.extension)
-        )
-        if archive_loader_func:
-            vf.is_expandable = True
-            vf.is_archive = True
-            self._expand_archive(archive_loader_func, vf, app_id)
+        archive_loader_func = blender_registry.archive_loader_registry.get((app_id, extension))
+        if not archive_loader_func:
+            self._on_root_added(root_id, app_id, [path.name])
+            return
+        root_index = self._find_root_index(root_id, absolute_path)
+        if root_index is None:
+            return
+        vf = self.file_list[root_index]
+        vf.is_expandable = True
+        vf.is_archive = True
+        yield from self._expand_archive(root_id, app_id, absolute_path, rel_paths, chunk_size)
 
     def add_vfile(self, vfile_data):
         vf = self.file_list.add()
@@ -139,7 +501,8 @@ class VirtualFileSystemBase:
         vf.app_id = vfile_data.app_id
         vf.name = f"{vfile_data.app_id}::{vfile_data.name}"
         vf.display_name = vfile_data.name
-        vf.data_bytes = vfile_data.data_bytes or b""
+        vf.data_bytes = vfile_data.data_bytes
+        self._on_item_appended(vf)
 
         return vf
 
@@ -152,29 +515,193 @@ class VirtualFileSystemBase:
 
         for vfile_data in vfiles_data:
             tree.add_node_from_path(vfile_data.relative_path, vfile_data)
+        self._on_root_added(root_id, app_id, [vfile_data.relative_path for vfile_data in vfiles_data])
 
         for node in tree.flatten():
             self._add_vf_from_treenode(bl_vf.app_id, root_id, node)
 
         return bl_vf
 
-    def _expand_archive(self, archive_loader_func, vf, app_id):
-        # Beware of chaning this, it was observed the reference
-        # is lost in the middle of the loop below if using vf.name directly,
-        # we get an empty string instead! Don't know why
-        root_id = vf.name
-        tree = Tree(root_id=vf.name, app_id=app_id)
-        # TODO: popup if calling failed. Known exceptions + unexpected
-        for rel_path in archive_loader_func(vf):
+    def _expand_archive(self, root_id, app_id, absolute_path, rel_paths=None, chunk_size=1000):
+        if rel_paths is None:
+            rel_paths = self._list_archive(absolute_path, app_id)
+        self._on_root_added(root_id, app_id, rel_paths)
+        if self.id_data.albam.import_settings.lazy_archive_expansion:
+            # only top-level items, the rest are added when expanding a directory
+            ARCHIVE_LISTINGS[root_id] = ArchiveListing(absolute_path, rel_paths)
+            self._get_lazy_roots()[root_id] = None
+            root_index = self._find_root_index(root_id, absolute_path)
+            self.file_list[root_index].children_loaded = False
+            num_items = len(self.file_list)
+            self._add_children(root_index)
+            yield len(self.file_list) - num_items
+            return
+
+        tree = Tree(root_id=root_id, app_id=app_id)
+        for rel_path in rel_paths:
             tree.add_node_from_path(rel_path)
-        for node in tree.flatten():
-            self._add_vf_from_treenode(app_id, root_id, node)
+        nodes = tree.flatten()
+        for start in range(0, len(nodes), chunk_size):
+            root_index = self._find_root_index(root_id, absolute_path)
+            if root_index is None:
+                # removed in the meantime
+                return
+            first_index = len(self.file_list)
+            for node in nodes[start:start + chunk_size]:
+                self._add_vf_from_treenode(app_id, root_id, node)
+            # right after the previous chunk, other items could have been added since
+            self._move_block(first_index, len(self.file_list) - first_index, root_index + 1 + start)
+            yield len(self.file_list) - first_index
+
+    def _find_root_index(self, root_id, absolute_path):
+        index = self._get_path_index().lookup(self.file_list, root_id)
+        if index is not None and self.file_list[index].absolute_path == absolute_path:
+            return index
+        # archives with the same name in different directories
+        for i, vf in enumerate(self.file_list):
+            if vf.is_root and vf.name == root_id and vf.absolute_path == absolute_path:
+                return i
+        return None
+
+    def _move_block(self, start, count, destination):
+        """
+        Move items [start, start + count) to `destination`, before `start`
+        """
+        if start == destination:
+            return
+        for offset in range(count):
+            self.file_list.move(start + offset, destination + offset)
+        self._get_path_index().move_block(self.file_list, start, count, destination)
+
+    def _list_archive(self, absolute_path, app_id):
+        # TODO: popup if calling failed. Known exceptions + unexpected
+        return list_archive(app_id, absolute_path, self._get_app_config_filepath(app_id))
+
+    def _get_lazy_roots(self):
+        """
+        Names of the archives expanded lazily, in file list order, found once
+        per session since the listings aren't saved in the blend file
+        """
+        key = self.as_pointer()
+        lazy_roots = LAZY_ROOTS.get(key)
+        if lazy_roots is None:
+            lazy_roots = LAZY_ROOTS[key] = {
+                vf.name: None for vf in self.file_list if vf.is_archive and not vf.children_loaded}
+        return lazy_roots
+
+    def _get_archive_listing(self, root_vf):
+        root_id = root_vf.name
+        listing = ARCHIVE_LISTINGS.get(root_id)
+        if listing is None or listing.absolute_path != root_vf.absolute_path:
+            rel_paths = self._list_archive(root_vf.absolute_path, root_vf.app_id)
+            if rel_paths is None:
+                return None
+            listing = ARCHIVE_LISTINGS[root_id] = ArchiveListing(root_vf.absolute_path, rel_paths)
+        return listing
+
+    def _find_in_root(self, file_id, root_id):
+        index = self._get_path_index().lookup(self.file_list, file_id)
+        if index is None:
+            return -1
+        if self.file_list[index].tree_node.root_id == root_id:
+            return index
+        # the same path can be in several archives
+        for i, vf in enumerate(self.file_list):
+            if vf.name == file_id and vf.tree_node.root_id == root_id:
+                return i
+        return -1
+
+    def load_children(self, index):
+        """
+        Add the items inside a directory of a lazily expanded archive
+        to the file list, if they aren't yet
+        """
+        vf = self.file_list[index]
+        if vf.children_loaded or vf.is_root:
+            return
+        self._add_children(index)
+
+    def _add_children(self, index):
+        # values copied before adding items, references are invalidated
+        vf = self.file_list[index]
+        app_id = vf.app_id
+        parent_id = vf.name
+        root_id = parent_id if vf.is_root else vf.tree_node.root_id
+        parts = [] if vf.is_root else ArchiveListing.split(vf.relative_path)
+        root_index = self._get_path_index().lookup(self.file_list, root_id)
+        listing = self._get_archive_listing(self.file_list[root_index]) if root_index is not None else None
+        if listing is None:
+            return
+        if not vf.is_root:
+            vf.children_loaded = True
+
+        tree = Tree(root_id, app_id)
+        first_index = len(self.file_list)
+        for name, is_directory in listing.get_children(parts):
+            child_parts = parts + [name]
+            node = {
+                "name": name,
+                "children": is_directory,
+                "depth": len(parts),
+                "vfile": None,
+                "node_id": tree.generate_node_id(child_parts, use_prefix=True),
+                "relative_path": tree.generate_node_id(child_parts, use_prefix=False),
+                "ancestors_ids": (parent_id,),
+            }
+            child_vf = self._add_vf_from_treenode(app_id, root_id, node)
+            child_vf.children_loaded = not is_directory
+        # children go right after their parent
+        num_children = len(self.file_list) - first_index
+        self._move_block(first_index, num_children, index + 1)
+        visibility = self._get_visibility()
+        visibility.insert(self.file_list, index + 1, num_children)
+        visibility.update_subtree(self.file_list, index)
+
+    def _find_lazy_root(self, file_id):
+        """
+        Name of the lazily expanded archive that has `file_id`
+        """
+        app_id, _, id_body = file_id.partition(self.SEPARATOR)
+        path_index = self._get_path_index()
+        for root_id in list(self._get_lazy_roots()):
+            root_index = path_index.lookup(self.file_list, root_id)
+            if root_index is None:
+                continue
+            root_vf = self.file_list[root_index]
+            if root_vf.app_id != app_id:
+                continue
+            listing = self._get_archive_listing(root_vf)
+            if listing and listing.contains(id_body):
+                return root_id
+        return None
+
+    def _load_vfile(self, file_id, root_id=None):
+        """
+        Add a file of a lazily expanded archive and its parent directories
+        to the file list. Returns False if no archive has it
+        """
+        root_id = root_id or self._find_lazy_root(file_id)
+        if root_id is None:
+            return False
+        parts = file_id.split(self.SEPARATOR)
+        for i in range(2, len(parts)):
+            dir_index = self._find_in_root(self.SEPARATOR.join(parts[:i]), root_id)
+            if dir_index == -1:
+                return False
+            self.load_children(dir_index)
+        return True
+
+    @staticmethod
+    def _get_app_config_filepath(app_id):
+        # e.g. the file list used to name the contents of RE Engine paks
+        return bpy.context.scene.albam.apps.get_app_config_filepath(app_id)
 
     def _add_vf_from_treenode(self, app_id, root_id, node):
         child_vf = self.file_list.add()
         child_vf.vfs_id = self.VFS_ID
         child_vf.app_id = app_id
         child_vf.name = node["node_id"]
+        self._on_item_appended(child_vf)
         child_vf.relative_path = node["relative_path"]
         child_vf.display_name = node["name"]
         child_vf.is_expandable = bool(node["children"])
@@ -184,9 +711,9 @@ class VirtualFileSystemBase:
             child_vf.data_bytes = vfile.data_bytes
         child_vf.tree_node.depth = node["depth"] + 1
         child_vf.tree_node.root_id = root_id
-        for ancestor_id in node["ancestors_ids"]:
-            ancestor_node = child_vf.tree_node_ancestors.add()
-            ancestor_node.node_id = ancestor_id
+        if node["ancestors_ids"]:
+            child_vf.tree_node.parent_id = node["ancestors_ids"][-1]
+        return child_vf
 
     @property
     def selected_vfile(self):
@@ -217,13 +744,23 @@ class ALBAM_OT_VirtualFileSystemAddFiles(bpy.types.Operator):
     files: bpy.props.CollectionProperty(name="added_files", type=bpy.types.OperatorFileListElement)  # NOQA
     # FIXME: use registry, un-hardcode
     filter_glob: bpy.props.StringProperty(default="*.arc;*.pak", options={"HIDDEN"})  # NOQA
+    # list archives in the background when started from the file browser,
+    # calls from scripts and tests are synchronous
+    run_in_background: bpy.props.BoolProperty(default=False, options={"HIDDEN", "SKIP_SAVE"})  # NOQA
+
+    # in seconds, time spent adding items to the file list per timer tick
+    MERGE_TIME_BUDGET = 0.05
+    TIMER_INTERVAL = 0.1
 
     def invoke(self, context, event):  # pragma: no cover
+        self.run_in_background = True
         wm = context.window_manager
         wm.fileselect_add(self)
         return {"RUNNING_MODAL"}
 
     def execute(self, context):  # pragma: no cover
+        if self.run_in_background:
+            return self._start(context, self.directory, self.files)
         self._execute(context, self.directory, self.files)
         context.scene.albam.vfs.file_list.update()
         return {"FINISHED"}
@@ -235,6 +772,316 @@ class ALBAM_OT_VirtualFileSystemAddFiles(bpy.types.Operator):
         for f in files:
             absolute_path = os.path.join(directory, f.name)
             vfs.add_real_file(app_id, absolute_path)
+        save_archive_index()
+
+    def _start(self, context, directory, files):  # pragma: no cover
+        self._app_id = context.scene.albam.apps.app_selected
+        absolute_paths = [os.path.join(directory, f.name) for f in files]
+        app_config_filepath = context.scene.albam.apps.get_app_config_filepath(self._app_id)
+        self._job = ArchiveListingJob(self._app_id, absolute_paths, app_config_filepath)
+        self._merging = None
+        self._num_added = 0
+        self._errors = []
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(self.TIMER_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, max(self._job.total, 1))
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):  # pragma: no cover
+        if event.type == "ESC":
+            self._job.cancel()
+            # don't leave an archive half added
+            for _ in self._merging or ():
+                pass
+            self._finish(context)
+            self.report({"WARNING"}, f"Cancelled, {self._num_added} of {self._job.total} files added")
+            return {"CANCELLED"}
+        if event.type != "TIMER" or event.timer is not self._timer:
+            return {"PASS_THROUGH"}
+
+        vfs = context.scene.albam.vfs
+        deadline = time.perf_counter() + self.MERGE_TIME_BUDGET
+        while time.perf_counter() < deadline:
+            if self._merging is None:
+                done = self._job.pop_done()
+                if done is None:
+                    break
+                absolute_path, future = done
+                try:
+                    rel_paths = future.result()
+                except Exception as err:
+                    self._errors.append(absolute_path)
+                    print(f"Failed to list {absolute_path}: {err}")
+                    continue
+                self._merging = vfs.iter_add_real_file(self._app_id, absolute_path, rel_paths)
+            try:
+                next(self._merging)
+            except StopIteration:
+                self._merging = None
+                self._num_added += 1
+
+        job = self._job
+        context.window_manager.progress_update(job.num_listed)
+        context.workspace.status_text_set(
+            f"Adding files: {self._num_added}/{job.total} "
+            f"({job.get_files_per_second():.1f} files/s), Esc to cancel"
+        )
+        vfs.file_list.update()
+        if job.is_finished and self._merging is None:
+            self._finish(context)
+            message = f"Added {self._num_added} files"
+            if self._errors:
+                self.report({"WARNING"}, f"{message}, {len(self._errors)} failed, see the console")
+            else:
+                self.report({"INFO"}, message)
+            return {"FINISHED"}
+        return {"RUNNING_MODAL"}
+
+    def _finish(self, context):  # pragma: no cover
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        self._job.close()
+        context.scene.albam.vfs.file_list.update()
+        save_archive_index()
+
+
+def save_archive_index():
+    try:
+        ARCHIVE_INDEX.save()
+    except OSError as err:
+        print(f"Failed to save the archive index: {err}")
+
+
+@blender_registry.register_blender_type
+class ALBAM_OT_VirtualFileSystemAddDirectory(bpy.types.Operator):
+    """Add every archive inside a game directory and its subdirectories"""
+    bl_idname = "albam.add_directory"
+    bl_label = "Add Game Directory"
+    directory: bpy.props.StringProperty(subtype="DIR_PATH")  # NOQA
+
+    def invoke(self, context, event):  # pragma: no cover
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        stats = self._execute(context, self.directory)
+        context.scene.albam.vfs.file_list.update()
+        self.report({"INFO"}, stats.format_summary())
+        return {"FINISHED"}
+
+    @staticmethod
+    def _execute(context, directory, max_workers=None):
+        app_id = context.scene.albam.apps.app_selected
+        vfs = context.scene.albam.vfs
+        stats = AddDirectoryStats(directory)
+
+        with stats.stage("walk"):
+            absolute_paths = find_archives(app_id, directory)
+            root_ids = set()
+            to_add = []
+            for absolute_path in absolute_paths:
+                # roots are named after the file, the first one found wins
+                root_id = f"{app_id}::{PureWindowsPath(absolute_path).name}"
+                if root_id in root_ids or vfs.exists(root_id):
+                    stats.skipped.append(absolute_path)
+                    continue
+                root_ids.add(root_id)
+                to_add.append(absolute_path)
+
+        with stats.stage("list"):
+            app_config_filepath = vfs._get_app_config_filepath(app_id)
+            job = ArchiveListingJob(app_id, to_add, app_config_filepath, max_workers)
+            listed = []
+            for absolute_path, future in job.wait():
+                try:
+                    listed.append((absolute_path, future.result()))
+                except Exception as err:
+                    stats.failed.append(absolute_path)
+                    print(f"Failed to list {absolute_path}: {err}")
+
+        with stats.stage("add"):
+            num_items = len(vfs.file_list)
+            for absolute_path, rel_paths in listed:
+                vfs.add_real_file(app_id, absolute_path, rel_paths)
+            stats.num_archives = len(listed)
+            stats.num_items = len(vfs.file_list) - num_items
+
+        with stats.stage("index"):
+            save_archive_index()
+            invalidate_path_resolvers(app_id)
+
+        print(f"[albam] {stats.format_summary()}")
+        return stats
+
+
+class AddDirectoryStats:
+    def __init__(self, directory):
+        self.directory = directory
+        self.num_archives = 0
+        self.num_items = 0
+        self.skipped = []
+        self.failed = []
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def format_summary(self):
+        timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.timings.items())
+        summary = (
+            f"Added {self.num_archives} archives ({self.num_items} items) from {self.directory}: {timings}"
+        )
+        if self.skipped:
+            summary += f". {len(self.skipped)} skipped, already added with the same name"
+        if self.failed:
+            summary += f". {len(self.failed)} failed, see the console"
+        return summary
+
+
+def get_archive_extension(file_name):
+    """
+    Extension archive loaders are registered with. Unlike `VirtualFile.extension`,
+    only the last one, e.g. "re_chunk_000.pak.patch_001.pak" -> "pak"
+    """
+    return os.path.splitext(file_name)[1][1:].lower()
+
+
+def get_archive_stamp(app_id, absolute_path):
+    """
+    Part of the VFILE_CACHE key that changes when the items of an archive might,
+    e.g. paks also depend on the patch paks of their game directory
+    """
+    stamp_func = blender_registry.archive_stamp_registry.get((app_id, get_archive_extension(absolute_path)))
+    if stamp_func is not None:
+        return stamp_func(app_id, absolute_path, bpy.context)
+    return os.stat(absolute_path).st_mtime_ns
+
+
+def find_archives(app_id, directory):
+    """
+    Absolute paths of the files in `directory` and its subdirectories that
+    can be opened as archives of `app_id`, by name with the files of a
+    directory before the ones in its subdirectories
+    """
+    extensions = {ext for (a, ext) in blender_registry.archive_loader_registry if a == app_id}
+    absolute_paths = []
+    for dir_path, dir_names, file_names in os.walk(directory):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if get_archive_extension(file_name) in extensions:
+                absolute_paths.append(os.path.join(os.path.abspath(dir_path), file_name))
+    return absolute_paths
+
+
+@blender_registry.register_blender_type
+class ALBAM_OT_VirtualFileSystemExtract(bpy.types.Operator):
+    """Extract the selected archive, folder or file to disk"""
+    FILTERS = bpy.props.StringProperty(
+        name="Filter",
+        description="Glob patterns separated by ';', e.g. *.tex;*.mrl. Empty to extract everything",
+    )
+    ALL_ARCHIVES = bpy.props.BoolProperty(
+        name="All loaded archives",
+        description="Extract from every loaded archive instead of the selection",
+        default=False,
+    )
+
+    bl_idname = "albam.extract"
+    bl_label = "Extract"
+    directory: bpy.props.StringProperty(subtype="DIR_PATH")  # NOQA
+    filters: FILTERS
+    all_archives: ALL_ARCHIVES
+
+    VFS_ID = "vfs"
+
+    def invoke(self, context, event):  # pragma: no cover
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def draw(self, context):  # pragma: no cover
+        self.layout.prop(self, "filters")
+        self.layout.prop(self, "all_archives")
+
+    def execute(self, context):
+        vfs = getattr(context.scene.albam, self.VFS_ID)
+        stats = self._execute(context, vfs, self.directory, parse_filters(self.filters), self.all_archives)
+        self.report({"INFO"}, f"Extracted {stats}")
+        return {"FINISHED"}
+
+    @staticmethod
+    def _execute(context, vfs, directory, filters, all_archives=False):
+        stats = ExtractionStats()
+        if all_archives:
+            selection = [(vf, None) for vf in vfs.file_list if vf.is_archive]
+        else:
+            vfile = vfs.file_list[vfs.file_list_selected_index]
+            if vfile.is_root:
+                selection = [(vfile, None)]
+            else:
+                selection = [(vfile.root_vfile, vfile.relative_path)]
+
+        for root_vfile, path_prefix in selection:
+            extractor = blender_registry.archive_extractor_registry.get(
+                (root_vfile.app_id, root_vfile.archive_extension))
+            if not extractor:
+                continue
+            stats.update(extractor(root_vfile, context, directory, filters, path_prefix))
+        return stats
+
+    @classmethod
+    def poll(cls, context):
+        vfs = getattr(context.scene.albam, cls.VFS_ID)
+        return len(vfs.file_list) > 0
+
+
+@blender_registry.register_blender_type
+class ALBAM_OT_VirtualFileSystemCacheStats(bpy.types.Operator):
+    """Show usage of the cache of files extracted from archives"""
+    bl_idname = "albam.vfs_cache_stats"
+    bl_label = "Cache usage"
+
+    clear: bpy.props.BoolProperty(default=False, options={"SKIP_SAVE"})  # NOQA
+
+    def execute(self, context):
+        if self.clear:
+            VFILE_CACHE.clear()
+        stats = VFILE_CACHE.stats()
+        self.report({"INFO"}, self.format_stats(stats))
+        return {"FINISHED"}
+
+    @staticmethod
+    def format_stats(stats):
+        MB = 1024 * 1024
+        return (
+            f"{stats['items']} files, {stats['size'] / MB:.1f}/{stats['max_size'] / MB:.0f} MB, "
+            f"hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses)"
+        )
+
+
+@blender_registry.register_blender_type
+class ALBAM_OT_BlobStoreCollectGarbage(bpy.types.Operator):
+    """Remove stored files of imported and exported items no longer in use"""
+    bl_idname = "albam.blob_store_collect_garbage"
+    bl_label = "Remove unused stored files"
+
+    def execute(self, context):
+        num_removed, size_removed = BLOB_STORE.collect_garbage(get_referenced_blob_keys())
+        stats = BLOB_STORE.stats()
+        MB = 1024 * 1024
+        self.report(
+            {"INFO"},
+            f"Removed {num_removed} files ({size_removed / MB:.1f} MB), "
+            f"{stats['items']} in use ({stats['size'] / MB:.1f} MB) in {stats['directory']}"
+        )
+        return {"FINISHED"}
 
 
 class ALBAM_OT_VirtualFileSystemSaveFileBase:
@@ -295,7 +1142,6 @@ class ALBAM_OT_VirtualFileSystemCollapseToggleBase:
 
     button_index: bpy.props.IntProperty(default=0)
     VFS_ID = None
-    NODES_CACHE = None
 
     def execute(self, context):
         item_index = self.button_index
@@ -303,13 +1149,9 @@ class ALBAM_OT_VirtualFileSystemCollapseToggleBase:
         item_list = vfs.file_list
         item = item_list[item_index]
         item.is_expanded = not item.is_expanded
-        if item.is_root:
-            cache_key = item.name
-        else:
-            cache_key = item.tree_node.root_id
-        if cache_key not in self.NODES_CACHE.keys():
-            self.NODES_CACHE[cache_key] = {}
-        self.NODES_CACHE[cache_key][item.name] = item.is_expanded
+        if item.is_expanded:
+            vfs.load_children(item_index)
+        vfs.update_visibility(item_index)
 
         vfs.file_list_selected_index = self.button_index
         item_list.update()
@@ -323,7 +1165,6 @@ class ALBAM_OT_VirtualFileSystemCollapseToggle(
     bl_idname = "albam.file_item_collapse_toggle"
     bl_label = "ALBAM_OT_VirtualFileSystemCollapseToggle"
     VFS_ID = "vfs"
-    NODES_CACHE = {}
 
 
 class ALBAM_OT_VirtualFileSystemRemoveRootVFileBase:
@@ -337,6 +1178,10 @@ class ALBAM_OT_VirtualFileSystemRemoveRootVFileBase:
         vfiles_to_remove = []
         root_node_index = vfs.file_list_selected_index
         archive_node = vfs.file_list[root_node_index]
+        invalidate_path_resolvers(archive_node.app_id)
+        ARCHIVE_LISTINGS.pop(archive_node.name, None)
+        LAZY_ROOTS.get(vfs.as_pointer(), {}).pop(archive_node.name, None)
+        vfs._on_root_removed(archive_node.name)
         for i in range(len(vfs.file_list)):
             parent = vfs.file_list[i].tree_node.root_id
             if parent == archive_node.name:
@@ -387,6 +1232,578 @@ class VirtualFileData:
             extension = SEP.join((extension0, extension))
         return extension
 
+    @property
+    def archive_extension(self):
+        return get_archive_extension(PureWindowsPath(self.relative_path).name)
+
+
+class RealFileData(VirtualFileData):
+    """
+    Stand-in of a VirtualFile for archive loaders called from
+    worker threads, where Blender data can't be accessed
+    """
+
+    def __init__(self, app_id, absolute_path, app_config_filepath=None):
+        super().__init__(app_id, os.path.basename(absolute_path))
+        self.absolute_path = absolute_path
+        self.app_config_filepath = app_config_filepath
+
+
+class ArchiveFileData(VirtualFileData):
+    """
+    Stand-in of a VirtualFile for a file inside an archive that isn't
+    in the file list, for archive accessors
+    """
+
+    def __init__(self, app_id, archive_path, relative_path):
+        super().__init__(app_id, relative_path)
+        self.display_name = PureWindowsPath(relative_path).name
+        self.root_vfile = RealFileData(app_id, archive_path)
+
+    @property
+    def relative_path_windows(self):
+        return PureWindowsPath(self.relative_path)
+
+    @property
+    def relative_path_windows_no_ext(self):
+        p = PureWindowsPath(self.relative_path)
+        return PureWindowsPath(*p.parts[:-1] + (p.stem,))
+
+    def get_bytes(self):
+        root_path = self.root_vfile.absolute_path
+        accessor = blender_registry.archive_accessor_registry[
+            (self.app_id, self.root_vfile.archive_extension)]
+        cache_key = (root_path, self.relative_path, get_archive_stamp(self.app_id, root_path))
+        file_bytes = VFILE_CACHE.get(cache_key)
+        if file_bytes is None:
+            file_bytes = accessor(self, bpy.context)
+            VFILE_CACHE.put(cache_key, file_bytes)
+        return file_bytes
+
+
+# e.g. re_chunk_000.pak.patch_001.pak and pl00_patch_001.arc, numbered patches
+# override the lower numbers
+ARCHIVE_PATCH_PATTERNS = (
+    re.compile(r"\.pak\.patch_(\d+)\.pak$"),
+    re.compile(r"_patch_?(\d*)\.arc$"),
+)
+
+
+def get_archive_override_key(absolute_path):
+    """
+    Sort key of the archives of a game, files in later archives override the ones
+    in earlier archives. Patch archives go last, by number,
+    e.g. re_chunk_000.pak.patch_002.pak overrides re_chunk_000.pak.patch_001.pak
+    """
+    file_name = os.path.basename(absolute_path).lower()
+    for pattern in ARCHIVE_PATCH_PATTERNS:
+        match = pattern.search(file_name)
+        if match is not None:
+            return (1, int(match.group(1) or 0))
+    return (0, 0)
+
+
+class PathResolver:
+    """
+    Relative path -> (archive, path inside it) for every archive of a game
+    directory, so files referenced by a model (e.g. textures) are found when their
+    archive wasn't added to the file list. Listings come from ARCHIVE_INDEX, so only
+    archives changed since the last session are parsed, and archives are only
+    opened when one of their files is requested
+    """
+
+    def __init__(self, app_id, game_dir, app_config_filepath=None):
+        self.app_id = app_id
+        self.game_dir = game_dir
+        self.app_config_filepath = app_config_filepath
+        self.archives = []
+        self.stamp = None
+        self._paths = {}
+
+    @staticmethod
+    def normalize(relative_path):
+        return "/".join(ArchiveListing.split(relative_path)).lower()
+
+    @staticmethod
+    def get_stamp(game_dir):
+        # changed when archives are added or removed in the game directory, the ones
+        # of subdirectories are found after `invalidate_path_resolvers`
+        return os.stat(game_dir).st_mtime_ns
+
+    def build(self, max_workers=None):
+        start = time.perf_counter()
+        self.stamp = self.get_stamp(self.game_dir)
+        # stable sort, archives keep the order they're found within a group
+        self.archives = sorted(find_archives(self.app_id, self.game_dir), key=get_archive_override_key)
+        self._paths = {}
+        job = ArchiveListingJob(self.app_id, self.archives, self.app_config_filepath, max_workers)
+        for absolute_path, future in job.wait():
+            try:
+                rel_paths = future.result()
+            except Exception as err:
+                print(f"Failed to list {absolute_path}: {err}")
+                continue
+            for rel_path in rel_paths:
+                self._paths[self.normalize(rel_path)] = (absolute_path, rel_path)
+        save_archive_index()
+        print(f"[albam] Indexed {len(self._paths)} files in {len(self.archives)} archives "
+              f"of {self.game_dir} in {time.perf_counter() - start:.2f}s")
+
+    def resolve(self, relative_path):
+        """
+        (archive absolute path, path inside it) or None if no archive has it
+        """
+        return self._paths.get(self.normalize(relative_path))
+
+    def get_vfile(self, relative_path):
+        resolved = self.resolve(relative_path)
+        if resolved is None:
+            raise KeyError(relative_path)
+        archive_path, archive_rel_path = resolved
+        return ArchiveFileData(self.app_id, archive_path, archive_rel_path)
+
+
+def get_path_resolver(app_id):
+    """
+    PathResolver of the game directory set for `app_id`, None if not set
+    """
+    apps = bpy.context.scene.albam.apps
+    game_dir = apps.get_app_dir(app_id)
+    if not game_dir or not os.path.isdir(game_dir):
+        return None
+    app_config_filepath = apps.get_app_config_filepath(app_id)
+    key = (app_id, os.path.abspath(game_dir), app_config_filepath)
+    resolver = PATH_RESOLVERS.get(key)
+    if resolver is None or resolver.stamp != PathResolver.get_stamp(game_dir):
+        resolver = PATH_RESOLVERS[key] = PathResolver(app_id, game_dir, app_config_filepath)
+        resolver.build()
+    return resolver
+
+
+def invalidate_path_resolvers(app_id):
+    """
+    Rebuild the resolvers of `app_id` on next use, e.g. after archives are added
+    """
+    for key in [key for key in PATH_RESOLVERS if key[0] == app_id]:
+        del PATH_RESOLVERS[key]
+
+
+def invalidate_path_resolvers_of_archive(absolute_path):
+    """
+    Rebuild the resolvers of the game directories containing an archive on next
+    use, e.g. after it's written. The mtime of the game directory doesn't change
+    when an archive is rewritten, or written in a subdirectory
+    """
+    absolute_path = os.path.normcase(os.path.abspath(absolute_path))
+    for key in list(PATH_RESOLVERS):
+        if absolute_path.startswith(os.path.join(os.path.normcase(key[1]), "")):
+            del PATH_RESOLVERS[key]
+
+
+def list_archive(app_id, absolute_path, app_config_filepath=None):
+    """
+    Paths inside an archive, or None if it isn't one. Doesn't access
+    Blender data, so it can be called from worker threads
+    """
+    file_data = RealFileData(app_id, absolute_path, app_config_filepath)
+    archive_loader_func = blender_registry.archive_loader_registry.get((app_id, file_data.archive_extension))
+    if not archive_loader_func:
+        return None
+    dependencies = (app_config_filepath,) if app_config_filepath else ()
+    rel_paths = ARCHIVE_INDEX.get(app_id, absolute_path, dependencies)
+    if rel_paths is None:
+        rel_paths = list(archive_loader_func(file_data))
+        ARCHIVE_INDEX.put(app_id, absolute_path, rel_paths, dependencies)
+    return rel_paths
+
+
+class ArchiveListingJob:
+    """
+    Lists archives with `list_archive` in a thread pool, so parsing their
+    tables of contents doesn't block the UI. Results are taken in the
+    order the archives were given with `pop_done`
+    """
+
+    def __init__(self, app_id, absolute_paths, app_config_filepath=None, max_workers=None):
+        self.total = len(absolute_paths)
+        self.start_time = time.perf_counter()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1))
+        self._pending = deque(
+            (path, self._executor.submit(list_archive, app_id, path, app_config_filepath))
+            for path in absolute_paths
+        )
+
+    def pop_done(self):
+        """
+        (absolute_path, future) of the next archive if it was listed, otherwise None
+        """
+        if self._pending and self._pending[0][1].done():
+            return self._pending.popleft()
+        return None
+
+    @property
+    def num_listed(self):
+        return self.total - sum(not future.done() for _, future in self._pending)
+
+    @property
+    def is_finished(self):
+        return not self._pending
+
+    def get_files_per_second(self):
+        return self.num_listed / max(time.perf_counter() - self.start_time, 1e-6)
+
+    def wait(self):
+        """
+        Yield (absolute_path, future) of every archive as they're listed
+        """
+        while self._pending:
+            path, future = self._pending.popleft()
+            wait_futures([future])
+            yield path, future
+        self.close()
+
+    def cancel(self):
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class VirtualFilePathIndex:
+    """
+    File id -> position in a file list, since looking up a Blender collection
+    by name is a linear search. Updated by the vfs methods that add or move
+    items. Changes made elsewhere are detected on lookup, by the length of the
+    list or the name at the position found, and the index is rebuilt
+    """
+
+    def __init__(self):
+        self.indices = {}
+        self.size = -1
+
+    def rebuild(self, file_list):
+        self.indices = {}
+        for i, vf in enumerate(file_list):
+            self.indices.setdefault(vf.name, i)
+        self.size = len(file_list)
+
+    def lookup(self, file_list, file_id):
+        if self.size != len(file_list):
+            self.rebuild(file_list)
+        index = self.indices.get(file_id)
+        if index is not None and file_list[index].name != file_id:
+            self.rebuild(file_list)
+            index = self.indices.get(file_id)
+        return index
+
+    def append(self, file_list, file_id):
+        if self.size != len(file_list) - 1:
+            # out of sync, e.g. items were removed, rebuilt on next lookup even
+            # if the length is the same as when it was last built
+            self.size = -1
+            return
+        self.indices.setdefault(file_id, self.size)
+        self.size += 1
+
+    def move_block(self, file_list, start, count, destination):
+        """
+        Items [start, start + count) were moved to `destination`, before `start`
+        """
+        if self.size != len(file_list):
+            return
+        for file_id, index in self.indices.items():
+            if destination <= index < start:
+                self.indices[file_id] = index + count
+            elif start <= index < start + count:
+                self.indices[file_id] = index - start + destination
+
+
+class VirtualFileVisibility:
+    """
+    Flags of the items of a file list that are shown, i.e. all their ancestors
+    are expanded, so redraws don't need to walk the tree. Items of a tree are
+    contiguous after their parent, so expanding or collapsing an item only
+    updates the flags of its subtree. Rebuilt if the length of the list changed
+    """
+
+    def __init__(self):
+        self.flags = []
+        self.depths = []
+        self.expanded = []
+        self.bitflag = 0
+        self.size = -1
+
+    def get_flags(self, file_list, bitflag):
+        if self.size != len(file_list) or self.bitflag != bitflag:
+            self.rebuild(file_list, bitflag)
+        return self.flags
+
+    def rebuild(self, file_list, bitflag):
+        # item names aren't unique across archives, so visibility is
+        # found from depths and the order of the list, not parent names
+        self.flags = []
+        self.depths = []
+        self.expanded = []
+        hidden_depth = None
+        for item in file_list:
+            depth = item.tree_node.depth
+            is_expanded = item.is_expanded
+            self.depths.append(depth)
+            self.expanded.append(is_expanded)
+            if item.is_archive or item.is_root:
+                self.flags.append(bitflag)
+                hidden_depth = None if is_expanded else depth
+            elif hidden_depth is not None and depth > hidden_depth:
+                self.flags.append(0)
+            else:
+                self.flags.append(bitflag)
+                hidden_depth = None if is_expanded else depth
+        self.bitflag = bitflag
+        self.size = len(file_list)
+
+    def update_subtree(self, file_list, index):
+        if self.size != len(file_list):
+            # rebuilt on next redraw
+            return
+        self.expanded[index] = file_list[index].is_expanded
+        depth = self.depths[index]
+        visible = bool(self.flags[index]) and self.expanded[index]
+        hidden_depth = None
+        i = index + 1
+        while i < self.size and self.depths[i] > depth:
+            if hidden_depth is not None and self.depths[i] > hidden_depth:
+                self.flags[i] = 0
+            else:
+                hidden_depth = None
+                self.flags[i] = self.bitflag if visible else 0
+                if not self.expanded[i]:
+                    # descendants of a collapsed item are hidden
+                    hidden_depth = self.depths[i]
+            i += 1
+
+    def insert(self, file_list, index, count):
+        """
+        `count` items were inserted at `index`, hidden until `update_subtree`
+        """
+        if self.size + count != len(file_list):
+            self.size = -1
+            return
+        new_items = [file_list[i] for i in range(index, index + count)]
+        self.flags[index:index] = [0] * count
+        self.depths[index:index] = [item.tree_node.depth for item in new_items]
+        self.expanded[index:index] = [item.is_expanded for item in new_items]
+        self.size += count
+
+
+class ArchiveListing:
+    """
+    Paths inside a lazily expanded archive, to add the items of a directory
+    to the file list when it's expanded and find files not added yet
+    """
+    SEPARATOR = "::"
+
+    def __init__(self, absolute_path, rel_paths):
+        self.absolute_path = absolute_path
+        self.rel_paths = rel_paths
+        # parts of a directory -> {name: is_directory} of its items
+        self._children = {}
+        for rel_path in rel_paths:
+            parts = self.split(rel_path)
+            for depth, name in enumerate(parts):
+                children = self._children.setdefault(tuple(parts[:depth]), {})
+                children[name] = children.get(name, False) or depth < len(parts) - 1
+        self._ids = None
+
+    @staticmethod
+    def split(rel_path):
+        return [part for part in rel_path.replace("/", "\\").split("\\") if part]
+
+    def contains(self, id_body):
+        """
+        `id_body` is a file id without app id, e.g. "pl::pl00::pl00.mod"
+        """
+        if self._ids is None:
+            self._ids = {self.SEPARATOR.join(self.split(p)) for p in self.rel_paths}
+        return id_body in self._ids
+
+    def get_children(self, parts):
+        """
+        (name, is_directory) of the items inside the directory `parts`,
+        sorted like `Tree.flatten`
+        """
+        children = self._children.get(tuple(parts), {})
+        return sorted(children.items(), key=lambda child: child[0] if child[1] else "zzz" + child[0])
+
+
+class VirtualFileSearchIndex:
+    """
+    Paths of the files of every root of a file list, including the ones of lazily
+    expanded archives not added yet. Paths are joined in one lowercase string, so
+    substring and glob searches run in C with `str.find` and `re`, then offsets
+    are mapped back to files with bisect. Joined again after roots are changed
+    """
+    SEPARATOR = "::"
+    LINE_SEPARATOR = "\n"
+
+    def __init__(self):
+        # root_id -> (app_id, relative paths)
+        self.roots = {}
+        self._text = None
+        self._starts = []
+        # only file names, for globs without "/"
+        self._names_text = None
+        self._names_starts = []
+        self._entries = []
+        self._by_extension = {}
+
+    def set_root(self, root_id, app_id, rel_paths):
+        self.roots[root_id] = (app_id, list(rel_paths))
+        self._text = None
+
+    def remove_root(self, root_id):
+        if self.roots.pop(root_id, None) is not None:
+            self._text = None
+
+    def _build(self):
+        lines = []
+        names = []
+        self._starts = []
+        self._names_starts = []
+        self._entries = []
+        self._by_extension = {}
+        offset = names_offset = 0
+        for root_id, (app_id, rel_paths) in self.roots.items():
+            for rel_path in rel_paths:
+                parts = ArchiveListing.split(rel_path)
+                line = "/".join(parts).lower()
+                name = parts[-1].lower() if parts else ""
+                entry_index = len(self._entries)
+                self._entries.append((root_id, self.SEPARATOR.join([app_id] + parts)))
+                self._starts.append(offset)
+                self._names_starts.append(names_offset)
+                self._by_extension.setdefault(name.rpartition(".")[2], []).append(entry_index)
+                lines.append(line)
+                names.append(name)
+                offset += len(line) + 1
+                names_offset += len(name) + 1
+        self._text = self.LINE_SEPARATOR.join(lines)
+        self._names_text = self.LINE_SEPARATOR.join(names)
+
+    def search(self, query="", extension="", limit=None):
+        """
+        (root_id, file_id) of the files whose path contains `query`, case insensitive,
+        and that end in `extension`. If `query` has wildcards it's a glob, matched
+        against the whole path if it has a "/", otherwise against the file name
+        """
+        if self._text is None:
+            self._build()
+        query = query.strip().lower().replace("\\", "/")
+        extension = extension.strip().lower().lstrip(".")
+        if not query and not extension:
+            return []
+
+        candidates = None
+        if extension and "." not in extension:
+            candidates = self._by_extension.get(extension, [])
+            if not query:
+                return [self._entries[i] for i in candidates[:limit]]
+            candidates = set(candidates)
+        results = []
+        for entry_index in self._iter_matches(query):
+            root_id, file_id = self._entries[entry_index]
+            if candidates is not None and entry_index not in candidates:
+                continue
+            if candidates is None and extension and not file_id.lower().endswith("." + extension):
+                continue
+            results.append((root_id, file_id))
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def _iter_matches(self, query):
+        """
+        Indices of the entries matching `query`, in order
+        """
+        if not query:
+            yield from range(len(self._entries))
+        elif any(char in query for char in "*?["):
+            if "/" in query:
+                text, starts = self._text, self._starts
+            else:
+                text, starts = self._names_text, self._names_starts
+            for match in self._glob_to_regex(query).finditer(text):
+                yield bisect_right(starts, match.start()) - 1
+        else:
+            offset = self._text.find(query)
+            while offset != -1:
+                entry_index = bisect_right(self._starts, offset) - 1
+                yield entry_index
+                if entry_index + 1 == len(self._starts):
+                    return
+                offset = self._text.find(query, self._starts[entry_index + 1])
+
+    @staticmethod
+    def _glob_to_regex(pattern):
+        """
+        Regex matching whole lines, "*" doesn't match across lines
+        """
+        any_char = "[^\n]"
+        regex = []
+        i = 0
+        while i < len(pattern):
+            char = pattern[i]
+            end = pattern.find("]", i + 2) if char == "[" else -1
+            if char == "*":
+                regex.append(any_char + "*")
+            elif char == "?":
+                regex.append(any_char)
+            elif end != -1:
+                chars = pattern[i + 1:end]
+                if chars.startswith("!"):
+                    chars = "^\n" + chars[1:]
+                regex.append(f"[{chars}]")
+                i = end
+            else:
+                regex.append(re.escape(char))
+            i += 1
+        return re.compile("^" + "".join(regex) + "$", re.MULTILINE)
+
+
+class VirtualFileSearchResults:
+    """
+    (root_id, file_id) of the matches of a search and their indices in the file
+    list, shown instead of the tree. Indices are found again when the length
+    of the file list changes
+    """
+
+    def __init__(self, query, extension, matches, num_matches):
+        self.query = query
+        self.extension = extension
+        self.matches = matches
+        self.num_matches = num_matches
+        self.size = -1
+        self.indices = []
+        self._flags = None
+
+    def is_valid(self, query, extension):
+        return (self.query, self.extension) == (query, extension)
+
+    def set_indices(self, size, indices):
+        self.size = size
+        self.indices = indices
+        self._flags = None
+
+    def get_flags(self, size, bitflag):
+        if self._flags is None or len(self._flags) != size or self._flags_bitflag != bitflag:
+            self._flags = [0] * size
+            for index in self.indices:
+                self._flags[index] = bitflag
+            self._flags_bitflag = bitflag
+        return self._flags
+
 
 class Tree:
     PATH_SEPARATOR = "::"
@@ -397,14 +1814,18 @@ class Tree:
         self.root_id = root_id
         self.nodes = {}
         self.app_id = app_id
+        # name -> first child with that name, so siblings aren't scanned
+        self._root_by_name = {}
+        self._root_ancestors_ids = (root_id,) if root_id else ()
 
-    def _find_node_in_level(self, node_name, node_level):
-        node_found = None
-        for node in node_level:
-            if node["name"] == node_name:
-                node_found = node
-                break
-        return node_found
+    def _add_child(self, parent, node):
+        if parent:
+            children, children_by_name = parent["children"], parent["children_by_name"]
+        else:
+            children, children_by_name = self.root, self._root_by_name
+        children.append(node)
+        children_by_name.setdefault(node["name"], node)
+        self.nodes[node["node_id"]] = node
 
     def add_node_from_path(self, full_path, vfile=None):
         p = PureWindowsPath(full_path)
@@ -416,42 +1837,39 @@ class Tree:
         leaf_name = path_parts[-1] if path_parts else p.name
 
         current_level = 0
-        current_dir = self.root
-        ancestors_ids = [] if not self.root_id else [self.root_id]
+        parent = None
+        # ancestors are tuples shared by all the children of a node
+        ancestors_ids = self._root_ancestors_ids
         for i in range(len(path_parts) - 1):
             path_part = path_parts[i]
-            existing_node = self._find_node_in_level(node_name=path_part, node_level=current_dir)
-            if existing_node:
-                new_node = existing_node
-            else:
-                new_node = {
-                    "name": path_part,
-                    "children": [],
-                    "depth": current_level,
-                    "vfile": vfile,
-                    "node_id": self.generate_node_id(path_parts[0 : i + 1], use_prefix=True),
-                    "relative_path": self.generate_node_id(path_parts[0 : i + 1], use_prefix=False),
-                    "ancestors_ids": copy.copy(ancestors_ids),
-                }
-                current_dir.append(new_node)
-                self.nodes[new_node["node_id"]] = new_node
-
-            ancestors_ids.append(new_node["node_id"])
+            children_by_name = parent["children_by_name"] if parent else self._root_by_name
+            new_node = children_by_name.get(path_part)
+            if not new_node:
+                new_node = self._new_node(
+                    path_part, current_level, vfile, path_parts[0 : i + 1], ancestors_ids)
+                self._add_child(parent, new_node)
+
+            if new_node["children_ancestors_ids"] is None:
+                new_node["children_ancestors_ids"] = new_node["ancestors_ids"] + (new_node["node_id"],)
+            ancestors_ids = new_node["children_ancestors_ids"]
             current_level += 1
-            current_dir = new_node["children"]
+            parent = new_node
+
+        leaf_node = self._new_node(leaf_name, current_level, vfile, path_parts, ancestors_ids)
+        self._add_child(parent, leaf_node)
 
-        node_id = self.generate_node_id(path_parts, use_prefix=True)
-        leaf_node = {
-            "name": leaf_name,
+    def _new_node(self, name, depth, vfile, path_parts, ancestors_ids):
+        return {
+            "name": name,
             "children": [],
-            "depth": current_level,
+            "children_by_name": {},
+            "children_ancestors_ids": None,
+            "depth": depth,
             "vfile": vfile,
-            "node_id": node_id,
+            "node_id": self.generate_node_id(path_parts, use_prefix=True),
             "relative_path": self.generate_node_id(path_parts, use_prefix=False),
             "ancestors_ids": ancestors_ids,
         }
-        current_dir.append(leaf_node)
-        self.nodes[node_id] = leaf_node
 
     def generate_node_id(self, parts, use_prefix=True):
         prefix = (self.app_id or "") + self.PATH_SEPARATOR
@@ -1,8 +1,16 @@
+import os
+import tempfile
+
 from albam import register, unregister
+from albam.vfs import update_blob_store_on_load
 
 
 def pytest_sessionstart():
+    # keep persistent caches out of the user directory
+    os.environ.setdefault("ALBAM_CACHE_DIR", tempfile.mkdtemp(prefix="albam-cache-"))
     register()
+    # deferred to a timer by register, timers don't run with bpy as a module
+    update_blob_store_on_load()
 
 
 def pytest_sessionfinish():
@@ -45,11 +45,10 @@ def pytest_generate_tests(metafunc):
 def loaded_arcs(pytestconfig):
     """
     Loads all the arcs found in the config option --arcdir
-    with the corresponding app-id to the vfs.
-    Equivalent to selecting an app, clicking "Add files"
-    and selecting all files ending in .arc in a directory
+    and its subdirectories with the corresponding app-id to the vfs.
+    Equivalent to selecting an app, clicking "Add Game Directory"
+    and selecting the directory
     """
-    # TODO: recursive walk in directories
     arc_dirs = pytestconfig.getoption("arcdir")
     if not arc_dirs:
         pytest.skip("No arc directory or app_id supplied")
@@ -58,8 +57,7 @@ def loaded_arcs(pytestconfig):
     for app_id_and_arc_dir in arc_dirs:
         app_id, arc_dir = app_id_and_arc_dir.split("::")
         bpy.context.scene.albam.apps.app_selected = app_id
-        files = [{'name': name} for name in os.listdir(arc_dir) if name.endswith(".arc")]
-        bpy.ops.albam.add_files(directory=arc_dir, files=files)
+        bpy.ops.albam.add_directory(directory=arc_dir)
 
 
 @pytest.fixture(scope="session")
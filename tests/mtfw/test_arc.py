@@ -0,0 +1,603 @@
+import io
+import os
+import shutil
+import struct
+import zlib
+
+import bpy
+from kaitaistruct import KaitaiStream
+import numpy as np
+import pytest
+
+from albam.engines.mtfw import EXTENSION_TO_FILE_ID, archive
+from albam.engines.mtfw.archive import (
+    ARC_POOL, ARC_TOC_DTYPE, COMPRESSED_BLOB_CACHE, ArcWrapper, _new_file_entry, extract_arc, pack_arc_toc,
+    patch_arc, read_arc_toc, update_arc, write_arc,
+)
+from albam.engines.mtfw.structs.arc import Arc
+from albam.exceptions import FileNotFoundInArchive
+from albam.blender_ui.import_panel import update_cache_sizes_on_load
+from albam.lib.cache import ArchiveIndex
+from albam.vfs import (
+    PATH_RESOLVERS, VFILE_CACHE, ALBAM_OT_VirtualFileSystemAddDirectory, ArchiveListing, ArchiveListingJob,
+    VirtualFileData, find_archives, get_archive_override_key, get_path_resolver,
+)
+
+
+SYNTHETIC_FILES = {
+    "pl\\pl00\\model\\pl00.mod": b"MOD\x00" + bytes(range(256)) * 8,
+    "pl\\pl00\\model\\pl00.mrl": b"MRL\x00" + bytes(1024),
+    "pl\\pl00\\model\\pl00_BM.tex": b"TEX\x00" + os.urandom(2048),
+    "pl\\pl00\\model\\pl00_NM.tex": b"TEX\x00" + os.urandom(512),
+    "pl\\pl00\\motion\\pl00.lmt": b"LMT\x00" + bytes(64),
+}
+
+
+@pytest.fixture
+def synthetic_arc(tmp_path):
+    file_entries = []
+    for relative_path, data in SYNTHETIC_FILES.items():
+        file_path, _, extension = relative_path.rpartition(".")
+        file_entries.append(_new_file_entry(file_path, EXTENSION_TO_FILE_ID[extension], data))
+
+    arc_path = tmp_path / "synthetic.arc"
+    with open(arc_path, "wb") as w:
+        write_arc(w, file_entries)
+    return str(arc_path)
+
+
+def test_arc_get_file(synthetic_arc):
+    arc = ArcWrapper(synthetic_arc)
+
+    for relative_path, data in SYNTHETIC_FILES.items():
+        file_path, _, extension = relative_path.rpartition(".")
+        assert arc.get_file(file_path, EXTENSION_TO_FILE_ID[extension]) == data
+
+
+def test_read_arc_toc(synthetic_arc):
+    with open(synthetic_arc, "rb") as f:
+        data = f.read()
+    parsed = Arc(KaitaiStream(io.BytesIO(data)))
+    parsed._read()
+
+    entries = read_arc_toc(data)
+
+    assert len(entries) == len(parsed.file_entries) == len(SYNTHETIC_FILES)
+    for row, fe in zip(entries.tolist(), parsed.file_entries):
+        assert row == (fe.file_path.encode("ascii"), fe.file_type, fe.zsize, fe.size, fe.flags, fe.offset)
+    with ArcWrapper(synthetic_arc) as arc:
+        assert arc.get_paths() == [fe.file_path_with_ext for fe in arc.get_file_entries()]
+
+
+def test_arc_pool_lease(synthetic_arc, tmp_path):
+    other_arcs = []
+    for i in range(ARC_POOL.max_items + 2):
+        other_arc = tmp_path / f"other_{i}.arc"
+        shutil.copyfile(synthetic_arc, other_arc)
+        other_arcs.append(str(other_arc))
+    tex_type = EXTENSION_TO_FILE_ID["tex"]
+    ARC_POOL.clear()
+
+    try:
+        with ARC_POOL.lease(synthetic_arc) as arc:
+            file_entry = arc.get_file_entry("pl\\pl00\\model\\pl00_BM", tex_type)
+            for other_arc in other_arcs:
+                with ARC_POOL.lease(other_arc) as other:
+                    other.get_file("pl\\pl00\\model\\pl00_NM", tex_type)
+            # evicted, but still usable until released
+            assert ARC_POOL.stats() == {
+                "items": ARC_POOL.max_items, "leased": 1, "hits": 0, "misses": len(other_arcs) + 1}
+            assert arc.decompress(file_entry) == SYNTHETIC_FILES["pl\\pl00\\model\\pl00_BM.tex"]
+        assert arc._mmap.closed
+    finally:
+        ARC_POOL.clear()
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc to count open files")
+@pytest.mark.parametrize(
+    "data", [b"", b"ARC\x00\x07\x00", b"NOT AN ARC" * 8], ids=["empty", "truncated", "not_arc"])
+def test_arc_corrupt_closed(tmp_path, data):
+    arc_path = tmp_path / "corrupt.arc"
+    arc_path.write_bytes(data)
+    num_open = len(os.listdir("/proc/self/fd"))
+
+    # the traceback keeps the half-built wrapper alive, e.g. in the error popup
+    with pytest.raises((ValueError, struct.error)) as excinfo:
+        ArcWrapper(str(arc_path))
+
+    assert len(os.listdir("/proc/self/fd")) == num_open
+    del excinfo
+
+
+def test_arc_get_file_not_found(synthetic_arc):
+    arc = ArcWrapper(synthetic_arc)
+
+    with pytest.raises(FileNotFoundInArchive):
+        arc.get_file("pl\\pl00\\model\\missing", EXTENSION_TO_FILE_ID["tex"])
+    with pytest.raises(FileNotFoundInArchive):
+        arc.get_file("pl\\pl00\\model\\pl00", EXTENSION_TO_FILE_ID["tex"])
+
+
+def test_arc_get_files_by_extension(synthetic_arc):
+    arc = ArcWrapper(synthetic_arc)
+
+    textures = dict(arc.get_files_by_extension("tex"))
+
+    assert textures == {
+        "pl\\pl00\\model\\pl00_BM": SYNTHETIC_FILES["pl\\pl00\\model\\pl00_BM.tex"],
+        "pl\\pl00\\model\\pl00_NM": SYNTHETIC_FILES["pl\\pl00\\model\\pl00_NM.tex"],
+    }
+    assert arc.get_files_by_extension("sbc") == []
+
+
+def test_extract_arc(synthetic_arc, tmp_path):
+    dst_dir = tmp_path / "extracted"
+
+    stats = extract_arc(synthetic_arc, dst_dir, filters=["*.tex", "*.lmt"], path_prefix="pl/pl00/model")
+
+    extracted = sorted(p.relative_to(dst_dir).as_posix() for p in dst_dir.rglob("*") if p.is_file())
+    assert extracted == ["pl/pl00/model/pl00_BM.tex", "pl/pl00/model/pl00_NM.tex"]
+    extracted_bytes = (dst_dir / "pl/pl00/model/pl00_BM.tex").read_bytes()
+    assert extracted_bytes == SYNTHETIC_FILES["pl\\pl00\\model\\pl00_BM.tex"]
+    assert stats.num_files == 2
+
+
+def test_update_arc(synthetic_arc, tmp_path):
+    dst_path = str(tmp_path / "updated.arc")
+    vfiles = [
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_BM.tex", b"TEX\x00replaced"),
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_SM.tex", b"TEX\x00new"),
+    ]
+
+    update_arc(synthetic_arc, vfiles, dst_path)
+
+    arc = ArcWrapper(dst_path)
+    tex_type = EXTENSION_TO_FILE_ID["tex"]
+    assert len(arc.get_file_entries()) == len(SYNTHETIC_FILES) + 1
+    assert arc.get_file("pl\\pl00\\model\\pl00_BM", tex_type) == b"TEX\x00replaced"
+    assert arc.get_file("pl\\pl00\\model\\pl00_SM", tex_type) == b"TEX\x00new"
+    untouched = SYNTHETIC_FILES["pl\\pl00\\model\\pl00_NM.tex"]
+    assert arc.get_file("pl\\pl00\\model\\pl00_NM", tex_type) == untouched
+    arc.close()
+
+
+def test_patch_arc(synthetic_arc):
+    original_size = os.path.getsize(synthetic_arc)
+    bigger = b"TEX\x00" + os.urandom(4096)
+    vfiles = [
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_BM.tex", b"TEX\x00replaced"),
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_NM.tex", bigger),
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_SM.tex", b"TEX\x00new"),
+    ]
+
+    patched_in_place = patch_arc(synthetic_arc, vfiles)
+
+    assert patched_in_place
+    arc = ArcWrapper(synthetic_arc)
+    tex_type = EXTENSION_TO_FILE_ID["tex"]
+    assert len(arc.get_file_entries()) == len(SYNTHETIC_FILES) + 1
+    assert arc.get_file("pl\\pl00\\model\\pl00_BM", tex_type) == b"TEX\x00replaced"
+    assert arc.get_file("pl\\pl00\\model\\pl00_NM", tex_type) == bigger
+    assert arc.get_file("pl\\pl00\\model\\pl00_SM", tex_type) == b"TEX\x00new"
+    untouched = SYNTHETIC_FILES["pl\\pl00\\model\\pl00.mod"]
+    assert arc.get_file("pl\\pl00\\model\\pl00", EXTENSION_TO_FILE_ID["mod"]) == untouched
+    # the smaller blob is overwritten in place, the others appended
+    assert arc.get_file_entry("pl\\pl00\\model\\pl00_BM", tex_type).offset < original_size
+    assert arc.get_file_entry("pl\\pl00\\model\\pl00_NM", tex_type).offset >= original_size
+    appended = ("pl\\pl00\\model\\pl00_NM", "pl\\pl00\\model\\pl00_SM")
+    appended_size = sum(arc.get_file_entry(path, tex_type).zsize for path in appended)
+    assert os.path.getsize(synthetic_arc) == original_size + appended_size
+    arc.close()
+
+
+def test_patch_arc_small_padding(tmp_path):
+    # written by another tool, blobs right after the table of contents
+    entries = np.zeros(len(SYNTHETIC_FILES), dtype=ARC_TOC_DTYPE)
+    offset = ArcWrapper.HEADER_SIZE + len(SYNTHETIC_FILES) * ArcWrapper.FILE_ENTRY_SIZE + 16
+    blobs = []
+    for i, (relative_path, data) in enumerate(SYNTHETIC_FILES.items()):
+        file_path, _, extension = relative_path.rpartition(".")
+        blob = zlib.compress(data)
+        file_type = EXTENSION_TO_FILE_ID[extension]
+        entries[i] = (file_path.encode("ascii"), file_type, len(blob), len(data), 2, offset)
+        blobs.append(blob)
+        offset += len(blob)
+    arc_path = tmp_path / "tight.arc"
+    arc_path.write_bytes(pack_arc_toc(entries) + bytes(16) + b"".join(blobs))
+    tex_type = EXTENSION_TO_FILE_ID["tex"]
+
+    patched_in_place = patch_arc(str(arc_path), [
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_SM.tex", b"TEX\x00new")])
+
+    assert not patched_in_place
+    with ArcWrapper(str(arc_path)) as arc:
+        assert arc.get_file("pl\\pl00\\model\\pl00_SM", tex_type) == b"TEX\x00new"
+        for relative_path, data in SYNTHETIC_FILES.items():
+            file_path, _, extension = relative_path.rpartition(".")
+            assert arc.get_file(file_path, EXTENSION_TO_FILE_ID[extension]) == data
+    # replacing doesn't grow the table of contents
+    assert patch_arc(str(arc_path), [VirtualFileData("re1", "pl\\pl00\\model\\pl00_SM.tex", b"TEX\x00")])
+
+
+def test_patch_arc_interrupted(synthetic_arc, monkeypatch):
+    tex_type = EXTENSION_TO_FILE_ID["tex"]
+    write_arc_toc = archive._write_arc_toc
+    calls = []
+
+    def _interrupted(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        write_arc_toc(*args)
+
+    monkeypatch.setattr(archive, "_write_arc_toc", _interrupted)
+    vfiles = [
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_BM.tex", b"TEX\x00replaced"),
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_NM.tex", b"TEX\x00" + os.urandom(4096)),
+    ]
+    with pytest.raises(KeyboardInterrupt):
+        patch_arc(synthetic_arc, vfiles)
+
+    # interrupted before moving the smaller blob to its old slot
+    with ArcWrapper(synthetic_arc) as arc:
+        for vf in vfiles:
+            file_path = vf.relative_path.rpartition(".")[0]
+            assert arc.get_file(file_path, tex_type) == vf.data_bytes
+        untouched = SYNTHETIC_FILES["pl\\pl00\\model\\pl00.mod"]
+        assert arc.get_file("pl\\pl00\\model\\pl00", EXTENSION_TO_FILE_ID["mod"]) == untouched
+
+
+def test_update_arc_compressed_blob_cache(synthetic_arc, tmp_path):
+    data = b"TEX\x00" + os.urandom(1024) * 64
+    vfiles = [VirtualFileData("re1", "pl\\pl00\\model\\pl00_BM.tex", data)]
+    COMPRESSED_BLOB_CACHE.clear()
+
+    update_arc(synthetic_arc, vfiles, str(tmp_path / "first.arc"))
+    update_arc(synthetic_arc, vfiles, str(tmp_path / "second.arc"))
+
+    stats = COMPRESSED_BLOB_CACHE.stats()
+    assert (stats["hits"], stats["misses"], stats["items"]) == (1, 1, 1)
+    assert (tmp_path / "first.arc").read_bytes() == (tmp_path / "second.arc").read_bytes()
+
+
+def test_vfile_cache(synthetic_arc):
+    vfs = bpy.context.scene.albam.vfs
+    num_items = len(vfs.file_list)
+    vfs.add_real_file("re1", synthetic_arc)
+    VFILE_CACHE.clear()
+
+    try:
+        vfile = vfs.get_vfile("re1", "pl\\pl00\\model\\pl00_BM.tex")
+        for _ in range(3):
+            assert vfile.get_bytes() == SYNTHETIC_FILES["pl\\pl00\\model\\pl00_BM.tex"]
+        stats = VFILE_CACHE.stats()
+        assert (stats["hits"], stats["misses"], stats["items"]) == (2, 1, 1)
+        assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+        patch_arc(synthetic_arc, [VirtualFileData("re1", "pl\\pl00\\model\\pl00_BM.tex", b"TEX\x00new")])
+        # in case the patch happened within the mtime resolution of the filesystem
+        stat = os.stat(synthetic_arc)
+        os.utime(synthetic_arc, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert vfile.get_bytes() == b"TEX\x00new"
+        assert VFILE_CACHE.stats()["misses"] == 2
+    finally:
+        VFILE_CACHE.clear()
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(len(vfs.file_list) - 1)
+
+
+def test_vfile_cache_size_on_load():
+    import_settings = bpy.context.scene.albam.import_settings
+    export_settings = bpy.context.scene.albam.export_settings
+    vfs_cache_size = import_settings.vfs_cache_size
+    blob_cache_size = export_settings.blob_cache_size
+    # as read from a .blend, without calling the update function
+    import_settings["vfs_cache_size"] = 3
+    export_settings["blob_cache_size"] = 5
+
+    try:
+        assert update_cache_sizes_on_load in bpy.app.handlers.load_post
+        update_cache_sizes_on_load()
+        assert VFILE_CACHE.max_bytes == 3 * 1024 * 1024
+        assert COMPRESSED_BLOB_CACHE.max_bytes == 5 * 1024 * 1024
+    finally:
+        import_settings.vfs_cache_size = vfs_cache_size
+        export_settings.blob_cache_size = blob_cache_size
+    assert VFILE_CACHE.max_bytes == vfs_cache_size * 1024 * 1024
+    assert COMPRESSED_BLOB_CACHE.max_bytes == blob_cache_size * 1024 * 1024
+
+
+def test_archive_index(synthetic_arc):
+    index = ArchiveIndex("test_toc_index")
+    index.clear()
+    with ArcWrapper(synthetic_arc) as arc:
+        paths = [fe.file_path_with_ext for fe in arc.get_file_entries()]
+
+    index.put("re1", synthetic_arc, paths)
+    index.save()
+
+    assert ArchiveIndex("test_toc_index").get("re1", synthetic_arc) == paths
+    assert ArchiveIndex("test_toc_index").get("re5", synthetic_arc) is None
+    patch_arc(synthetic_arc, [VirtualFileData("re1", "pl\\pl00\\model\\pl00_SM.tex", b"TEX\x00new")])
+    assert ArchiveIndex("test_toc_index").get("re1", synthetic_arc) is None
+
+
+def test_lazy_archive_expansion(synthetic_arc):
+    scene = bpy.context.scene
+    vfs = scene.albam.vfs
+    scene.albam.apps.app_selected = "re1"
+    scene.albam.import_settings.lazy_archive_expansion = True
+    num_items = len(vfs.file_list)
+    directory, file_name = os.path.split(synthetic_arc)
+
+    bpy.ops.albam.add_files(directory=directory, files=[{"name": file_name}])
+    try:
+        # archive and top-level directory
+        assert len(vfs.file_list) == num_items + 2
+        assert vfs.get_visibility_flags(1)[num_items:] == [1, 0]
+        bpy.ops.albam.file_item_collapse_toggle(button_index=num_items)
+        bpy.ops.albam.file_item_collapse_toggle(button_index=num_items + 1)
+        # pl00 is added and shown when expanding pl
+        assert vfs.get_visibility_flags(1)[num_items:] == [1, 1, 1]
+        vfile = vfs.get_vfile("re1", "pl\\pl00\\model\\pl00_BM.tex")
+        assert vfile.get_bytes() == SYNTHETIC_FILES["pl\\pl00\\model\\pl00_BM.tex"]
+        assert vfile.parent_id == "re1::pl::pl00::model"
+        assert vfile.tree_node.root_id == "re1::synthetic.arc"
+        with pytest.raises(KeyError):
+            vfs.get_vfile("re1", "pl\\pl00\\model\\missing.tex")
+        assert vfs.exists("re1::pl::pl00::motion::pl00.lmt")
+        assert not vfs.exists("re1::pl::pl00::motion::missing.lmt")
+        assert vfs.get("re1::pl::pl00::motion::missing.lmt") is None
+        assert vfs.get("re1::pl::pl00::motion::pl00.lmt").relative_path == "pl/pl00/motion/pl00.lmt"
+    finally:
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(len(vfs.file_list) - 1)
+
+
+def test_archive_listing_children():
+    listing = ArchiveListing("synthetic.arc", list(SYNTHETIC_FILES) + ["pl/readme.txt"])
+
+    assert listing.get_children([]) == [("pl", True)]
+    assert listing.get_children(["pl"]) == [("pl00", True), ("readme.txt", False)]
+    assert listing.get_children(["pl", "pl00", "model"]) == [
+        ("pl00.mod", False), ("pl00.mrl", False), ("pl00_BM.tex", False), ("pl00_NM.tex", False)]
+    assert listing.get_children(["pl", "pl00", "model", "pl00.mod"]) == []
+    assert listing.get_children(["missing"]) == []
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_archive_listing_job(synthetic_arc, lazy):
+    scene = bpy.context.scene
+    vfs = scene.albam.vfs
+    scene.albam.import_settings.lazy_archive_expansion = lazy
+    num_items = len(vfs.file_list)
+    missing_arc = os.path.join(os.path.dirname(synthetic_arc), "missing.arc")
+    job = ArchiveListingJob("re1", [synthetic_arc, missing_arc])
+
+    try:
+        vfs.add_real_file("re1", synthetic_arc)
+        expected = [vf.name for vf in vfs.file_list[num_items:]]
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(num_items)
+        results = []
+        while not job.is_finished:
+            done = job.pop_done()
+            if done:
+                results.append(done)
+        (arc_path, arc_future), (_, missing_future) = results
+        with pytest.raises(FileNotFoundError):
+            missing_future.result()
+        added = list(vfs.iter_add_real_file("re1", arc_path, arc_future.result(), chunk_size=2))
+
+        assert [vf.name for vf in vfs.file_list[num_items:]] == expected
+        assert sum(added) == len(expected)
+        assert max(added) <= 2 or lazy
+    finally:
+        job.close()
+        scene.albam.import_settings.lazy_archive_expansion = True
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(len(vfs.file_list) - 1)
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_add_real_file_interleaved(synthetic_arc, lazy):
+    scene = bpy.context.scene
+    vfs = scene.albam.vfs
+    scene.albam.import_settings.lazy_archive_expansion = lazy
+    num_items = len(vfs.file_list)
+
+    try:
+        vfs.add_real_file("re1", synthetic_arc)
+        expected = [vf.name for vf in vfs.file_list[num_items:]]
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(num_items)
+
+        # e.g. other files imported while an archive is added over several timer ticks,
+        # enough to reallocate the file list
+        for i, _ in enumerate(vfs.iter_add_real_file("re1", synthetic_arc, chunk_size=2)):
+            for j in range(50):
+                vfs.add_vfile(VirtualFileData("re1", f"interleaved_{i}_{j}.tex", b"TEX\x00"))
+
+        root_index = vfs.get_index_by_id("re1::synthetic.arc")
+        root_vf = vfs.file_list[root_index]
+        assert root_vf.is_archive and root_vf.absolute_path == synthetic_arc
+        assert [vf.name for vf in vfs.file_list[root_index:root_index + len(expected)]] == expected
+        assert vfs.get_vfile("re1", "pl\\pl00\\model\\pl00.mrl").root_vfile.name == "re1::synthetic.arc"
+    finally:
+        scene.albam.import_settings.lazy_archive_expansion = True
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(len(vfs.file_list) - 1)
+
+
+def test_add_directory(synthetic_arc, tmp_path):
+    scene = bpy.context.scene
+    vfs = scene.albam.vfs
+    scene.albam.apps.app_selected = "re1"
+    game_dir = tmp_path / "nativePC"
+    for relative_path in ("arc/stage/st100.arc", "arc/pl/pl00.arc", "arc/stage/old/st100.arc"):
+        (game_dir / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(synthetic_arc, game_dir / relative_path)
+    (game_dir / "arc" / "readme.txt").write_text("not an archive")
+    num_items = len(vfs.file_list)
+
+    try:
+        stats = ALBAM_OT_VirtualFileSystemAddDirectory._execute(bpy.context, str(game_dir))
+
+        assert [os.path.relpath(p, game_dir) for p in find_archives("re1", str(game_dir))] == [
+            os.path.join("arc", "pl", "pl00.arc"),
+            os.path.join("arc", "stage", "st100.arc"),
+            os.path.join("arc", "stage", "old", "st100.arc"),
+        ]
+        assert stats.num_archives == 2
+        assert stats.skipped == [str(game_dir / "arc" / "stage" / "old" / "st100.arc")]
+        assert list(stats.timings) == ["walk", "list", "add", "index"]
+        assert vfs.exists("re1::pl00.arc") and vfs.exists("re1::st100.arc")
+        mrl_root = vfs.get_vfile("re1", "pl\\pl00\\model\\pl00.mrl").root_vfile.name
+        assert mrl_root == "re1::pl00.arc"
+    finally:
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(len(vfs.file_list) - 1)
+
+
+def test_vfs_search(synthetic_arc):
+    scene = bpy.context.scene
+    vfs = scene.albam.vfs
+    scene.albam.import_settings.lazy_archive_expansion = True
+    num_items = len(vfs.file_list)
+    vfs.add_real_file("re1", synthetic_arc)
+    exported = scene.albam.exported
+    num_exported = len(exported.file_list)
+    exported.add_vfiles_as_tree("re1", VirtualFileData("re1", "exported"), [
+        VirtualFileData("re1", "pl\\pl00\\model\\pl00_BM.tex", b"TEX\x00new"),
+    ])
+
+    try:
+        textures = ["re1::pl::pl00::model::pl00_BM.tex", "re1::pl::pl00::model::pl00_NM.tex"]
+        assert [file_id for _, file_id in vfs.search("PL00_")] == textures
+        assert [file_id for _, file_id in vfs.search("*.tex")] == textures
+        assert [file_id for _, file_id in vfs.search("pl00_?m.*", "tex")] == textures
+        mrl_id = "re1::pl::pl00::model::pl00.mrl"
+        assert [file_id for _, file_id in vfs.search("pl/*/model/*.mrl")] == [mrl_id]
+        assert [file_id for _, file_id in vfs.search("", ".lmt")] == ["re1::pl::pl00::motion::pl00.lmt"]
+        assert vfs.search("model", limit=2) == [
+            ("re1::synthetic.arc", "re1::pl::pl00::model::pl00.mod"), ("re1::synthetic.arc", mrl_id)]
+        assert vfs.search("missing") == []
+        assert exported.search("pl00_bm") == [("re1::exported", "re1::pl::pl00::model::pl00_BM.tex")]
+
+        # drawing doesn't add items, matches not listed yet aren't shown
+        vfs["search_query"] = "pl00_"
+        num_listed = len(vfs.file_list)
+        assert sum(vfs.get_visibility_flags(1)) == 0
+        assert vfs.get_search_summary() == "Showing 0 of 2 matches"
+        assert len(vfs.file_list) == num_listed
+        # until the query is changed
+        vfs.search_query = "pl00_"
+        flags = vfs.get_visibility_flags(1)
+        shown = [vf.name for vf, flag in zip(vfs.file_list, flags) if flag]
+        assert shown == textures
+        assert vfs.get_search_summary() == "2 matches"
+        # back to the tree, with the archive collapsed
+        vfs.search_query = ""
+        assert sum(vfs.get_visibility_flags(1)[num_items:]) == 1
+
+        vfs.file_list_selected_index = num_items
+        bpy.ops.albam.remove_imported()
+        assert vfs.search("pl00_") == []
+    finally:
+        vfs.search_query = ""
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(len(vfs.file_list) - 1)
+        while len(exported.file_list) > num_exported:
+            exported.file_list.remove(len(exported.file_list) - 1)
+
+
+def test_archive_override_key():
+    names = [
+        "re_chunk_000.pak.patch_010.pak", "pl00_patch_002.arc", "re_chunk_000.pak.patch_002.pak",
+        "dispatch.arc", "pl00_patch.arc", "re_chunk_000.pak", "re_chunk_000.pak.patch_001.pak",
+    ]
+
+    assert sorted(names, key=get_archive_override_key)[:2] == ["dispatch.arc", "re_chunk_000.pak"]
+    assert get_archive_override_key("dispatch.arc") == get_archive_override_key("patches.pak") == (0, 0)
+    assert get_archive_override_key("pl00_patch.arc") < get_archive_override_key("pl00_patch_002.arc")
+    assert get_archive_override_key("re_chunk_000.pak.patch_001.pak") < get_archive_override_key(
+        "re_chunk_000.pak.patch_002.pak") < get_archive_override_key("RE_CHUNK_000.PAK.PATCH_010.PAK")
+
+
+def test_find_archives_names(tmp_path):
+    for file_name in ("re_chunk_000.pak", "PL00.ARC", "dispatch.arc", "pl00_patch_001.arc", "pl00.tex.34"):
+        (tmp_path / file_name).write_bytes(b"")
+
+    assert [os.path.basename(p) for p in find_archives("re1", str(tmp_path))] == [
+        "PL00.ARC", "dispatch.arc", "pl00_patch_001.arc"]
+
+
+def test_resolve_vfile_from_game_directory(synthetic_arc, tmp_path):
+    scene = bpy.context.scene
+    scene.albam.apps.app_selected = "re1"
+    game_dir = tmp_path / "nativePC" / "arc"
+    game_dir.mkdir(parents=True)
+    shutil.copyfile(synthetic_arc, game_dir / "pl00.arc")
+    tex_type = EXTENSION_TO_FILE_ID["tex"]
+    with open(game_dir / "pl00_patch_001.arc", "wb") as w:
+        write_arc(w, [
+            _new_file_entry("pl\\pl00\\model\\pl00_BM", tex_type, b"TEX\x00patched"),
+            _new_file_entry("pl\\pl01\\model\\pl01_BM", tex_type, b"TEX\x00pl01"),
+        ])
+    vfs = scene.albam.vfs
+
+    try:
+        with pytest.raises(KeyError):
+            vfs.resolve_vfile("re1", "pl\\pl00\\model\\pl00_BM.tex")
+        scene.albam.apps.app_dir = str(tmp_path / "nativePC")
+
+        patched = vfs.resolve_vfile("re1", "pl\\pl00\\model\\pl00_BM.tex")
+        assert patched.root_vfile.absolute_path == str(game_dir / "pl00_patch_001.arc")
+        assert patched.get_bytes() == b"TEX\x00patched"
+        assert vfs.resolve_vfile("re1", "PL/pl01/model/pl01_BM.tex").get_bytes() == b"TEX\x00pl01"
+        mrl = vfs.resolve_vfile("re1", "pl\\pl00\\model\\pl00.mrl")
+        assert mrl.display_name == "pl00.mrl"
+        assert mrl.get_bytes() == SYNTHETIC_FILES["pl\\pl00\\model\\pl00.mrl"]
+        with pytest.raises(KeyError):
+            vfs.resolve_vfile("re1", "pl\\pl00\\model\\missing.tex")
+    finally:
+        scene.albam.apps.app_dir = ""
+        PATH_RESOLVERS.clear()
+
+
+def test_path_resolver_invalidated(synthetic_arc, tmp_path):
+    scene = bpy.context.scene
+    scene.albam.apps.app_selected = "re1"
+    game_dir = tmp_path / "nativePC"
+    (game_dir / "arc").mkdir(parents=True)
+    vfs = scene.albam.vfs
+    num_items = len(vfs.file_list)
+    tex_path = "pl\\pl00\\model\\pl00_BM.tex"
+
+    try:
+        scene.albam.apps.app_dir = str(game_dir)
+        with pytest.raises(KeyError):
+            vfs.resolve_vfile("re1", tex_path)
+
+        # changes the mtime of the game directory
+        shutil.copyfile(synthetic_arc, game_dir / "pl00.arc")
+        assert vfs.resolve_vfile("re1", tex_path).get_bytes() == SYNTHETIC_FILES[tex_path]
+
+        # in a subdirectory, found after adding it
+        with open(game_dir / "arc" / "pl00_patch_001.arc", "wb") as w:
+            write_arc(w, [_new_file_entry("pl\\pl00\\model\\pl00_BM", EXTENSION_TO_FILE_ID["tex"], b"new")])
+        assert get_path_resolver("re1").resolve(tex_path)[0] == str(game_dir / "pl00.arc")
+        ALBAM_OT_VirtualFileSystemAddDirectory._execute(bpy.context, str(game_dir / "arc"))
+        assert get_path_resolver("re1").resolve(tex_path)[0] == str(game_dir / "arc" / "pl00_patch_001.arc")
+
+        # written in place, the mtime of the game directory doesn't change
+        for write, new_path in ((patch_arc, "pl\\pl00\\model\\pl00_a.tex"),
+                                (update_arc, "pl\\pl00\\model\\pl00_b.tex")):
+            assert get_path_resolver("re1").resolve(new_path) is None
+            write(str(game_dir / "pl00.arc"), [VirtualFileData("re1", new_path, b"TEX\x00new")])
+            assert get_path_resolver("re1").resolve(new_path)[0] == str(game_dir / "pl00.arc")
+    finally:
+        scene.albam.apps.app_dir = ""
+        PATH_RESOLVERS.clear()
+        while len(vfs.file_list) > num_items:
+            vfs.file_list.remove(len(vfs.file_list) - 1)
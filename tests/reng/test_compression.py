@@ -0,0 +1,48 @@
+import os
+import zlib
+
+import numpy as np
+import pytest
+import zstandard
+
+from albam.engines.reng.compression import (
+    FLAG_DEFLATE,
+    FLAG_ZSTD,
+    decompress,
+    decompress_into,
+    iter_decompress,
+)
+
+
+DATA = os.urandom(64 * 1024) + bytes(1024 * 1024) + b"TEX\x00" * 4096
+
+
+def _compress(data, flags):
+    if flags == FLAG_DEFLATE:
+        compressor = zlib.compressobj(wbits=-15)
+        return compressor.compress(data) + compressor.flush()
+    if flags == FLAG_ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+@pytest.mark.parametrize("flags", [0, FLAG_DEFLATE, FLAG_ZSTD])
+def test_decompress(flags):
+    raw_data = _compress(DATA, flags)
+    out = np.zeros(len(DATA) + 16, dtype=np.uint8)
+
+    assert decompress(raw_data, flags, len(DATA)) == DATA
+    assert decompress_into(raw_data, flags, out) == len(DATA)
+    assert out[:len(DATA)].tobytes() == DATA
+
+
+@pytest.mark.parametrize("flags", [0, FLAG_DEFLATE, FLAG_ZSTD])
+def test_iter_decompress(flags):
+    raw_data = _compress(DATA, flags)
+    raw_chunks = (raw_data[i:i + 4096] for i in range(0, len(raw_data), 4096))
+
+    chunks = list(iter_decompress(raw_chunks, flags, chunk_size=64 * 1024))
+
+    assert b"".join(chunks) == DATA
+    if flags == FLAG_DEFLATE:
+        assert max(len(chunk) for chunk in chunks) <= 64 * 1024
@@ -0,0 +1,40 @@
+import os
+import random
+
+import pymmh3
+import pytest
+
+from albam.engines.reng.hashing import (
+    SEED,
+    hash_path,
+    hash_path_case_sensitive,
+    hash_paths,
+    murmur3_32,
+    murmur3_32_many,
+)
+
+
+@pytest.mark.parametrize("seed", [0, SEED])
+def test_murmur3_32(seed):
+    rnd = random.Random(seed)
+    keys = [b""] + [os.urandom(rnd.randrange(1, 64)) for _ in range(500)]
+    expected = [pymmh3.hash(key, seed) & 0xFFFFFFFF for key in keys]
+
+    assert [murmur3_32(key, seed) for key in keys] == expected
+    assert murmur3_32_many(keys, seed).tolist() == expected
+
+
+def test_hash_paths():
+    paths = [
+        "natives/STM/Character/pl0000/pl0000.mesh.2109108288",
+        "natives/STM/Character/pl0000/pl0000_ALBM.tex.30",
+        "natives/x64/sound/a.bnk.2",
+        "",
+    ]
+
+    hashes_ci, hashes_cs = hash_paths(paths)
+
+    for path, hash_ci, hash_cs in zip(paths, hashes_ci.tolist(), hashes_cs.tolist()):
+        assert hash_ci == hash_path(path) == hash_path(path.upper())
+        assert hash_cs == hash_path_case_sensitive(path)
+        assert hash_ci == pymmh3.hash(path.lower().encode("utf-16")[2:], SEED) & SEED
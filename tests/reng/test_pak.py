@@ -0,0 +1,232 @@
+import os
+import struct
+import zlib
+
+import pytest
+import zstandard
+
+from albam.engines.reng import archive
+from albam.engines.reng.archive import (
+    FILE_LIST_CACHE,
+    FILE_LIST_POOL,
+    PAK_OVERLAY_CACHE,
+    PAK_OVERLAYS,
+    PAK_POOL,
+    FileListIndex,
+    PakWrapper,
+    extract_pak,
+    get_pak_overlay,
+    pak_loader,
+    read_pak_toc,
+    write_pak_file,
+)
+from albam.engines.reng.compression import FLAG_DEFLATE, FLAG_ZSTD
+from albam.engines.reng.hashing import hash_path_case_sensitive
+from albam.engines.reng.structs.pak import Pak
+from albam.blender_ui.import_panel import APP_CONFIG_FILE_CACHE, APP_DIRS_CACHE
+from albam.vfs import ArchiveFileData, RealFileData, VirtualFileData, find_archives, list_archive
+from albam.exceptions import FileNotFoundInArchive
+
+
+FILES = {
+    "natives/STM/Character/pl0000.mesh.2109108288": b"MESH" * 64,
+    "natives/STM/Character/pl0000.tex.30": b"TEX\x00" * 1024,
+    "natives/STM/Character/pl0000.mdf2.10": bytes(range(256)) * 4096,
+}
+
+
+def _write_pak(path, files):
+    header = struct.pack("<4sIII", b"KPKA", 4, len(files), 0)
+    offset = len(header) + PakWrapper.FILE_ENTRY_SIZE * len(files)
+    entries = []
+    blobs = []
+    for i, (file_path, data) in enumerate(files.items()):
+        flags = i % 3
+        if flags == 1:
+            compressor = zlib.compressobj(wbits=-15)
+            raw_data = compressor.compress(data) + compressor.flush()
+        elif flags == 2:
+            raw_data = zstandard.ZstdCompressor().compress(data)
+        else:
+            raw_data = data
+        entries.append(struct.pack(
+            "<IIQQQQQ", PakWrapper.hash_path(file_path), 0, offset, len(raw_data), len(data), flags, 0))
+        blobs.append(raw_data)
+        offset += len(raw_data)
+    path.write_bytes(header + b"".join(entries) + b"".join(blobs))
+
+
+@pytest.fixture
+def pak_path(tmp_path):
+    file_list = tmp_path / "re2_pak_names.list"
+    file_list.write_text("\n".join(list(FILES) + ["natives/STM/not_in_pak.tex.30"]) + "\n")
+    pak_path = tmp_path / "re_chunk_000.pak"
+    _write_pak(pak_path, FILES)
+    yield str(pak_path), str(file_list)
+    PAK_POOL.clear()
+    FILE_LIST_POOL.clear()
+
+
+def test_pak_wrapper(pak_path):
+    pak_path, file_list_path = pak_path
+    with PAK_POOL.lease(pak_path, "re2", file_list_path) as pak:
+        assert sorted(pak.paths) == sorted(FILES)
+        for file_path, data in FILES.items():
+            assert pak.get_file(file_path) == data
+            # case-insensitive, like the game
+            assert pak.get_file(file_path.upper()) == data
+        with pytest.raises(FileNotFoundInArchive):
+            pak.get_file("natives/STM/not_in_pak.tex.30")
+    with PAK_POOL.lease(pak_path, "re2", file_list_path) as pooled:
+        assert pooled is pak
+
+
+def test_pak_loader(pak_path):
+    pak_path, file_list_path = pak_path
+
+    assert sorted(pak_loader(RealFileData("re2", pak_path, file_list_path))) == sorted(FILES)
+    assert sorted(list_archive("re2", pak_path, file_list_path)) == sorted(FILES)
+    # the file list isn't looked up in the scene, loaders run in worker threads
+    assert list(pak_loader(RealFileData("re2", pak_path))) == []
+
+
+def test_read_pak_toc(pak_path):
+    pak_path, _ = pak_path
+
+    with open(pak_path, "rb") as f:
+        entries = read_pak_toc(f)
+    parsed = Pak.from_file(pak_path)
+
+    assert len(entries) == len(parsed.file_entries) == len(FILES)
+    for row, fe in zip(entries.tolist(), parsed.file_entries):
+        assert row == (fe.file_path_hash_case_insensitive, fe.file_path_hash_case_sensitive,
+                       fe.offset, fe.zsize, fe.size, fe.flags, fe.unk_01)
+
+
+def test_file_list_index_persisted(pak_path):
+    _, file_list_path = pak_path
+    with FILE_LIST_POOL.lease(file_list_path) as file_list_index:
+        pass
+    FILE_LIST_POOL.clear()
+    misses = FILE_LIST_CACHE.misses
+
+    cached = FileListIndex.load(file_list_path)
+
+    assert FILE_LIST_CACHE.misses == misses
+    assert list(cached.hashes) == list(file_list_index.hashes)
+    assert cached.paths == file_list_index.paths
+
+
+def test_file_list_index_cache_error(pak_path, monkeypatch):
+    _, file_list_path = pak_path
+    expected = FileListIndex.build(file_list_path)
+
+    def put(key, value):
+        raise OSError("No space left on device")
+
+    # e.g. the cache disk is full, the file list is still loaded
+    monkeypatch.setattr(FILE_LIST_CACHE, "get", lambda key: None)
+    monkeypatch.setattr(FILE_LIST_CACHE, "put", put)
+    file_list_index = FileListIndex.load(file_list_path)
+
+    assert list(file_list_index.hashes) == list(expected.hashes)
+    assert file_list_index.paths == expected.paths
+
+
+@pytest.mark.parametrize("stream_min_size", [0, archive.STREAM_MIN_SIZE])
+def test_extract_pak(pak_path, tmp_path, monkeypatch, stream_min_size):
+    pak_path, file_list_path = pak_path
+    monkeypatch.setattr(archive, "STREAM_MIN_SIZE", stream_min_size)
+
+    extract_pak("re2", pak_path, file_list_path, str(tmp_path / "out"))
+
+    for file_path, data in FILES.items():
+        assert (tmp_path / "out" / file_path).read_bytes() == data
+
+
+def test_pak_overlay(pak_path, tmp_path):
+    pak_path, file_list_path = pak_path
+    mesh_path, tex_path, _ = FILES
+    patch = {tex_path: b"TEX\x00patched", "natives/STM/new.tex.30": b"TEX\x00new"}
+    _write_pak(tmp_path / "re_chunk_000.pak.patch_002.pak", patch)
+    _write_pak(tmp_path / "re_chunk_000.pak.patch_001.pak", {tex_path: b"TEX\x00old patch"})
+
+    overlay = get_pak_overlay("re2", str(tmp_path))
+
+    assert len(overlay) == 4
+    assert overlay.has_pak(pak_path)
+    assert overlay.get_entry(mesh_path)[0] == pak_path
+    assert overlay.get_entry(tex_path)[0] == str(tmp_path / "re_chunk_000.pak.patch_002.pak")
+    assert overlay.get_file(mesh_path, file_list_path) == FILES[mesh_path]
+    assert overlay.get_file(tex_path, file_list_path) == b"TEX\x00patched"
+    assert overlay.get_entry("natives/STM/not_in_pak.tex.30") is None
+    assert get_pak_overlay("re2", str(tmp_path)) is overlay
+
+    PAK_OVERLAYS.clear()
+    misses = PAK_OVERLAY_CACHE.misses
+    cached = get_pak_overlay("re2", str(tmp_path))
+    assert PAK_OVERLAY_CACHE.misses == misses
+    assert cached.pak_paths == overlay.pak_paths
+    assert cached.get_file(tex_path, file_list_path) == b"TEX\x00patched"
+    PAK_OVERLAYS.clear()
+
+
+def test_find_archives(tmp_path):
+    for file_name in ("re_chunk_000.pak.patch_001.pak", "re_chunk_000.pak", "re_chunk_000.pak.patch_002.pak",
+                      "re_chunk_000.pak.patch_001.pak.bak", "pl00.arc"):
+        (tmp_path / file_name).write_bytes(b"")
+
+    assert [os.path.basename(p) for p in find_archives("re2", str(tmp_path))] == [
+        "re_chunk_000.pak", "re_chunk_000.pak.patch_001.pak", "re_chunk_000.pak.patch_002.pak"]
+
+
+def test_pak_item_cache_with_patches(pak_path, tmp_path, monkeypatch):
+    pak_path, file_list_path = pak_path
+    _, tex_path, _ = FILES
+    monkeypatch.setitem(APP_DIRS_CACHE, "re2", str(tmp_path))
+    monkeypatch.setitem(APP_CONFIG_FILE_CACHE, "re2", file_list_path)
+    vfile = ArchiveFileData("re2", pak_path, tex_path)
+    patch_path = tmp_path / "re_chunk_000.pak.patch_001.pak"
+
+    try:
+        assert vfile.get_bytes() == FILES[tex_path]
+        # the base pak doesn't change
+        _write_pak(patch_path, {tex_path: b"TEX\x00patched"})
+        assert vfile.get_bytes() == b"TEX\x00patched"
+        _write_pak(patch_path, {tex_path: b"TEX\x00patched again"})
+        os.utime(patch_path, ns=(0, 0))
+        assert vfile.get_bytes() == b"TEX\x00patched again"
+    finally:
+        PAK_OVERLAYS.clear()
+
+
+def test_write_pak(tmp_path):
+    files = dict(FILES)
+    files["natives/STM/Character/random.bin"] = os.urandom(1024)
+    file_list = tmp_path / "re2_pak_names.list"
+    file_list.write_text("\n".join(files) + "\n")
+    pak_path = tmp_path / "mod.pak"
+    # same path with different case and separators, the last one wins
+    vfiles = [VirtualFileData("re2", path.replace("/", "\\").upper(), b"old") for path in files]
+    vfiles += [VirtualFileData("re2", path, data) for path, data in files.items()]
+
+    write_pak_file(str(pak_path), vfiles)
+
+    parsed = Pak.from_file(str(pak_path))
+    assert parsed.num_file_entries == len(files)
+    flags = {}
+    for fe, path in zip(parsed.file_entries, sorted(files, key=PakWrapper.hash_path)):
+        assert fe.file_path_hash_case_insensitive == PakWrapper.hash_path(path)
+        assert fe.file_path_hash_case_sensitive == hash_path_case_sensitive(path)
+        assert fe.size == len(files[path])
+        flags[path] = fe.flags
+    assert flags["natives/STM/Character/pl0000.mdf2.10"] == FLAG_ZSTD
+    assert flags["natives/STM/Character/pl0000.tex.30"] == FLAG_DEFLATE
+    assert flags["natives/STM/Character/random.bin"] == 0
+
+    with PAK_POOL.lease(str(pak_path), "re2", str(file_list)) as pak:
+        assert sorted(pak.paths) == sorted(files)
+        for path, data in files.items():
+            assert pak.get_file(path) == data
+    PAK_POOL.clear()
+    FILE_LIST_POOL.clear()
@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+
+import bpy
+import pytest
+
+from albam.lib.cache import BlobStore
+from albam.vfs import BLOB_STORE, VirtualFileData, get_blob_store_dir, get_referenced_blob_keys
+
+
+def test_blob_store(tmp_path):
+    store = BlobStore(str(tmp_path / "first"))
+    data = os.urandom(1024)
+
+    key = store.put(data)
+    store.set_directory(str(tmp_path / "second"))
+    store._memory.clear()
+
+    assert store.get(key) == data
+    assert store.put(b"") == "" and store.get("") == b""
+    assert store.copy_to_directory([key, "0" * 40]) == ["0" * 40]
+    assert (tmp_path / "second" / key[:2] / key).read_bytes() == data
+    unused_key = store.put(b"unused")
+    assert store.collect_garbage([key]) == (1, len(b"unused"))
+    with pytest.raises(KeyError):
+        store.get(unused_key)
+    assert store.get(key) == data
+
+
+@pytest.mark.parametrize("location", ["SIDECAR", "CACHE"])
+def test_blob_store_dir(tmp_path, location):
+    v2_dir = get_blob_store_dir(str(tmp_path / "pl00.v2.blend"), location)
+    v3_dir = get_blob_store_dir(str(tmp_path / "pl00.v3.blend"), location)
+
+    assert v2_dir != v3_dir
+    assert os.path.basename(v2_dir).startswith("pl00.v2")
+    # shared with its backups
+    assert get_blob_store_dir(str(tmp_path / "pl00.v2.blend1"), location) == v2_dir
+    assert get_blob_store_dir(str(tmp_path / "pl00.v2.blend12"), location) == v2_dir
+    assert get_blob_store_dir(str(tmp_path / "pl00.blend"), location) not in (v2_dir, v3_dir)
+
+
+def test_asset_original_bytes():
+    bl_object = bpy.data.objects.new("blob_store_test", None)
+    data = b"MOD\x00" + os.urandom(512)
+    try:
+        bl_object.albam_asset.original_bytes = data
+
+        assert "original_bytes" not in bl_object.albam_asset
+        assert bl_object.albam_asset.original_hash in get_referenced_blob_keys()
+        assert BLOB_STORE.get(bl_object.albam_asset.original_hash) == data
+        assert bl_object.albam_asset.original_bytes == data
+        # saved before the blob store existed
+        bl_object.albam_asset.original_hash = ""
+        bl_object.albam_asset["original_bytes"] = b"MOD\x00legacy"
+        assert bl_object.albam_asset.original_bytes == b"MOD\x00legacy"
+    finally:
+        bpy.data.objects.remove(bl_object)
+
+
+def test_vfile_data_bytes():
+    exported = bpy.context.scene.albam.exported
+    num_items = len(exported.file_list)
+
+    vfile = exported.add_vfile(VirtualFileData("re1", "pl\\pl00\\model\\pl00_BM.tex", b"TEX\x00new"))
+    try:
+        assert vfile.data_hash == BlobStore.get_key(b"TEX\x00new")
+        assert vfile.get_bytes() == b"TEX\x00new"
+    finally:
+        exported.file_list.remove(num_items)
+
+
+def test_register_restricted(tmp_path):
+    # bpy.data and bpy.context are restricted while Blender enables add-ons. With
+    # bpy as a Python module, RestrictBlend patches the bpy package of the scripts
+    # directory instead of the extension module the add-on imports
+    script = """
+import os
+
+import bpy
+import bpy_restrict_state
+
+bpy_restrict_state._bpy = bpy
+import albam
+
+with bpy_restrict_state.RestrictBlend():
+    albam.register()
+assert bpy.app.timers.is_registered(albam.update_blob_store_on_load)
+albam.unregister()
+# bpy as a module can crash when the interpreter exits after registering classes
+os._exit(0)
+"""
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=repo_dir, ALBAM_CACHE_DIR=str(tmp_path))
+
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,109 @@
+import pytest
+
+from albam.lib.cache import FileHandlePool, scan_key_files
+
+
+class FakeHandle:
+    def __init__(self, file_path, *args):
+        self.file_path = file_path
+        self.args = args
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def file_paths(tmp_path):
+    file_paths = []
+    for i in range(4):
+        file_path = tmp_path / f"{i}.arc"
+        file_path.write_bytes(bytes(i))
+        file_paths.append(str(file_path))
+    return file_paths
+
+
+def test_file_handle_pool_hits(file_paths):
+    pool = FileHandlePool(FakeHandle, max_items=2)
+
+    with pool.lease(file_paths[0]) as first:
+        pass
+    with pool.lease(file_paths[0]) as second:
+        pass
+    with pool.lease(file_paths[0], "re2") as with_args:
+        pass
+
+    assert second is first
+    assert with_args is not first and with_args.args == ("re2",)
+    assert pool.stats() == {"items": 2, "leased": 0, "hits": 1, "misses": 2}
+
+
+def test_file_handle_pool_eviction_order(file_paths):
+    pool = FileHandlePool(FakeHandle, max_items=2)
+    handles = []
+    for file_path in file_paths[:2]:
+        with pool.lease(file_path) as handle:
+            handles.append(handle)
+
+    # the first one is now the most recently used
+    with pool.lease(file_paths[0]):
+        pass
+    with pool.lease(file_paths[2]) as third:
+        pass
+
+    assert [h.closed for h in handles] == [False, True]
+    assert len(pool) == 2
+    pool.clear()
+    assert handles[0].closed and third.closed
+    assert pool.stats()["misses"] == 0
+
+
+def test_file_handle_pool_stamp(file_paths):
+    pool = FileHandlePool(FakeHandle)
+    with pool.lease(file_paths[1]) as handle:
+        pass
+
+    with open(file_paths[1], "ab") as f:
+        f.write(b"modified")
+    with pool.lease(file_paths[1]) as reopened:
+        pass
+
+    assert reopened is not handle
+    assert handle.closed and not reopened.closed
+    assert pool.stats()["misses"] == 2
+
+
+def test_file_handle_pool_leased_not_closed(file_paths):
+    pool = FileHandlePool(FakeHandle, max_items=1)
+
+    with pool.lease(file_paths[0]) as held:
+        for file_path in file_paths[1:] * 2:
+            with pool.lease(file_path):
+                pass
+        pool.evict(file_paths[0])
+        assert not held.closed
+        assert pool.stats()["leased"] == 1
+        # leased again by another caller before the first is done
+        nested = pool.acquire(file_paths[1])
+    assert not nested.closed
+    assert held.closed
+    pool.clear()
+    assert not nested.closed
+    pool.release(nested)
+    assert nested.closed
+    assert pool.stats()["leased"] == 0
+
+
+def test_scan_key_files(tmp_path):
+    (tmp_path / "ab").mkdir()
+    (tmp_path / "ab" / "abcd").write_bytes(b"data")
+    # writes in progress and anything not named like a key are skipped
+    (tmp_path / "ab" / "abef.tmp").write_bytes(b"partial")
+    (tmp_path / "other").mkdir()
+    (tmp_path / "other" / "abcd").write_bytes(b"data")
+    (tmp_path / "readme.txt").write_text("not a key")
+
+    assert [(path, size) for path, size, _ in scan_key_files(str(tmp_path))] == [
+        (str(tmp_path / "ab" / "abcd"), 4)]
+    assert list(scan_key_files(str(tmp_path / "missing"))) == []
+    assert list(scan_key_files(None)) == []
@@ -0,0 +1,139 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from albam.vfs import VirtualFilePathIndex, VirtualFileVisibility
+
+
+def _item(name, depth=0, is_expanded=False, is_root=False):
+    return SimpleNamespace(
+        name=name, tree_node=SimpleNamespace(depth=depth), is_expanded=is_expanded, is_root=is_root,
+        is_archive=False,
+    )
+
+
+def _append(file_list, path_index, name):
+    # like VirtualFileSystemBase._on_item_appended
+    file_list.append(_item(name))
+    path_index.append(file_list, name)
+
+
+def _new_path_index(names):
+    file_list = []
+    path_index = VirtualFilePathIndex()
+    path_index.rebuild(file_list)
+    for name in names:
+        _append(file_list, path_index, name)
+    return file_list, path_index
+
+
+def _assert_lookups(file_list, path_index, missing=()):
+    for i, item in enumerate(file_list):
+        assert path_index.lookup(file_list, item.name) == i
+    for name in missing:
+        assert path_index.lookup(file_list, name) is None
+
+
+def test_path_index_append():
+    file_list, path_index = _new_path_index(["re1::pl00.arc", "re1::pl", "re1::pl::pl00"])
+
+    # kept in sync without rebuilding
+    assert path_index.size == len(file_list)
+    assert path_index.indices == {"re1::pl00.arc": 0, "re1::pl": 1, "re1::pl::pl00": 2}
+    _assert_lookups(file_list, path_index, ["re1::missing"])
+
+
+def test_path_index_duplicates():
+    # the same path in several archives, the first one is found
+    file_list, path_index = _new_path_index(["re1::pl00.arc", "re1::pl", "re1::st100.arc", "re1::pl"])
+
+    assert path_index.lookup(file_list, "re1::pl") == 1
+    del file_list[1]
+    assert path_index.lookup(file_list, "re1::pl") == 2
+
+
+@pytest.mark.parametrize("removed", [0, 2, 4])
+def test_path_index_remove(removed):
+    names = [f"re1::file{i}" for i in range(5)]
+    file_list, path_index = _new_path_index(names)
+
+    # removed outside the vfs methods, e.g. by the remove root operator
+    del file_list[removed]
+
+    _assert_lookups(file_list, path_index, [names[removed]])
+
+
+@pytest.mark.parametrize("removed", [0, 2, 4])
+def test_path_index_remove_then_append(removed):
+    names = [f"re1::file{i}" for i in range(5)]
+    file_list, path_index = _new_path_index(names)
+
+    # same length as before, so only the appended item tells the index is stale
+    del file_list[removed]
+    _append(file_list, path_index, "re1::new")
+
+    _assert_lookups(file_list, path_index, [names[removed]])
+
+
+def test_path_index_move_block():
+    file_list, path_index = _new_path_index(["re1::a.arc", "re1::a", "re1::b.arc", "re1::a::x", "re1::a::y"])
+
+    # children added at the end go right after their parent, like `_add_children`
+    file_list[2:2] = [file_list.pop(3), file_list.pop(3)]
+    path_index.move_block(file_list, 3, 2, 2)
+
+    assert path_index.indices == {
+        "re1::a.arc": 0, "re1::a": 1, "re1::a::x": 2, "re1::a::y": 3, "re1::b.arc": 4}
+    _assert_lookups(file_list, path_index)
+
+
+def _random_tree(rng, num_roots=3, max_depth=5, max_children=4):
+    """
+    Items of a file list in the order of `Tree.flatten`: every item is followed by its subtree
+    """
+    file_list = []
+
+    def add_children(parent_name, depth):
+        for i in range(rng.randint(0, max_children)):
+            name = f"{parent_name}::{i}"
+            file_list.append(_item(name, depth, rng.random() < 0.5))
+            if depth < max_depth:
+                add_children(name, depth + 1)
+
+    for i in range(num_roots):
+        file_list.append(_item(f"re1::root{i}.arc", 0, rng.random() < 0.5, is_root=True))
+        add_children(f"re1::root{i}", 1)
+    return file_list
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_visibility_update_subtree(seed):
+    rng = random.Random(seed)
+    file_list = _random_tree(rng)
+    visibility = VirtualFileVisibility()
+    visibility.get_flags(file_list, 1)
+
+    for _ in range(50):
+        index = rng.randrange(len(file_list))
+        file_list[index].is_expanded = not file_list[index].is_expanded
+        visibility.update_subtree(file_list, index)
+
+        expected = VirtualFileVisibility()
+        assert visibility.get_flags(file_list, 1) == expected.get_flags(file_list, 1)
+
+
+def test_visibility_rebuild():
+    file_list = [
+        _item("re1::a.arc", 0, True, is_root=True),
+        _item("re1::a", 1, False),
+        _item("re1::a::x", 2, True),
+        _item("re1::a::x::y", 3),
+        _item("re1::b", 1, True),
+        _item("re1::b::z", 2),
+        _item("re1::c.arc", 0, False, is_root=True),
+        _item("re1::c", 1, True),
+    ]
+    visibility = VirtualFileVisibility()
+
+    assert visibility.get_flags(file_list, 2) == [2, 2, 0, 0, 2, 2, 2, 0]